@@ -7,20 +7,43 @@ MELHORIAS v2.0:
 - Tooltips explicativos em TODOS os gráficos
 - Clareza temporal: badges de período + comparação mês a mês
 - Página 6 nova: Visão Futurista (cenários e projeções)
-- Simulador "E se?" na sidebar (custo fixo ajustável)
+- Simulador "E se?" na sidebar (custo fixo ajustável) e grade de cenários receita × margem × custo fixo
 - Tolerância visual nos KPIs (±2% = neutro/amarelo)
 - Código seguro contra dados faltantes (safe_div)
 """
 
+import importlib
+import threading
+import time
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import numpy as np
 from pathlib import Path
 from auth import require_auth, init_auth_session, is_authenticated, logout
-from data_processor import DataProcessor
+import perf
+
+
+class LazyModule:
+    """Adia a importação de um módulo pesado até o primeiro atributo acessado"""
+    def __init__(self, name):
+        self._name = name; self._module = None
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+# Módulos pesados e específicos de página: carregados só quando uma página precisa
+pd = LazyModule("pandas")
+px = LazyModule("plotly.express")
+go = LazyModule("plotly.graph_objects")
+charts = LazyModule("charts")
+tables = LazyModule("tables")
+partitions = LazyModule("data_partitions")
+scenarios = LazyModule("scenarios")
+rolling = LazyModule("rolling")
+np = LazyModule("numpy")
+
+def make_subplots(*args, **kwargs):
+    from plotly.subplots import make_subplots as _make_subplots
+    return _make_subplots(*args, **kwargs)
 
 # ============================================================
 # CONFIGURAÇÃO GERAL
@@ -79,6 +102,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+COLS_PRODUTO = {'Produto':'Produto','Dias_Vendidos':'Dias','Margem_Media':'Margem %','Receita_Total':'Receita','Lucro_Total':'Lucro'}
+COLS_EROSAO = {'Produto':'Produto','Vlr_Venda':'Faturamento','Margem_Pct':'Margem %','Markdown_Pct':'Markdown Atual','Markdown_Ult_Entrada':'Markdown Ult. Entrada','Erosao_Margem':'Erosão (pts)'}
+
 MESES_NOMES = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
                'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
 MESES_LABELS = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
@@ -86,17 +112,38 @@ MESES_LABELS = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', '
 # ============================================================
 # CARREGAMENTO DE DADOS
 # ============================================================
-@st.cache_data
-def load_data():
-    file_path = "Base_PowerBI.xlsx"
-    data = {}
-    data['vendas_mensais'] = pd.read_excel(file_path, sheet_name='fato_vendas_mensais')
-    data['vendas_diarias'] = pd.read_excel(file_path, sheet_name='fato_vendas_diarias')
-    data['produtos'] = pd.read_excel(file_path, sheet_name='dim_produtos')
-    data['calendario'] = pd.read_excel(file_path, sheet_name='dim_calendario')
-    data['yoy'] = pd.read_excel(file_path, sheet_name='comparativo_yoy')
-    data['erosao'] = pd.read_excel(file_path, sheet_name='alertas_erosao_margem')
-    return data
+@st.cache_resource
+def get_store():
+    from data_store import DataStore
+    return DataStore()
+
+@st.cache_resource
+def get_import_store():
+    from import_store import ImportStore
+    return ImportStore()
+
+@st.cache_resource
+def get_job_runner():
+    from import_jobs import JobRunner
+    store = get_import_store(); ds = get_store()
+    # Meses importados entram no dashboard na hora: só as partições afetadas são recalculadas
+    return JobRunner(db=store.path, store=store, on_complete=lambda meses: ds.apply_import({k: store.partition_tables(k) for k in meses}))
+
+@st.cache_resource
+def start_agendador_mobne():
+    # Agendamentos do Mobne rodam desde a subida do servidor, não só depois de abrir a página de integração.
+    # Em uma thread: o import do APScheduler/pandas não atrasa o primeiro render
+    def iniciar():
+        from mobne_agendador import agendador_padrao
+        agendador_padrao()
+    threading.Thread(target=iniciar, name="mobne-agendador", daemon=True).start()
+
+def list_periodos():
+    return get_store().periodos()
+
+def load_data(periodo):
+    # Visão da sessão sobre o armazém compartilhado (inclui o mês anterior já carregado)
+    return get_store().snapshot(periodo)
 
 # ============================================================
 # HELPERS
@@ -104,11 +151,26 @@ def load_data():
 def get_custo_fixo():
     return st.session_state.get('custo_fixo', CUSTO_FIXO_DEFAULT)
 
-def get_mes_ref(yoy):
-    yoy_mes = yoy[yoy['Receita_2026'] > 0]
-    if not yoy_mes.empty:
-        return yoy_mes.iloc[-1]['Mes'], int(yoy_mes.iloc[-1]['Mes_Num'])
-    return "Janeiro", 1
+def get_mes_ref(data):
+    _, mes = data['periodo'].split('-')
+    return MESES_NOMES[int(mes)], int(mes)
+
+def get_ano_ref(data):
+    return int(data['periodo'].split('-')[0])
+
+def get_rotulos(data):
+    """'Mês/AA' do período selecionado e do mesmo mês no ano anterior"""
+    mes_nome, _ = get_mes_ref(data); ano = get_ano_ref(data)
+    return f"{mes_nome}/{ano % 100:02d}", f"{mes_nome}/{(ano - 1) % 100:02d}"
+
+def get_yoy_row(yoy, mes_num, ano):
+    """Receita, lucro e cupons do mesmo mês no ano anterior (colunas *_AAAA da comparativo_yoy); None sem dados"""
+    ant = ano - 1
+    if f'Receita_{ant}' not in yoy: return None
+    r = yoy[(yoy['Mes_Num'] == mes_num) & (yoy[f'Receita_{ant}'] > 0)]
+    if r.empty: return None
+    r = r.iloc[-1]
+    return {k: float(r.get(f'{col}_{ant}', 0) or 0) for k, col in (('receita', 'Receita'), ('lucro', 'Lucro'), ('cupons', 'Cupons'))}
 
 def safe_div(a, b, default=0):
     try:
@@ -137,6 +199,11 @@ def render_section(text):
 def render_periodo_badge(mes_nome, ano):
     st.markdown(f'<span class="periodo-badge">📅 Analisando: {mes_nome}/{ano}</span>', unsafe_allow_html=True)
 
+def render_toggle_cauda(n, key):
+    if n <= charts.DENSITY_THRESHOLD // 2: return None
+    return st.toggle("Agrupar cauda longa (catálogo grande)", value=n > charts.DENSITY_THRESHOLD, key=key,
+        help="Desenha individualmente só os principais produtos e agrega o restante em uma grade de densidade.")
+
 def render_tooltip(title, what, how, why, example=""):
     with st.expander(f"💡 Como interpretar: {title}"):
         st.markdown(f"**O que mostra:** {what}\n\n**Como ler:** {how}\n\n**Por que importa:** {why}")
@@ -147,32 +214,34 @@ def render_tooltip(title, what, how, why, example=""):
 # ============================================================
 # PÁGINA 1: RESUMO EXECUTIVO
 # ============================================================
+@perf.instrument_page
 def page_resumo_executivo(data):
     st.markdown("## 📊 Resumo Executivo")
     st.markdown("*Como foi o mês? Estamos melhor ou pior que antes?*")
     CUSTO_FIXO = get_custo_fixo()
     vm = data['vendas_mensais']; yoy = data['yoy']; produtos = data['produtos']
-    mes_nome, mes_num = get_mes_ref(yoy)
-    render_periodo_badge(mes_nome, 2026)
+    mes_nome, mes_num = get_mes_ref(data)
+    ref, ref_ant = get_rotulos(data)
+    render_periodo_badge(mes_nome, get_ano_ref(data))
     st.markdown("---")
 
-    fat = vm['Vlr_Venda'].sum(); lb = vm['Vlr_Lucro'].sum(); ll = lb - CUSTO_FIXO
+    agg = data['agg']; fat = agg['fat']; lb = agg['lucro']; ll = lb - CUSTO_FIXO
     mb = safe_div(lb, fat) * 100; mr = safe_div(ll, fat) * 100
     pe = safe_div(CUSTO_FIXO, mb / 100) if mb > 0 else 0
     folga = (safe_div(fat, pe) - 1) * 100 if pe > 0 else 0
-    cupons = vm['Qtde_Documentos'].sum(); tm = safe_div(fat, cupons)
+    cupons = agg['cupons']; tm = safe_div(fat, cupons)
     skus = len(produtos)
 
+    # Mesmo mês do ano anterior ao período selecionado; sem ele, as variações ficam em 0
     vr = vl = vc = vt = 0.0; c25 = r25 = t25 = 0.0
-    yoy_mes = yoy[yoy['Receita_2026'] > 0]
-    if not yoy_mes.empty:
-        row = yoy_mes.iloc[-1]
-        vr = row.get('Var_Receita_Pct', 0) or 0; vl = row.get('Var_Lucro_Pct', 0) or 0
-        c25 = row.get('Cupons_2025', 0) or 0; r25 = row.get('Receita_2025', 0) or 0
+    row = get_yoy_row(yoy, mes_num, get_ano_ref(data))
+    if row is not None:
+        c25 = row['cupons']; r25 = row['receita']
+        vr = safe_div(fat - r25, r25) * 100; vl = safe_div(lb - row['lucro'], row['lucro']) * 100
         t25 = safe_div(r25, c25); vc = safe_div(cupons - c25, c25) * 100; vt = safe_div(tm - t25, t25) * 100
 
     c1, c2, c3, c4 = st.columns(4)
-    with c1: render_kpi_card("Faturamento do Mês", f"R$ {fat:,.2f}", f"{delta_arrow(vr)} {vr:+.1f}% vs {mes_nome}/25", delta_color(vr))
+    with c1: render_kpi_card("Faturamento do Mês", f"R$ {fat:,.2f}", f"{delta_arrow(vr)} {vr:+.1f}% vs {ref_ant}", delta_color(vr))
     with c2: render_kpi_card("Lucro Líquido", f"R$ {ll:,.2f}", f"Bruto: R$ {lb:,.2f} − Fixo: R$ {CUSTO_FIXO:,.2f}")
     with c3:
         status = "✅ Saudável" if mr > 20 else ("⚠️ Atenção" if mr > 15 else "🔴 Crítico")
@@ -180,46 +249,52 @@ def page_resumo_executivo(data):
     with c4: render_kpi_card("Ponto de Equilíbrio", f"R$ {pe:,.0f}", f"Folga de {folga:.0f}%", "kpi-positive" if folga > 50 else "kpi-negative")
 
     c5, c6, c7, c8 = st.columns(4)
-    with c5: render_kpi_card("Nº de Cupons (Clientes)", f"{cupons:,.0f}", f"{delta_arrow(vc)} {vc:+.1f}% vs {mes_nome}/25", delta_color(vc))
-    with c6: render_kpi_card("Ticket Médio", f"R$ {tm:.2f}", f"{delta_arrow(vt)} {vt:+.1f}% vs {mes_nome}/25", delta_color(vt))
+    with c5: render_kpi_card("Nº de Cupons (Clientes)", f"{cupons:,.0f}", f"{delta_arrow(vc)} {vc:+.1f}% vs {ref_ant}", delta_color(vc))
+    with c6: render_kpi_card("Ticket Médio", f"R$ {tm:.2f}", f"{delta_arrow(vt)} {vt:+.1f}% vs {ref_ant}", delta_color(vt))
     with c7:
         ca = len(produtos[produtos['Curva'] == 'A']) if 'Curva' in produtos.columns else 0
         render_kpi_card("SKUs Ativos", f"{skus:,}", f"Curva A: {ca} produtos")
-    with c8: render_kpi_card("Variação YoY Lucro", f"{vl:+.1f}%", f"{delta_arrow(vl)} {vl:+.1f}% vs {mes_nome}/25", delta_color(vl))
+    with c8: render_kpi_card("Variação YoY Lucro", f"{vl:+.1f}%", f"{delta_arrow(vl)} {vl:+.1f}% vs {ref_ant}", delta_color(vl))
 
     render_tooltip("KPIs do Resumo Executivo",
         "Os 8 indicadores-chave do mês, comparados com o mesmo mês do ano anterior.",
         "Setas verdes (▲) = melhoria, vermelhas (▼) = piora, laranja (●) = estável (variação menor que ±2%).",
         "Permite em 5 segundos entender a saúde geral do mercado.",
-        f"Faturamento de {mes_nome}/26: R$ {fat:,.0f}. Em {mes_nome}/25: R$ {r25:,.0f}. Variação de {vr:+.1f}%.")
+        f"Faturamento de {ref}: R$ {fat:,.0f}. Em {ref_ant}: R$ {r25:,.0f}. Variação de {vr:+.1f}%.")
 
     if vr != 0:
         ef = "mais eficientes — vendemos menos, mas lucramos mais por real vendido" if abs(vl) < abs(vr) else "com desafios de margem"
-        render_story(f"Em {mes_nome}/26, o faturamento variou {vr:+.1f}% vs {mes_nome}/25, mas o lucro variou {vl:+.1f}%. Estamos {ef}. O fluxo de clientes variou {vc:+.0f}% e o ticket médio variou {vt:+.0f}%.")
+        render_story(f"Em {ref}, o faturamento variou {vr:+.1f}% vs {ref_ant}, mas o lucro variou {vl:+.1f}%. Estamos {ef}. O fluxo de clientes variou {vc:+.0f}% e o ticket médio variou {vt:+.0f}%.")
+    ant = data.get('anterior')
+    if ant is not None and not ant['vendas_mensais'].empty:
+        fa = ant['vendas_mensais']['Vlr_Venda'].sum(); la = ant['vendas_mensais']['Vlr_Lucro'].sum()
+        mes_ant = MESES_NOMES[int(partitions.previous_key(data['periodo']).split('-')[1])]
+        render_story(f"Mês a mês: faturamento {safe_div(fat - fa, fa)*100:+.1f}% e lucro bruto {safe_div(lb - la, la)*100:+.1f}% vs {mes_ant}.")
 
     st.markdown("---")
     col_left, col_right = st.columns([3, 2])
 
+    ano = get_ano_ref(data); ant = ano - 1
     with col_left:
-        render_section(f"Evolução Mensal — 2025 vs 2026 (mês a mês)")
+        render_section(f"Evolução Mensal — {ant} vs {ano} (mês a mês)")
         chart_data = []
         for _, r in yoy.iterrows():
-            if r['Receita_2025'] > 0: chart_data.append({'Mês': r['Mes'], 'Receita': r['Receita_2025'], 'Lucro': r['Lucro_2025'], 'Ano': '2025'})
-            if r['Receita_2026'] > 0: chart_data.append({'Mês': r['Mes'], 'Receita': r['Receita_2026'], 'Lucro': r['Lucro_2026'], 'Ano': '2026'})
+            for a in (ant, ano):
+                if r.get(f'Receita_{a}', 0) > 0: chart_data.append({'Mês': r['Mes'], 'Receita': r[f'Receita_{a}'], 'Lucro': r.get(f'Lucro_{a}', 0), 'Ano': a})
         if chart_data:
             dc = pd.DataFrame(chart_data); fig = make_subplots(specs=[[{"secondary_y": True}]])
-            d25 = dc[dc['Ano'] == '2025']; d26 = dc[dc['Ano'] == '2026']
-            fig.add_trace(go.Bar(x=d25['Mês'], y=d25['Receita'], name='Fat. 2025', marker_color='#D5DBDB', text=[f"R${v/1000:.0f}k" for v in d25['Receita']], textposition='outside', textfont_size=9))
-            if not d26.empty: fig.add_trace(go.Bar(x=d26['Mês'], y=d26['Receita'], name='Fat. 2026', marker_color=COLORS['yellow'], text=[f"R${v/1000:.0f}k" for v in d26['Receita']], textposition='outside', textfont_size=9))
-            fig.add_trace(go.Scatter(x=d25['Mês'], y=d25['Lucro'], name='Lucro 2025', line=dict(color=COLORS['green'], width=2, dash='dot'), mode='lines+markers'), secondary_y=True)
-            if not d26.empty: fig.add_trace(go.Scatter(x=d26['Mês'], y=d26['Lucro'], name='Lucro 2026', line=dict(color=COLORS['green_dark'], width=3), mode='lines+markers'), secondary_y=True)
+            d25 = dc[dc['Ano'] == ant]; d26 = dc[dc['Ano'] == ano]
+            fig.add_trace(go.Bar(x=d25['Mês'], y=d25['Receita'], name=f'Fat. {ant}', marker_color='#D5DBDB', text=[f"R${v/1000:.0f}k" for v in d25['Receita']], textposition='outside', textfont_size=9))
+            if not d26.empty: fig.add_trace(go.Bar(x=d26['Mês'], y=d26['Receita'], name=f'Fat. {ano}', marker_color=COLORS['yellow'], text=[f"R${v/1000:.0f}k" for v in d26['Receita']], textposition='outside', textfont_size=9))
+            fig.add_trace(go.Scatter(x=d25['Mês'], y=d25['Lucro'], name=f'Lucro {ant}', line=dict(color=COLORS['green'], width=2, dash='dot'), mode='lines+markers'), secondary_y=True)
+            if not d26.empty: fig.add_trace(go.Scatter(x=d26['Mês'], y=d26['Lucro'], name=f'Lucro {ano}', line=dict(color=COLORS['green_dark'], width=3), mode='lines+markers'), secondary_y=True)
             fig.update_layout(barmode='group', height=380, margin=dict(l=20,r=20,t=30,b=20), legend=dict(orientation="h",y=-0.15), plot_bgcolor='white', yaxis_title="Faturamento (R$)")
             fig.update_yaxes(title_text="Lucro (R$)", secondary_y=True)
-            st.plotly_chart(fig, use_container_width=True)
-        render_tooltip("Evolução Mensal 2025 vs 2026", "Barras cinzas = 2025. Barras amarelas = 2026. Linhas = lucro.", "Compare cada mês lado a lado.", "Identifica tendências de crescimento ou queda.", f"Se {mes_nome}/26 (amarelo) está menor que {mes_nome}/25 (cinza), o faturamento caiu.")
+            perf.plotly_chart(fig, use_container_width=True)
+        render_tooltip(f"Evolução Mensal {ant} vs {ano}", f"Barras cinzas = {ant}. Barras amarelas = {ano}. Linhas = lucro.", "Compare cada mês lado a lado.", "Identifica tendências de crescimento ou queda.", f"Se {ref} (amarelo) está menor que {ref_ant} (cinza), o faturamento caiu.")
 
     with col_right:
-        render_section(f"Participação por Categoria ({mes_nome}/26)")
+        render_section(f"Participação por Categoria ({ref})")
         vms = vm.sort_values('Vlr_Venda', ascending=False)
         def mc(md):
             if md > 55: return COLORS['green_dark']
@@ -229,17 +304,17 @@ def page_resumo_executivo(data):
         vms['Color'] = vms['Markdown_Pct'].apply(mc)
         fig_tree = go.Figure(go.Treemap(labels=vms['Categoria'], parents=['']*len(vms), values=vms['Vlr_Venda'], texttemplate="<b>%{label}</b><br>R$%{value:,.0f}", marker=dict(colors=vms['Color']), hovertemplate="<b>%{label}</b><br>R$%{value:,.2f}<extra></extra>"))
         fig_tree.update_layout(height=380, margin=dict(l=10,r=10,t=10,b=10))
-        st.plotly_chart(fig_tree, use_container_width=True)
+        perf.plotly_chart(fig_tree, use_container_width=True)
         st.caption("🟢 Margem > 55%  |  🟡 40-55%  |  🟠 30-40%  |  🔴 < 30%")
         render_tooltip("Treemap por Categoria", "Tamanho = faturamento. Cor = margem.", "Blocos grandes + verdes = categorias fortes.", "Mostra de onde vem o dinheiro e se é lucrativo.")
 
-    render_section(f"Top 10 Produtos por Lucro — {mes_nome}/26")
+    render_section(f"Top 10 Produtos por Lucro — {ref}")
     top10 = produtos.nlargest(10, 'Lucro_Total'); top10['Custo'] = top10['Receita_Total'] - top10['Lucro_Total']
     fig_top = go.Figure()
     fig_top.add_trace(go.Bar(y=top10['Produto'], x=top10['Custo'], name='Custo', orientation='h', marker_color='#D5DBDB'))
     fig_top.add_trace(go.Bar(y=top10['Produto'], x=top10['Lucro_Total'], name='Lucro', orientation='h', marker_color=COLORS['green'], text=[f"R$ {v:,.0f}" for v in top10['Lucro_Total']], textposition='outside', textfont_size=10))
     fig_top.update_layout(barmode='stack', height=350, margin=dict(l=10,r=80,t=10,b=10), legend=dict(orientation="h",y=-0.1), plot_bgcolor='white', yaxis=dict(autorange="reversed"), xaxis_title="R$")
-    st.plotly_chart(fig_top, use_container_width=True)
+    perf.plotly_chart(fig_top, use_container_width=True)
     lt = top10['Lucro_Total'].sum(); ltot = produtos['Lucro_Total'].sum(); pct = safe_div(lt, ltot) * 100
     render_tooltip("Top 10 por Lucro", "Os 10 produtos mais lucrativos. Cinza = custo, verde = lucro.", "Quanto mais verde, melhor a margem.", "Proteger estoque e preço desses produtos a todo custo.", f"Juntos representam {pct:.0f}% do lucro total.")
     render_story(f"Os 10 produtos mais lucrativos representam {pct:.0f}% do lucro. {top10.iloc[0]['Produto']} lidera com R$ {top10.iloc[0]['Lucro_Total']:,.0f}.")
@@ -248,13 +323,14 @@ def page_resumo_executivo(data):
 # ============================================================
 # PÁGINA 2: INTELIGÊNCIA DE PREÇOS
 # ============================================================
+@perf.instrument_page
 def page_inteligencia_precos(data):
     st.markdown("## 💰 Inteligência de Preços")
     st.markdown("*Onde estou deixando dinheiro na mesa?*")
-    mes_nome, _ = get_mes_ref(data['yoy']); render_periodo_badge(mes_nome, 2026); st.markdown("---")
+    mes_nome, _ = get_mes_ref(data); render_periodo_badge(mes_nome, get_ano_ref(data)); st.markdown("---")
+    ref, _ = get_rotulos(data)
     vm = data['vendas_mensais']; erosao = data['erosao']; produtos = data['produtos']
-    tv = vm['Vlr_Venda'].sum()
-    mdm = safe_div((vm['Vlr_Venda'] * vm['Markdown_Pct'] / 100).sum(), tv) * 100
+    mdm = data['agg']['markdown']
     cs = erosao[erosao['Alerta'].str.contains('SUBIU', na=False)]
     cc = erosao[erosao['Alerta'].str.contains('CAIU', na=False)]
     ca = produtos[produtos['Curva'] == 'A']; mb = ca[ca['Margem_Media'] < 35]
@@ -270,43 +346,39 @@ def page_inteligencia_precos(data):
 
     cl, cr = st.columns([3, 2])
     with cl:
-        render_section(f"Duelo de Produtos ({mes_nome}/26)")
-        cap = ca[ca['Receita_Total'] > 50].copy()
-        fig = px.scatter(cap, x='Receita_Total', y='Margem_Media', size='Lucro_Total', color='Classificacao', hover_name='Produto',
+        render_section(f"Duelo de Produtos ({ref})")
+        cap = ca[ca['Receita_Total'] > 50]
+        fig = charts.scatter_produtos(cap, x='Receita_Total', y='Margem_Media', size='Lucro_Total', color='Classificacao', rank_by='Receita_Total',
             hover_data={'Receita_Total':':.2f','Lucro_Total':':.2f','Margem_Media':':.1f','Dias_Vendidos':True},
-            color_discrete_map={'⭐ Estrela':COLORS['green'],'💰 Gerador de Caixa':COLORS['yellow'],'🔍 Oportunidade':COLORS['blue'],'⚠️ Peso Morto':COLORS['red']}, size_max=30)
+            color_discrete_map={'⭐ Estrela':COLORS['green'],'💰 Gerador de Caixa':COLORS['yellow'],'🔍 Oportunidade':COLORS['blue'],'⚠️ Peso Morto':COLORS['red']}, size_max=30,
+            agrupar_cauda=render_toggle_cauda(len(cap), 'cauda_precos'))
         ar = cap['Receita_Total'].mean()
         fig.add_hline(y=mdm, line_dash="dash", line_color="#999", annotation_text=f"Margem: {mdm:.0f}%")
         fig.add_vline(x=ar, line_dash="dash", line_color="#999", annotation_text=f"Receita: R${ar:.0f}")
         fig.update_layout(height=450, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), xaxis_title="Faturamento (R$)", yaxis_title="Margem (%)", legend=dict(orientation="h",y=-0.15))
-        st.plotly_chart(fig, use_container_width=True)
+        perf.plotly_chart(fig, use_container_width=True)
         render_tooltip("Scatter Plot de Preços", "Cada bolha = produto Curva A. X = faturamento. Y = margem. Tamanho = lucro.", "Superior direito = melhor. Inferior direito = vende mas não lucra.", "Identifica onde reajustar preço.", "Produto com alto faturamento e margem 15% precisa de reajuste.")
 
     with cr:
-        render_section(f"Ranking Margem por Categoria ({mes_nome}/26)")
-        crk = vm[['Categoria','Vlr_Venda','Vlr_Lucro','Markdown_Pct']].copy()
-        crk = crk.sort_values('Markdown_Pct', ascending=False)
+        render_section(f"Ranking Margem por Categoria ({ref})")
+        crk = vm[['Categoria','Vlr_Venda','Vlr_Lucro','Markdown_Pct']].sort_values('Markdown_Pct', ascending=False)
         crk['Status'] = crk['Markdown_Pct'].apply(lambda x: '🟢' if x > 55 else ('🟡' if x > 40 else '🔴'))
         crk['Fat.'] = crk['Vlr_Venda'].apply(lambda x: f"R$ {x:,.0f}")
         crk['Markdown'] = crk['Markdown_Pct'].apply(lambda x: f"{x:.1f}%")
-        st.dataframe(crk[['Status','Categoria','Fat.','Markdown']].reset_index(drop=True), use_container_width=True, height=420, hide_index=True)
+        perf.dataframe(crk[['Status','Categoria','Fat.','Markdown']].reset_index(drop=True), use_container_width=True, height=420, hide_index=True)
         render_tooltip("Ranking por Categoria", "24 categorias ordenadas por margem. 🟢>55% 🟡40-55% 🔴<40%.", "Categorias 🔴 com alto faturamento são as mais urgentes.", "Renegociar fornecedores ou reajustar preços.")
 
-    render_section(f"🚨 Alerta de Erosão — Curva A ({mes_nome}/26)")
+    render_section(f"🚨 Alerta de Erosão — Curva A ({ref})")
     st.markdown("*Produtos onde o custo de reposição mudou significativamente.*")
     t1, t2 = st.tabs(["🔴 Custo Subiu", "🟢 Custo Caiu"])
     with t1:
         if not cs.empty:
-            df = cs[['Produto','Vlr_Venda','Margem_Pct','Markdown_Pct','Markdown_Ult_Entrada','Erosao_Margem']].copy()
-            df.columns = ['Produto','Faturamento','Margem %','Markdown Atual','Markdown Ult. Entrada','Erosão (pts)']
-            st.dataframe(df.sort_values('Erosão (pts)', ascending=False).reset_index(drop=True), use_container_width=True, hide_index=True)
+            tables.render_paginated_table(cs, 'erosao_subiu', COLS_EROSAO, 'Erosao_Margem', ascending=False)
             render_story(f"{len(cs)} produtos com custo subindo. Reajustar preço para proteger margem futura.")
         else: st.success("Nenhum produto com custo subindo!")
     with t2:
         if not cc.empty:
-            df = cc[['Produto','Vlr_Venda','Margem_Pct','Markdown_Pct','Markdown_Ult_Entrada','Erosao_Margem']].copy()
-            df.columns = ['Produto','Faturamento','Margem %','Markdown Atual','Markdown Ult. Entrada','Erosão (pts)']
-            st.dataframe(df.sort_values('Erosão (pts)').reset_index(drop=True), use_container_width=True, hide_index=True)
+            tables.render_paginated_table(cc, 'erosao_caiu', COLS_EROSAO, 'Erosao_Margem', ascending=True)
             render_story(f"{len(cc)} produtos com custo caindo. Mantenha preço para aumentar margem!")
         else: st.info("Nenhum produto com custo caindo.")
     render_tooltip("Erosão de Margem", "Compara markdown atual vs última entrada. Diferença = tendência do custo.", "Positivo = custo subiu (ruim). Negativo = custo caiu (bom).", "Alerta antecipado do que VAI acontecer com a margem.", "Açúcar com markdown 53% atual e 40% última entrada = custo subiu, margem vai cair.")
@@ -315,10 +387,12 @@ def page_inteligencia_precos(data):
 # ============================================================
 # PÁGINA 3: MAPA DE PRODUTOS
 # ============================================================
+@perf.instrument_page
 def page_mapa_produtos(data):
     st.markdown("## 🗺️ Mapa de Produtos — Matriz de Rentabilidade")
     st.markdown("*Quais produtos são estrelas e quais são peso morto?*")
-    mes_nome, _ = get_mes_ref(data['yoy']); render_periodo_badge(mes_nome, 2026); st.markdown("---")
+    mes_nome, _ = get_mes_ref(data); render_periodo_badge(mes_nome, get_ano_ref(data)); st.markdown("---")
+    ref, _ = get_rotulos(data)
     p = data['produtos']
     est = p[p['Classificacao'].str.contains('Estrela')]; ger = p[p['Classificacao'].str.contains('Gerador')]
     opo = p[p['Classificacao'].str.contains('Oportunidade')]; pm = p[p['Classificacao'].str.contains('Peso Morto')]
@@ -334,11 +408,13 @@ def page_mapa_produtos(data):
     render_story(f"Apenas {n80} produtos (de {len(p):,}) geram 80% do lucro. As {len(est)} Estrelas são intocáveis.")
     st.markdown("---")
 
-    render_section(f"Matriz de Rentabilidade ({mes_nome}/26)")
-    pp = p[p['Receita_Total'] > 20].copy()
-    fig = px.scatter(pp, x='Giro', y='Margem_Media', size='Receita_Total', color='Classificacao', hover_name='Produto',
+    render_section(f"Matriz de Rentabilidade ({ref})")
+    pp = p[p['Receita_Total'] > 20]
+    agrupar = render_toggle_cauda(len(pp), 'cauda_mapa')
+    fig = charts.scatter_produtos(pp, x='Giro', y='Margem_Media', size='Receita_Total', color='Classificacao', rank_by='Receita_Total',
         hover_data={'Receita_Total':':.2f','Lucro_Total':':.2f','Dias_Vendidos':True,'Curva':True},
-        color_discrete_map={'⭐ Estrela':COLORS['green'],'💰 Gerador de Caixa':COLORS['yellow'],'🔍 Oportunidade':COLORS['blue'],'⚠️ Peso Morto':'#CCCCCC'}, size_max=35)
+        color_discrete_map={'⭐ Estrela':COLORS['green'],'💰 Gerador de Caixa':COLORS['yellow'],'🔍 Oportunidade':COLORS['blue'],'⚠️ Peso Morto':'#CCCCCC'}, size_max=35,
+        agrupar_cauda=agrupar)
     fig.add_hline(y=50, line_dash="dash", line_color="#999", annotation_text="Margem 50%")
     fig.add_vline(x=0.6, line_dash="dash", line_color="#999", annotation_text="Giro 60%")
     fig.add_annotation(x=0.85,y=85,text="⭐ ESTRELAS",showarrow=False,font=dict(size=12,color=COLORS['green']))
@@ -346,99 +422,98 @@ def page_mapa_produtos(data):
     fig.add_annotation(x=0.15,y=85,text="🔍 OPORTUNIDADES",showarrow=False,font=dict(size=12,color=COLORS['blue']))
     fig.add_annotation(x=0.15,y=15,text="⚠️ PESO MORTO",showarrow=False,font=dict(size=12,color=COLORS['red']))
     fig.update_layout(height=500, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), xaxis_title="Giro (% dias com venda)", yaxis_title="Margem (%)", xaxis=dict(range=[-0.05,1.05], tickformat='.0%'), legend=dict(orientation="h",y=-0.12))
-    st.plotly_chart(fig, use_container_width=True)
+    perf.plotly_chart(fig, use_container_width=True)
     render_tooltip("Scatter Plot Giro vs Margem", "Cada bolha = produto. X = giro. Y = margem. Tamanho = faturamento.", "Superior direito = ⭐. Inferior direito = 💰. Passe o mouse para ver detalhes.", "Ferramenta principal para decisões de mix.")
+    if charts.resolve_modo(len(pp), agrupar) == 'densidade':
+        st.caption("📦 Catálogo grande: os principais produtos por faturamento aparecem como bolhas; os demais estão agregados na grade cinza.")
 
     cl, cr = st.columns(2)
     with cl:
         render_section("⭐ Estrelas")
         if not est.empty:
-            df = est[['Produto','Dias_Vendidos','Margem_Media','Receita_Total','Lucro_Total']].copy()
-            df.columns = ['Produto','Dias','Margem %','Receita','Lucro']
-            st.dataframe(df.sort_values('Lucro', ascending=False).reset_index(drop=True), use_container_width=True, hide_index=True)
+            tables.render_paginated_table(est, 'tab_estrelas', COLS_PRODUTO, 'Lucro_Total')
         render_section("🔍 Oportunidades (Top 15)")
         ot = opo.nlargest(15, 'Lucro_Total')
         if not ot.empty:
-            df = ot[['Produto','Dias_Vendidos','Margem_Media','Receita_Total','Lucro_Total']].copy()
+            df = ot[['Produto','Dias_Vendidos','Margem_Media','Receita_Total','Lucro_Total']]
             df.columns = ['Produto','Dias','Margem %','Receita','Lucro']
-            st.dataframe(df.reset_index(drop=True), use_container_width=True, hide_index=True)
+            perf.dataframe(df.reset_index(drop=True), use_container_width=True, hide_index=True)
     with cr:
         render_section("💰 Geradores de Caixa")
         if not ger.empty:
-            df = ger[['Produto','Dias_Vendidos','Margem_Media','Receita_Total','Lucro_Total']].copy()
-            df.columns = ['Produto','Dias','Margem %','Receita','Lucro']
-            st.dataframe(df.sort_values('Receita', ascending=False).reset_index(drop=True), use_container_width=True, hide_index=True)
+            tables.render_paginated_table(ger, 'tab_geradores', COLS_PRODUTO, 'Receita_Total')
         render_section("⚠️ Peso Morto (Top 15)")
         pmt = pm.nlargest(15, 'Receita_Total')
         if not pmt.empty:
-            df = pmt[['Produto','Dias_Vendidos','Margem_Media','Receita_Total','Lucro_Total']].copy()
+            df = pmt[['Produto','Dias_Vendidos','Margem_Media','Receita_Total','Lucro_Total']]
             df.columns = ['Produto','Dias','Margem %','Receita','Lucro']
-            st.dataframe(df.reset_index(drop=True), use_container_width=True, hide_index=True)
+            perf.dataframe(df.reset_index(drop=True), use_container_width=True, hide_index=True)
 
 # ============================================================
 # PÁGINA 4: DIAGNÓSTICO DE FATURAMENTO
 # ============================================================
+@perf.instrument_page
 def page_diagnostico(data):
     st.markdown("## 🔍 Diagnóstico de Faturamento")
     st.markdown("*Menos clientes, menos gasto, ou mix mudou?*")
-    yoy = data['yoy']; mes_nome, _ = get_mes_ref(yoy); render_periodo_badge(mes_nome, 2026); st.markdown("---")
-    vm = data['vendas_mensais']; vd = data['vendas_diarias']
-    fat = vm['Vlr_Venda'].sum(); cup = vm['Qtde_Documentos'].sum(); tk = safe_div(fat, cup)
-    yoy_mes = yoy[yoy['Receita_2026'] > 0]
+    yoy = data['yoy']; mes_nome, mes_num = get_mes_ref(data); render_periodo_badge(mes_nome, get_ano_ref(data)); st.markdown("---")
+    ref, ref_ant = get_rotulos(data)
+    vm = data['vendas_mensais']; diario = data['agg']['diario']
+    fat = data['agg']['fat']; cup = data['agg']['cupons']; tk = safe_div(fat, cup)
+    r = get_yoy_row(yoy, mes_num, get_ano_ref(data))
     c25 = t25 = vc = vt = r25 = 0.0
-    if not yoy_mes.empty:
-        r = yoy_mes.iloc[-1]; c25 = r.get('Cupons_2025',0) or 0; r25 = r.get('Receita_2025',0) or 0
+    if r is not None:
+        c25 = r['cupons']; r25 = r['receita']
         t25 = safe_div(r25, c25); vc = safe_div(cup - c25, c25)*100; vt = safe_div(tk - t25, t25)*100
 
     c1, c2, c3, c4 = st.columns(4)
     with c1: render_kpi_card("FATURAMENTO =", f"R$ {fat:,.0f}", "Cupons × Ticket Médio")
-    with c2: render_kpi_card("Nº Cupons", f"{cup:,.0f}", f"{delta_arrow(vc)} {vc:+.0f}% vs {mes_nome}/25", delta_color(vc))
-    with c3: render_kpi_card("× Ticket Médio", f"R$ {tk:.2f}", f"{delta_arrow(vt)} {vt:+.0f}% vs {mes_nome}/25", delta_color(vt))
+    with c2: render_kpi_card("Nº Cupons", f"{cup:,.0f}", f"{delta_arrow(vc)} {vc:+.0f}% vs {ref_ant}", delta_color(vc))
+    with c3: render_kpi_card("× Ticket Médio", f"R$ {tk:.2f}", f"{delta_arrow(vt)} {vt:+.0f}% vs {ref_ant}", delta_color(vt))
     with c4:
         if r25 > 0 and c25 > 0:
             ic = (cup - c25)*t25; it = (tk - t25)*cup
             render_kpi_card("Diagnóstico", "Fluxo ↓" if abs(ic) > abs(it) else "Ticket ↓", f"Cupons: R$ {ic:+,.0f} | Ticket: R$ {it:+,.0f}")
         else: render_kpi_card("Diagnóstico", "—", "Sem dados YoY")
-    render_tooltip("Decomposição do Faturamento", "FAT = Cupons × Ticket. Se caiu, ou veio menos gente ou gastou menos.", "'Fluxo ↓' = problema de atração. 'Ticket ↓' = problema de gasto por cliente.", "Fluxo → marketing/fachada. Ticket → cross-selling/mix.", f"{mes_nome}/26: {cup:,.0f} × R$ {tk:.2f}. {mes_nome}/25: {c25:,.0f} × R$ {t25:.2f}.")
-    render_story(f"Faturamento = {cup:,.0f} cupons × R$ {tk:.2f}. Fluxo variou {vc:+.0f}% e ticket variou {vt:+.0f}% vs {mes_nome}/25.")
+    render_tooltip("Decomposição do Faturamento", "FAT = Cupons × Ticket. Se caiu, ou veio menos gente ou gastou menos.", "'Fluxo ↓' = problema de atração. 'Ticket ↓' = problema de gasto por cliente.", "Fluxo → marketing/fachada. Ticket → cross-selling/mix.", f"{ref}: {cup:,.0f} × R$ {tk:.2f}. {ref_ant}: {c25:,.0f} × R$ {t25:.2f}.")
+    render_story(f"Faturamento = {cup:,.0f} cupons × R$ {tk:.2f}. Fluxo variou {vc:+.0f}% e ticket variou {vt:+.0f}% vs {ref_ant}.")
     st.markdown("---")
 
     cl, cr = st.columns(2)
     with cl:
-        render_section(f"Contribuição por Categoria ({mes_nome}/26)")
+        render_section(f"Contribuição por Categoria ({ref})")
         vw = vm[['Categoria','Vlr_Venda','Vlr_Lucro']].sort_values('Vlr_Venda', ascending=False).head(12)
         fig = go.Figure(go.Bar(x=vw['Categoria'], y=vw['Vlr_Venda'], marker_color=[COLORS['green'] if l>0 else COLORS['red'] for l in vw['Vlr_Lucro']], text=[f"R${v:,.0f}" for v in vw['Vlr_Venda']], textposition='outside', textfont_size=9))
         fig.update_layout(height=380, plot_bgcolor='white', margin=dict(l=10,r=10,t=10,b=80), xaxis_tickangle=-45, yaxis_title="Faturamento (R$)")
-        st.plotly_chart(fig, use_container_width=True)
+        perf.plotly_chart(fig, use_container_width=True)
         render_tooltip("Contribuição por Categoria", "Top 12 categorias. Verde = lucro positivo.", "Barras mais altas = mais faturamento.", "Identifica motores do faturamento.")
 
     with cr:
-        render_section(f"Heatmap por Dia ({mes_nome}/26)")
-        vc = vd.copy(); vc['Data'] = pd.to_datetime(vc['Data']); vc['Dia_Semana'] = vc['Data'].dt.day_name()
-        dm = {'Monday':'Segunda','Tuesday':'Terça','Wednesday':'Quarta','Thursday':'Quinta','Friday':'Sexta','Saturday':'Sábado','Sunday':'Domingo'}
-        vc['DSP'] = vc['Dia_Semana'].map(dm); do = ['Segunda','Terça','Quarta','Quinta','Sexta','Sábado','Domingo']
-        ds = vc.groupby([vc['Data'].dt.isocalendar().week.rename('Sem'),'DSP'])['Vlr_Venda'].sum().reset_index()
+        render_section(f"Heatmap por Dia ({ref})")
+        do = ['Segunda','Terça','Quarta','Quinta','Sexta','Sábado','Domingo']
+        ds = diario.groupby(['Sem','DSP'])['Vlr_Venda'].sum().reset_index()
         hp = ds.pivot(index='Sem', columns='DSP', values='Vlr_Venda').fillna(0)
         hp = hp.reindex(columns=[d for d in do if d in hp.columns])
         fig = px.imshow(hp.values, x=hp.columns, y=[f"Sem {int(s)}" for s in hp.index], color_continuous_scale='YlOrRd', labels=dict(x="Dia",y="Semana",color="Fat."), text_auto='.0f')
         fig.update_layout(height=380, margin=dict(l=10,r=10,t=10,b=10))
-        st.plotly_chart(fig, use_container_width=True)
-        render_tooltip("Heatmap Semanal", f"Faturamento de cada dia de {mes_nome}/26.", "Cores quentes = dias fortes. Frias = fracos.", "Identifica padrões semanais e dias atípicos.")
+        perf.plotly_chart(fig, use_container_width=True)
+        render_tooltip("Heatmap Semanal", f"Faturamento de cada dia de {ref}.", "Cores quentes = dias fortes. Frias = fracos.", "Identifica padrões semanais e dias atípicos.")
 
-    render_section(f"Faturamento Médio por Dia ({mes_nome}/26)")
-    da = vc.groupby('DSP').agg(FT=('Vlr_Venda','sum'), D=('Data','nunique')).reset_index()
+    render_section(f"Faturamento Médio por Dia ({ref})")
+    da = diario.groupby('DSP').agg(FT=('Vlr_Venda','sum'), D=('Data','nunique')).reset_index()
     da['FM'] = da['FT'] / da['D']
     da['DSP'] = pd.Categorical(da['DSP'], categories=do, ordered=True); da = da.sort_values('DSP')
     fig = go.Figure(go.Bar(x=da['DSP'], y=da['FM'], marker_color=[COLORS['yellow'] if d!='Domingo' else COLORS['red'] for d in da['DSP']], text=[f"R$ {v:,.0f}" for v in da['FM']], textposition='outside'))
     fig.update_layout(height=280, plot_bgcolor='white', margin=dict(l=10,r=10,t=10,b=10), yaxis_title="Fat. Médio (R$)")
-    st.plotly_chart(fig, use_container_width=True)
+    perf.plotly_chart(fig, use_container_width=True)
     bd = da.loc[da['FM'].idxmax(),'DSP'] if not da.empty else "N/A"; wd = da.loc[da['FM'].idxmin(),'DSP'] if not da.empty else "N/A"
-    render_tooltip("Faturamento por Dia da Semana", f"Média diária em {mes_nome}/26. Domingo em vermelho.", "Barras altas = dias fortes. Use para planejar estoque.", "Promoções nos dias fracos, reforço nos fortes.")
+    render_tooltip("Faturamento por Dia da Semana", f"Média diária em {ref}. Domingo em vermelho.", "Barras altas = dias fortes. Use para planejar estoque.", "Promoções nos dias fracos, reforço nos fortes.")
     render_story(f"{bd} é o mais forte, {wd} o mais fraco. Promoções para {wd}, reforço de estoque para {bd}.")
 
 # ============================================================
 # PÁGINA 5: SAZONALIDADE
 # ============================================================
+@perf.instrument_page
 def page_sazonalidade(data):
     st.markdown("## 📈 Sazonalidade e Tendências")
     st.markdown("*Padrão de 2025 para planejar 2026*"); st.markdown("---")
@@ -470,119 +545,152 @@ def page_sazonalidade(data):
         if rv26: fig.add_trace(go.Scatter(x=ml26, y=rv26, name='2026 (real)', mode='lines+markers+text', line=dict(color=COLORS['yellow'],width=3), marker=dict(size=12,symbol='diamond'), text=[f"R${v/1000:.0f}k" for v in rv26], textposition='bottom center', textfont_size=10))
         fig.add_hline(y=fmm25, line_dash="dot", line_color="#CCC", annotation_text=f"Média 2025: R${fmm25/1000:.0f}k")
         fig.update_layout(height=400, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), yaxis_title="Faturamento (R$)", legend=dict(orientation="h",y=-0.1))
-        st.plotly_chart(fig, use_container_width=True)
+        perf.plotly_chart(fig, use_container_width=True)
         render_tooltip("Sazonalidade 2025 vs 2026", "Cinza = 2025. Losangos amarelos = 2026 real. Linha pontilhada = média 2025.", "Compare o losango de 2026 com o ponto do MESMO mês de 2025.", "2025 mostra o padrão. Se Março/25 foi pico, espere algo similar em 2026.")
 
     with cr:
         render_section("Índice de Sazonalidade — 2025")
-        ys = yoy.copy(); ys['Idx'] = ys['Receita_2025'].apply(lambda x: safe_div(x, fmm25))
+        ys = yoy.assign(Idx=yoy['Receita_2025'].apply(lambda x: safe_div(x, fmm25)))
         fig = go.Figure(go.Bar(x=MESES_LABELS, y=ys['Idx'], marker_color=[COLORS['green'] if v>1 else COLORS['red'] for v in ys['Idx']], text=[f"{v:.2f}" for v in ys['Idx']], textposition='outside', textfont_size=10))
         fig.add_hline(y=1, line_dash="solid", line_color="#999", line_width=2)
         fig.update_layout(height=400, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), yaxis_title="Índice (1.00 = média)")
-        st.plotly_chart(fig, use_container_width=True)
+        perf.plotly_chart(fig, use_container_width=True)
         render_tooltip("Índice de Sazonalidade", "Cada barra = faturamento do mês ÷ média anual de 2025. 1.00 = exatamente na média.", "Verde (>1.00) = mês forte. Vermelho (<1.00) = mês fraco. Ex: 1.15 = 15% acima da média.", "Prever meses fortes e fracos de 2026.", f"Média 2025: R$ {fmm25:,.0f}. Índice 1.20 = ~R$ {fmm25*1.2:,.0f}.")
 
     render_section("Mix de Produtos — 2025 (Completo)")
-    sp = yoy[['Mes','SKUs_2025']].copy(); sp = sp[sp['SKUs_2025']>0]
+    sp = yoy[['Mes','SKUs_2025']]; sp = sp[sp['SKUs_2025']>0]
     if not sp.empty:
         fig = go.Figure(go.Scatter(x=sp['Mes'], y=sp['SKUs_2025'], mode='lines+markers+text', line=dict(color=COLORS['blue'],width=2), marker=dict(size=10), text=sp['SKUs_2025'].astype(int).astype(str), textposition='top center'))
         fig.update_layout(height=280, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), yaxis_title="Nº SKUs")
-        st.plotly_chart(fig, use_container_width=True)
+        perf.plotly_chart(fig, use_container_width=True)
         p1=sp.iloc[0]['SKUs_2025']; u1=sp.iloc[-1]['SKUs_2025']
         render_tooltip("Evolução do Mix", f"SKUs vendidos por mês em 2025.", "Linha descendo = menos variedade.", "Menos produtos = menos motivos para o cliente.", f"De {int(p1)} para {int(u1)} ({int(u1-p1)}).")
         render_story(f"Mix encolheu de {int(p1)} para {int(u1)} SKUs em 2025 ({int(u1-p1)}).")
 
-    render_section("Tendência — 12 Meses Móveis")
-    ra = yoy['Receita_2025'].tolist()
-    for _, r in yoy.iterrows():
-        if r['Receita_2026'] > 0: ra.append(r['Receita_2026'])
-    if len(ra) >= 12:
-        rol = []; lbl = []
-        for i in range(11, len(ra)):
-            rol.append(sum(ra[max(0,i-11):i+1]))
-            lbl.append((MESES_LABELS[i]+'/25') if i < 12 else (MESES_LABELS[i-12]+'/26'))
-        fig = go.Figure(go.Scatter(x=lbl, y=rol, mode='lines+markers', line=dict(color=COLORS['blue'],width=3), fill='tozeroy', fillcolor='rgba(46,134,193,0.1)'))
-        fig.update_layout(height=280, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), yaxis_title="Fat. Acum. 12m (R$)")
-        st.plotly_chart(fig, use_container_width=True)
-        render_tooltip("12 Meses Móveis", "Soma dos últimos 12 meses em cada ponto. Elimina sazonalidade.", "Subindo = negócio crescendo. Descendo = encolhendo.", "Melhor indicador de tendência real.")
+    render_section("Tendência — Janelas Móveis")
+    c1, c2, c3, c4 = st.columns([1, 2, 1, 2])
+    niveis = {'Loja': 'total', 'Categoria': 'categoria', 'Produto': 'produto'}
+    with c1: nivel = niveis[st.radio("Nível", list(niveis), horizontal=True, key='rol_nivel')]
+    with c3: janela = st.select_slider("Janela (meses)", rolling.JANELAS, value=12, key='rol_janela')
+    rol = get_store().rolling(janela); rol = rol[rol['Nivel']==nivel]
+    with c2: serie = st.selectbox("Série", sorted(rol['Serie'].unique()), key=f'rol_serie_{nivel}', disabled=nivel=='total')
+    rol = rol[(rol['Serie']==serie) & rol['Soma_Movel'].notna()]
+    anos = sorted(rol['Data'].dt.year.unique())
+    with c4:
+        if len(anos) > 1: a0, a1 = st.select_slider("Anos", anos, value=(anos[0], anos[-1]), key='rol_anos'); rol = rol[rol['Data'].dt.year.between(a0, a1)]
+    if not rol.empty:
+        fig = make_subplots(specs=[[{"secondary_y": True}]])
+        fig.add_trace(go.Scatter(x=rol['Rotulo'], y=rol['Soma_Movel'], name=f'Acum. {janela}m', mode='lines+markers', line=dict(color=COLORS['blue'],width=3), fill='tozeroy', fillcolor='rgba(46,134,193,0.1)'), secondary_y=False)
+        if rol['Var_YoY_Movel'].notna().any(): fig.add_trace(go.Scatter(x=rol['Rotulo'], y=rol['Var_YoY_Movel']*100, name='Var. vs ano anterior (%)', mode='lines', line=dict(color=COLORS['orange'],width=2,dash='dot')), secondary_y=True)
+        fig.update_layout(height=300, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), legend=dict(orientation="h",y=-0.15))
+        fig.update_yaxes(title_text=f"Fat. Acum. {janela}m (R$)", secondary_y=False); fig.update_yaxes(title_text="Var. YoY (%)", secondary_y=True)
+        perf.plotly_chart(fig, use_container_width=True)
+        render_tooltip("Janelas Móveis", f"Soma dos últimos {janela} meses em cada ponto. Com 12 meses elimina a sazonalidade.", "Subindo = crescendo. Linha laranja = mesma soma comparada com 12 meses antes.", "Melhor indicador de tendência real.")
         if len(rol)>1:
-            tp = safe_div(rol[-1]-rol[0], rol[0])*100
-            render_story(f"Faturamento 12m: R$ {rol[-1]:,.0f}. Tendência {'subindo' if tp>0 else 'caindo'} ({tp:+.1f}%).")
+            tp = safe_div(rol['Soma_Movel'].iloc[-1]-rol['Soma_Movel'].iloc[0], rol['Soma_Movel'].iloc[0])*100
+            render_story(f"Faturamento {janela}m ({serie}): R$ {rol['Soma_Movel'].iloc[-1]:,.0f} em {rol['Rotulo'].iloc[-1]}. Tendência {'subindo' if tp>0 else 'caindo'} ({tp:+.1f}%) desde {rol['Rotulo'].iloc[0]}.")
+    else: st.info(f"Histórico insuficiente para uma janela de {janela} meses nesta série.")
 
 
 # ============================================================
 # PÁGINA 6: VISÃO FUTURISTA (NOVA!)
 # ============================================================
+@perf.instrument_page
 def page_visao_futurista(data):
     st.markdown("## 🔮 Visão Futurista — Cenários e Projeções")
     st.markdown("*Baseado nos dados, o que esperar e como se preparar?*"); st.markdown("---")
     CUSTO_FIXO = get_custo_fixo(); yoy = data['yoy']; vm = data['vendas_mensais']; produtos = data['produtos']
-    mes_nome, mes_num = get_mes_ref(yoy)
-    fat = vm['Vlr_Venda'].sum(); lb = vm['Vlr_Lucro'].sum(); mg = safe_div(lb, fat) * 100
-    fmm25 = safe_div(yoy['Receita_2025'].sum(), 12)
-
-    # Índices de sazonalidade e fator de ajuste
-    idx_saz = {}
-    for _, r in yoy.iterrows():
-        if fmm25 > 0 and r['Receita_2025'] > 0:
-            idx_saz[int(r['Mes_Num'])] = r['Receita_2025'] / fmm25
-    md = yoy[yoy['Receita_2026'] > 0]
-    fa = 1.0
-    if not md.empty:
-        r26 = md['Receita_2026'].sum(); r25eq = md['Receita_2025'].sum()
-        if r25eq > 0: fa = r26 / r25eq
-
-    # Projeções
-    proj = []
-    for m in range(1, 13):
-        r25v = yoy[yoy['Mes_Num']==m]['Receita_2025'].values; r25 = r25v[0] if len(r25v)>0 else 0
-        r26v = yoy[yoy['Mes_Num']==m]['Receita_2026'].values; r26 = r26v[0] if len(r26v)>0 else 0
-        proj.append({'Mes': MESES_NOMES[m], 'Num': m, 'Lbl': MESES_LABELS[m-1], 'R25': r25, 'R26': r26, 'Proj': r25*fa if r25>0 else 0, 'Tipo': 'Real' if r26>0 else 'Projeção'})
-    dp = pd.DataFrame(proj)
-
-    render_section("📊 Projeção de Faturamento — 2026 Completo")
+    mes_nome, mes_num = get_mes_ref(data); ano = get_ano_ref(data)
+    ref, _ = get_rotulos(data)
+    fat = data['agg']['fat']; lb = data['agg']['lucro']; mg = safe_div(lb, fat) * 100
+
+    # Projeções pré-calculadas na ingestão (forecasting); a página só lê os resultados
+    prv = data['previsoes']; pv = prv['previsoes']; ip = prv['indices']
+    mts = prv['modelos'][prv['modelos']['Nivel']=='total']
+    if mts.empty:
+        st.info("ℹ️ Ainda não há histórico suficiente para projetar o faturamento. Importe ou recarregue os dados de vendas para ver os cenários.")
+        return
+    mt = mts.iloc[0]
+    fa = mt['Crescimento'] if pd.notna(mt['Crescimento']) else 1.0
+    idx_saz = ip[ip['Nivel']=='total'].set_index('Mes_Num')['Indice'].to_dict()
+    idx_cat = ip[ip['Nivel']=='categoria'].set_index(['Serie','Mes_Num'])['Indice'].to_dict()
+    pvt = pv[pv['Nivel']=='total']
+    pt = pvt[pvt['Ano']==ano][['Mes_Num','Previsao','Inf','Sup']].rename(columns={'Mes_Num':'Num','Previsao':'Proj'})
+    dp = pd.DataFrame({'Num': range(1, 13), 'Mes': MESES_NOMES[1:], 'Lbl': MESES_LABELS})
+    ry = yoy.drop_duplicates('Mes_Num', keep='last').set_index('Mes_Num')
+    for col, a in (('R25', ano - 1), ('R26', ano)):
+        dp[col] = dp['Num'].map(ry[f'Receita_{a}']) if f'Receita_{a}' in ry else 0
+    dp = dp.merge(pt, on='Num', how='left').fillna(0)
+
+    render_section(f"📊 Projeção de Faturamento — {ano} Completo")
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=dp['Lbl'], y=dp['R25'], name='2025 (ref)', mode='lines+markers', line=dict(color='#CCC',width=2,dash='dot'), marker=dict(size=6)))
+    fig.add_trace(go.Scatter(x=dp['Lbl'], y=dp['R25'], name=f'{ano-1} (ref)', mode='lines+markers', line=dict(color='#CCC',width=2,dash='dot'), marker=dict(size=6)))
     dr = dp[dp['R26']>0]
-    if not dr.empty: fig.add_trace(go.Bar(x=dr['Lbl'], y=dr['R26'], name='2026 (real)', marker_color=COLORS['yellow'], text=[f"R${v/1000:.0f}k" for v in dr['R26']], textposition='outside'))
+    if not dr.empty: fig.add_trace(go.Bar(x=dr['Lbl'], y=dr['R26'], name=f'{ano} (real)', marker_color=COLORS['yellow'], text=[f"R${v/1000:.0f}k" for v in dr['R26']], textposition='outside'))
     df = dp[(dp['R26']==0) & (dp['Proj']>0)]
-    if not df.empty: fig.add_trace(go.Bar(x=df['Lbl'], y=df['Proj'], name='2026 (projeção)', marker_color='rgba(255,193,7,0.4)', text=[f"R${v/1000:.0f}k" for v in df['Proj']], textposition='outside', marker_line=dict(color=COLORS['yellow'],width=2)))
+    if not df.empty: fig.add_trace(go.Bar(x=df['Lbl'], y=df['Proj'], name=f'{ano} (projeção)', marker_color='rgba(255,193,7,0.4)', text=[f"R${v/1000:.0f}k" for v in df['Proj']], textposition='outside', marker_line=dict(color=COLORS['yellow'],width=2),
+        error_y=dict(type='data', symmetric=False, array=df['Sup']-df['Proj'], arrayminus=df['Proj']-df['Inf'], color=COLORS['gray'], thickness=1)))
     fig.update_layout(height=400, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), legend=dict(orientation="h",y=-0.1), yaxis_title="Faturamento (R$)", barmode='overlay')
-    st.plotly_chart(fig, use_container_width=True)
-    render_tooltip("Projeção 2026", "Amarelo sólido = real. Amarelo transparente = projeção sazonal. Cinza = 2025.", f"Fator de ajuste: {fa:.2f} (2026 está a {(fa-1)*100:+.1f}% de 2025).", "Antecipar faturamento para planejar compras e caixa.")
+    perf.plotly_chart(fig, use_container_width=True)
+    render_tooltip(f"Projeção {ano}", f"Amarelo sólido = real. Amarelo transparente = projeção sazonal. Cinza = {ano-1}.", f"Modelo: {mt['Modelo'].replace('_',' ')}. Crescimento ano contra ano: {fa:.2f} ({(fa-1)*100:+.1f}%). Traço = intervalo de 80%.", "Antecipar faturamento para planejar compras e caixa.")
     st.markdown("---")
 
     # Cenários próximo mês
-    pm = mes_num + 1 if mes_num < 12 else 1; pmn = MESES_NOMES[pm]
-    ppj = dp[dp['Num']==pm]['Proj'].values; ppj = ppj[0] if len(ppj)>0 else fat
-    cp = ppj*0.85; cr_ = ppj; co = ppj*1.15
+    pm, pa = (mes_num + 1, ano) if mes_num < 12 else (1, ano + 1); pmn = MESES_NOMES[pm]; prox = f"{pmn}/{pa % 100:02d}"
+    # Procura pelo ano real do próximo mês (dezembro -> janeiro do ano seguinte); sem previsão, repete o mês atual
+    ppj = pvt[(pvt['Ano']==pa) & (pvt['Mes_Num']==pm)]['Previsao'].dropna().values; ppj = ppj[0] if len(ppj)>0 else fat
+    cen = scenarios.avaliar(ppj*np.array([0.85, 1.0, 1.15]), [mg/100], [CUSTO_FIXO], META_LIQUIDA)['lucro'][:, 0, 0]
+    cp, cr_, co = ppj*0.85, ppj, ppj*1.15; lp, lr, lo = cen
 
-    render_section(f"🎯 Cenários para {pmn}/26")
+    render_section(f"🎯 Cenários para {prox}")
     c1, c2, c3 = st.columns(3)
-    with c1:
-        lp = cp*(mg/100)-CUSTO_FIXO
-        render_kpi_card("😟 Pessimista (-15%)", f"R$ {cp:,.0f}", f"Lucro: R$ {lp:,.0f}", "kpi-negative" if lp<0 else "kpi-neutral")
-    with c2:
-        lr = cr_*(mg/100)-CUSTO_FIXO
-        render_kpi_card("📊 Realista", f"R$ {cr_:,.0f}", f"Lucro: R$ {lr:,.0f}", "kpi-positive")
-    with c3:
-        lo = co*(mg/100)-CUSTO_FIXO
-        render_kpi_card("🚀 Otimista (+15%)", f"R$ {co:,.0f}", f"Lucro: R$ {lo:,.0f}", "kpi-positive")
+    with c1: render_kpi_card("😟 Pessimista (-15%)", f"R$ {cp:,.0f}", f"Lucro: R$ {lp:,.0f}", "kpi-negative" if lp<0 else "kpi-neutral")
+    with c2: render_kpi_card("📊 Realista", f"R$ {cr_:,.0f}", f"Lucro: R$ {lr:,.0f}", "kpi-positive")
+    with c3: render_kpi_card("🚀 Otimista (+15%)", f"R$ {co:,.0f}", f"Lucro: R$ {lo:,.0f}", "kpi-positive")
     render_tooltip(f"Cenários {pmn}", f"3 cenários baseados na projeção sazonal: pessimista, realista, otimista.", "Se o pessimista já dá lucro, o negócio está seguro.", "Planejar caixa e definir metas realistas.")
     st.markdown("---")
 
+    # Grade "E se?": receita × margem × custo fixo numa única conta vetorizada
+    render_section(f"🧮 E se? — Grade de Cenários para {prox}")
+    c1, c2 = st.columns([1, 3])
+    with c1: passos = st.select_slider("Resolução", scenarios.PASSOS, value=41, key='cen_passos', help="Pontos por eixo (receita, margem e custo fixo)")
+    ex = scenarios.eixos(ppj, mg/100, CUSTO_FIXO, passos)
+    t0 = time.perf_counter(); grade = scenarios.avaliar(ex['receita'], ex['margem'], ex['custo'], META_LIQUIDA); t_ms = (time.perf_counter()-t0)*1000
+    with c2: kc = st.select_slider("Custo fixo simulado", range(passos), value=passos//2, key='cen_custo', format_func=lambda i: f"R$ {ex['custo'][i]:,.0f} ({ex['var_custo'][i]*100:+.0f}%)")
+    cmax = scenarios.custo_fixo_maximo([ppj], [mg/100], META_LIQUIDA)[0, 0]
+    c1, c2, c3 = st.columns(3)
+    with c1: render_kpi_card("Custo fixo máximo", f"R$ {cmax:,.0f}", f"Mantém margem real ≥ {META_LIQUIDA*100:.0f}% no realista", "kpi-positive" if cmax >= CUSTO_FIXO else "kpi-negative")
+    with c2: render_kpi_card("Cenários no lucro", f"{grade['no_lucro'][:, :, kc].mean()*100:.0f}%", f"Com custo fixo de R$ {ex['custo'][kc]:,.0f}")
+    with c3: render_kpi_card("Cenários na meta", f"{grade['na_meta'][:, :, kc].mean()*100:.0f}%", f"Margem real ≥ {META_LIQUIDA*100:.0f}%")
+    xr = ex['var_receita']*100; ym = ex['margem']*100
+    fig = go.Figure(go.Heatmap(x=xr, y=ym, z=grade['lucro'][:, :, kc].T, colorscale='RdYlGn', zmid=0, colorbar=dict(title='Lucro (R$)'),
+        hovertemplate='Receita %{x:+.0f}%<br>Margem %{y:.1f}%<br>Lucro R$ %{z:,.0f}<extra></extra>'))
+    fig.add_trace(go.Contour(x=xr, y=ym, z=grade['lucro'][:, :, kc].T, contours=dict(start=0, end=0, coloring='lines', showlabels=False), line=dict(color=COLORS['dark'], width=3), showscale=False, name='Break-even', hoverinfo='skip'))
+    fig.add_trace(go.Contour(x=xr, y=ym, z=grade['margem_real'][:, :, kc].T, contours=dict(start=META_LIQUIDA, end=META_LIQUIDA, coloring='lines', showlabels=False), line=dict(color=COLORS['dark'], width=2, dash='dash'), showscale=False, name='Meta', hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=[0], y=[mg], mode='markers', marker=dict(symbol='x', size=12, color=COLORS['dark']), name='Realista', hoverinfo='skip'))
+    fig.update_layout(height=420, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), xaxis_title="Variação da receita (%)", yaxis_title="Margem bruta (%)", legend=dict(orientation="h",y=-0.2))
+    perf.plotly_chart(fig, use_container_width=True)
+    pct = pd.DataFrame({'Custo': ex['custo'], 'No lucro': grade['no_lucro'].mean(axis=(0, 1))*100, 'Na meta': grade['na_meta'].mean(axis=(0, 1))*100})
+    fig = px.line(pct, x='Custo', y=['No lucro', 'Na meta'], color_discrete_map={'No lucro': COLORS['yellow'], 'Na meta': COLORS['green']})
+    fig.add_vline(x=CUSTO_FIXO, line_dash="dot", line_color=COLORS['gray'])
+    fig.update_layout(height=280, plot_bgcolor='white', margin=dict(l=20,r=20,t=30,b=20), xaxis_title="Custo fixo (R$)", yaxis_title="% dos cenários", legend_title_text='')
+    perf.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{grade['lucro'].size:,} cenários avaliados em {t_ms:.1f} ms")
+    render_tooltip("E se?", "Cada célula é um cenário de receita × margem com o custo fixo escolhido. Linha cheia = break-even; tracejada = meta líquida.", f"Acima e à direita das linhas o mês fecha no lucro / na meta. O custo fixo máximo é R$ {cmax:,.0f} no cenário realista.", "Ver quanto de queda de receita ou margem o negócio aguenta antes de dar prejuízo.", "A curva de baixo mostra, para cada custo fixo, quantos cenários continuam saudáveis.")
+    st.markdown("---")
+
     # Velocímetro
-    render_section(f"🏎️ Velocímetro — {mes_nome}/26 vs Metas")
+    render_section(f"🏎️ Velocímetro — {ref} vs Metas")
     mm = safe_div(CUSTO_FIXO, mg/100) if mg > 0 else 0; mi = mm * 1.5
     fig = go.Figure(go.Indicator(mode="gauge+number+delta", value=fat,
         number={'prefix':"R$ ",'valueformat':',.0f'}, delta={'reference':mi,'prefix':"R$ ",'valueformat':',.0f'},
-        title={'text':f"Faturamento {mes_nome}/26"},
+        title={'text':f"Faturamento {ref}"},
         gauge={'axis':{'range':[0,mi*1.5],'tickformat':',.0f','tickprefix':'R$ '},
             'bar':{'color':COLORS['yellow']},
             'steps':[{'range':[0,mm],'color':'#FADBD8'},{'range':[mm,mi],'color':'#F9E79F'},{'range':[mi,mi*1.5],'color':'#D5F5E3'}],
             'threshold':{'line':{'color':COLORS['red'],'width':4},'thickness':0.75,'value':mm}}))
     fig.update_layout(height=300, margin=dict(l=20,r=20,t=60,b=20))
-    st.plotly_chart(fig, use_container_width=True)
+    perf.plotly_chart(fig, use_container_width=True)
     render_tooltip("Velocímetro", f"Vermelho = prejuízo (<R$ {mm:,.0f}). Amarelo = acima do break-even. Verde = meta ideal.", f"Break-even: R$ {mm:,.0f}. Meta ideal: R$ {mi:,.0f}.", "Quanto mais para a direita (verde), mais saudável.")
     st.markdown("---")
 
@@ -592,17 +700,17 @@ def page_visao_futurista(data):
     cols = st.columns(5)
     for i, (_, row) in enumerate(vmtop.iterrows()):
         with cols[i]:
-            idx = idx_saz.get(pm, 1.0)
+            idx = idx_cat.get((row['Categoria'], pm), idx_saz.get(pm, 1.0))
             emoji = "🔥" if idx>1.1 else ("❄️" if idx<0.9 else "➡️")
             st.markdown(f"**{row['Categoria']}**")
             st.markdown(f"Fat: R$ {row['Vlr_Venda']:,.0f}")
             st.markdown(f"Margem: {row['Markdown_Pct']:.0f}%")
             st.markdown(f"{emoji} {pmn}: índice {idx:.2f}")
-    render_tooltip("Top 5 Categorias", "As 5 maiores categorias + tendência sazonal do próximo mês.", "🔥 = mês forte (>1.10). ❄️ = fraco (<0.90). ➡️ = normal.", "Reforçar estoque das 🔥 e promover as ❄️.")
+    render_tooltip("Top 5 Categorias", "As 5 maiores categorias + índice sazonal próprio de cada uma para o próximo mês.", "🔥 = mês forte (>1.10). ❄️ = fraco (<0.90). ➡️ = normal.", "Reforçar estoque das 🔥 e promover as ❄️.")
     st.markdown("---")
 
     # Plano de ação
-    render_section(f"📋 Direcionamento Estratégico — {pmn}/26")
+    render_section(f"📋 Direcionamento Estratégico — {prox}")
     est = produtos[produtos['Classificacao'].str.contains('Estrela')]
     pmo = produtos[produtos['Classificacao'].str.contains('Peso Morto')]
     erosao = data['erosao']; cs = erosao[erosao['Alerta'].str.contains('SUBIU', na=False)]
@@ -623,9 +731,9 @@ def page_visao_futurista(data):
         for a in acoes: st.markdown(f"- {a}")
     with c2:
         st.markdown("### ⚠️ O que MONITORAR")
-        yoy_m = yoy[yoy['Receita_2026']>0]
-        c25_ref = yoy_m.iloc[-1]['Cupons_2025'] if not yoy_m.empty else 1
-        cup_atual = vm['Qtde_Documentos'].sum()
+        yoy_r = get_yoy_row(yoy, mes_num, get_ano_ref(data))
+        c25_ref = yoy_r['cupons'] if yoy_r is not None else 1
+        cup_atual = data['agg']['cupons']
         vc_ref = safe_div(cup_atual-c25_ref, c25_ref)*100
         st.markdown(f"- 👥 **Fluxo de clientes**: variou {vc_ref:+.0f}% vs ano anterior")
         st.markdown(f"- 📊 **Margem real**: manter acima de 15% (atual: {mg:.1f}%)")
@@ -639,6 +747,7 @@ def page_visao_futurista(data):
 # ============================================================
 @require_auth
 def page_importacao_dados():
+    from data_processor import DataProcessor, COLUMN_PLANS, column_plan, iter_chunks, read_header
     st.markdown("## 📥 Importação de Dados")
     st.markdown("*Carregue dados em Excel para análise*")
     st.markdown("---")
@@ -655,8 +764,9 @@ def page_importacao_dados():
 
         **Dicas:**
         1. Use colunas com nomes exatos
-        2. Máximo 5MB por arquivo
-        3. Formato: .xlsx
+        2. Arquivos grandes (vários anos) são processados em lotes
+        3. Formato: .xlsx ou .csv (separador `,` ou `;`)
+        4. Linhas inválidas são recusadas e listadas ao final
         """)
 
     with col2:
@@ -664,84 +774,104 @@ def page_importacao_dados():
         st.markdown(f"""
         **Usuário:** {st.session_state.get('username', 'Admin')}
 
-        **Últimos uploads:**
-        - Nenhum ainda nesta sessão
+        **Últimos uploads:** ver *Processamentos* abaixo
         """)
 
     st.markdown("---")
 
     # Upload do arquivo
     uploaded_file = st.file_uploader(
-        "Selecione um arquivo Excel",
-        type=["xlsx", "xls"],
+        "Selecione um arquivo Excel ou CSV",
+        type=["xlsx", "csv"],
         accept_multiple_files=False,
-        help="Máximo 5MB"
+        help="Arquivos grandes são lidos em lotes"
     )
 
     if uploaded_file is not None:
         try:
-            # Detectar tipo de dados
-            df = pd.read_excel(uploaded_file)
-            data_type = DataProcessor.detect_format(df)
+            # Detectar tipo de dados só pelo cabeçalho; a prévia já usa o plano de colunas do formato
+            colunas = read_header(uploaded_file, uploaded_file.name)
+            data_type = DataProcessor.detect_format(colunas)
+            plano = column_plan(colunas, data_type) if data_type in COLUMN_PLANS else None
+            amostra = next(iter_chunks(uploaded_file, uploaded_file.name, 10, plano), (pd.DataFrame(columns=colunas),))[0]
 
             st.info(f"📊 Formato detectado: **{data_type.upper()}**")
 
-            # Validar dados
-            is_valid, message = DataProcessor.validate_data(df, data_type)
+            # Validar colunas
+            is_valid, message = DataProcessor.validate_data(amostra.copy(deep=False), data_type)
             st.markdown(message)
 
             if is_valid:
                 # Mostrar preview
                 st.markdown("### 👁️ Preview dos Dados")
-                st.dataframe(df.head(10), use_container_width=True)
+                st.dataframe(amostra, use_container_width=True)
 
-                st.markdown(f"**Total de linhas:** {len(df)}")
+                st.markdown(f"**Tamanho do arquivo:** {uploaded_file.size / 1024:,.0f} KB")
 
-                # Processamento
+                # Processamento em segundo plano: a sessão continua livre e recarregar não cancela
                 if st.button("✅ Processar e Salvar Dados", type="primary"):
-                    with st.spinner("⏳ Processando dados..."):
-                        try:
-                            # Processar dados conforme tipo
-                            if data_type == 'vendas':
-                                df_processado = DataProcessor.process_vendas(df)
-                                mes = df_processado['DATA'].dt.month.iloc[0]
-                                ano = df_processado['DATA'].dt.year.iloc[0]
-                                data_dict = DataProcessor.aggregate_to_monthly(df_processado, mes, ano)
-                            elif data_type == 'produtos':
-                                df_processado = DataProcessor.process_produtos(df)
-                                data_dict = {'dim_produtos': df_processado}
-                            else:
-                                data_dict = {'dados_importados': df}
-
-                            # Salvar dados
-                            success, filepath = DataProcessor.save_processed_data(data_dict)
-
-                            if success:
-                                st.success(f"✅ Dados salvos com sucesso em:\n`{filepath}`")
-                                st.markdown("---")
-                                st.markdown("### 📊 Resumo do Processamento")
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    st.metric("Linhas Importadas", len(df))
-                                with col2:
-                                    st.metric("Tipo de Dado", data_type.upper())
-                                with col3:
-                                    st.metric("Status", "✅ Sucesso")
-                            else:
-                                st.error(f"❌ {filepath}")
-
-                        except Exception as e:
-                            st.error(f"❌ Erro ao processar: {str(e)}")
+                    job_id = get_job_runner().submit(uploaded_file.getvalue(), uploaded_file.name, data_type, st.session_state.get('username'))
+                    st.success(f"📨 Upload enfileirado (job `{job_id}`). Ao concluir, os meses importados aparecem no seletor de período do dashboard.")
 
         except Exception as e:
             st.error(f"❌ Erro ao ler arquivo: {str(e)}")
 
+    render_import_jobs()
+
+    # Consulta direta ao armazém de importações
+    store = get_import_store(); meses = store.periodos()
+    if meses:
+        st.markdown("---")
+        st.markdown("### 🗄️ Dados Importados")
+        ini, fim = st.select_slider("Intervalo", meses, value=(meses[0], meses[-1]), format_func=partitions.periodo_label, key='imp_intervalo') if len(meses) > 1 else (meses[0], meses[0])
+        vm = store.vendas_mensais(ini, fim)
+        res = vm.groupby(['Ano', 'Mes', 'Periodo'], as_index=False)[['Vlr_Venda', 'Vlr_Lucro', 'Qtde_Documentos']].sum()
+        st.dataframe(res.drop(columns=['Ano', 'Mes']).rename(columns={'Vlr_Venda': 'Faturamento', 'Vlr_Lucro': 'Lucro', 'Qtde_Documentos': 'Cupons'}), use_container_width=True, hide_index=True)
+        st.caption(f"{len(meses)} mês(es) no banco · {len(vm['Categoria'].unique())} categorias no intervalo")
+
+
+def render_import_jobs():
+    """Painel dos jobs de importação; reexecuta sozinho a cada 2s (polling) só enquanto há job na fila ou em andamento"""
+    em_andamento = get_job_runner().ativos() > 0
+    st.fragment(painel_import_jobs, run_every=2 if em_andamento else None)(em_andamento)
+
+def painel_import_jobs(em_andamento):
+    """Corpo do fragmento de render_import_jobs; em_andamento diz se ele foi criado com polling"""
+    runner = get_job_runner(); ativos = runner.ativos()
+    # Terminou o último job (ou entrou um novo): run_every só muda em um rerun completo
+    if (ativos > 0) != em_andamento: st.rerun()
+    jobs = runner.list(10)
+    if jobs.empty: return
+    st.markdown("---")
+    st.markdown(f"### ⚙️ Processamentos ({ativos} em andamento, até {runner.max_workers} em paralelo)")
+    icones = {'pendente': '🕒', 'processando': '⏳', 'concluido': '✅', 'erro': '❌'}
+    for _, j in jobs.iterrows():
+        with st.container(border=True):
+            st.markdown(f"{icones.get(j['status'], '')} **{j['nome']}** · {j['formato'].upper()} · {j['criado_em'].replace('T', ' ')} · {j['usuario'] if pd.notna(j['usuario']) else ''}")
+            if j['status'] in ('pendente', 'processando'):
+                st.progress(float(j['progresso'] or 0), text=j['mensagem'] or '')
+                continue
+            job = runner.get(j['id']); res = job['resultado'] or {}
+            if j['status'] == 'erro': st.error(j['mensagem'])
+            if res:
+                stats = res['stats']
+                c1, c2, c3 = st.columns(3)
+                with c1: st.metric("Linhas Importadas", f"{stats['validas']:,}")
+                with c2: st.metric("Linhas Recusadas", f"{stats['erros']:,}")
+                with c3: st.metric("Meses", len(res['meses']))
+                if res['meses']: st.caption("📅 " + ", ".join(partitions.periodo_label(k) for k in res['meses']) + f" → `{res['destino']}`")
+            erros = runner.erros_path(j['id'])
+            if erros.exists():
+                st.download_button("⬇️ Baixar linhas recusadas (CSV)", erros.read_bytes(), f"erros_{j['id']}.csv", "text/csv", key=f"erros_{j['id']}")
+
 
 # ============================================================
 # SIDEBAR E NAVEGAÇÃO
 # ============================================================
 def main():
     init_auth_session()
+    perf.start_rerun(medir_payload=is_authenticated())  # admins veem o payload; os demais só por amostragem
+    start_agendador_mobne()
 
     with st.sidebar:
         logo_path = Path("logo_dubairro.png")
@@ -763,6 +893,20 @@ def main():
 
         pagina = st.radio("Navegação", pages, label_visibility="collapsed")
 
+        # A página de importação não usa o dataset: nada de dados/pandas carregado para ela
+        dashboard = "Importação" not in pagina
+        if dashboard:
+            st.markdown("---")
+            try:
+                periodos = list_periodos()
+            except FileNotFoundError:
+                st.error("⚠️ Arquivo **Base_PowerBI.xlsx** não encontrado!")
+                st.stop()
+            periodo = st.selectbox("📅 Período", periodos[::-1], key='periodo',
+                format_func=lambda k: f"{MESES_NOMES[int(k.split('-')[1])]}/{k.split('-')[0]}")
+            if is_authenticated() and st.button("🔄 Recarregar dados", help="Relê as partições para todas as sessões"):
+                st.toast(f"Dados recarregados (versão {get_store().refresh()})")
+
         st.markdown("---")
         st.markdown("##### 🎛️ Simulador")
         custo_fixo_input = st.number_input("Custo Fixo Mensal (R$)", value=CUSTO_FIXO_DEFAULT, step=500.0, format="%.2f",
@@ -779,22 +923,29 @@ def main():
         st.caption("Mercado duBairro © 2026")
         st.caption("Dashboard de Gestão v2.0")
 
-    try:
-        data = load_data()
-    except FileNotFoundError:
-        st.error("⚠️ Arquivo **Base_PowerBI.xlsx** não encontrado!")
-        st.stop()
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
-        st.stop()
-
-    if "Resumo" in pagina: page_resumo_executivo(data)
-    elif "Preços" in pagina: page_inteligencia_precos(data)
-    elif "Mapa" in pagina: page_mapa_produtos(data)
-    elif "Diagnóstico" in pagina: page_diagnostico(data)
-    elif "Sazonalidade" in pagina: page_sazonalidade(data)
-    elif "Futurista" in pagina: page_visao_futurista(data)
-    elif "Importação" in pagina: page_importacao_dados()
+    if not dashboard:
+        page_importacao_dados()
+    else:
+        try:
+            with perf.stage('dados'):
+                data = load_data(periodo)
+        except FileNotFoundError:
+            st.error("⚠️ Arquivo **Base_PowerBI.xlsx** não encontrado!")
+            st.stop()
+        except Exception as e:
+            st.error(f"Erro ao carregar dados: {e}")
+            st.stop()
+
+        if "Resumo" in pagina: page_resumo_executivo(data)
+        elif "Preços" in pagina: page_inteligencia_precos(data)
+        elif "Mapa" in pagina: page_mapa_produtos(data)
+        elif "Diagnóstico" in pagina: page_diagnostico(data)
+        elif "Sazonalidade" in pagina: page_sazonalidade(data)
+        elif "Futurista" in pagina: page_visao_futurista(data)
+
+    rec = perf.finish_rerun()
+    if is_authenticated():
+        perf.render_panel(rec)
 
 if __name__ == "__main__":
     main()
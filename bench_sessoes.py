@@ -0,0 +1,73 @@
+"""
+Mede a memória do dashboard com várias sessões simultâneas simuladas.
+
+Compara o modelo antigo (st.cache_data devolve uma cópia desserializada por
+chamada + cópias feitas pelas páginas) com o DataStore compartilhado.
+
+Uso:
+    python bench_sessoes.py            # 1, 5 e 20 sessões
+    python bench_sessoes.py 1 10 50
+"""
+import gc
+import pickle
+import sys
+import tracemalloc
+import pandas as pd
+
+from data_partitions import ensure_partitions, read_partition, GLOBAL_DIR
+from data_store import DataStore
+
+
+def sessao_cache_data(base):
+    """Uma sessão no modelo antigo: cópia do cache + cópias das páginas"""
+    data = pickle.loads(pickle.dumps(base))
+    vc = data['vendas_diarias'].copy(); vc['Data'] = pd.to_datetime(vc['Data']); vc['Dia_Semana'] = vc['Data'].dt.day_name()
+    derivados = [vc, data['produtos'][data['produtos']['Receita_Total'] > 20].copy(), data['yoy'].copy()]
+    return data, derivados
+
+
+def sessao_store(store, periodo):
+    """Uma sessão com o armazém compartilhado: só visões"""
+    data = store.snapshot(periodo)
+    derivados = [data['agg']['diario'], data['produtos'][data['produtos']['Receita_Total'] > 20], data['yoy']]
+    return data, derivados
+
+
+def medir(fn, n):
+    """Memória (MB) ainda alocada após criar n sessões com fn"""
+    gc.collect()
+    tracemalloc.start()
+    sessoes = [fn() for _ in range(n)]
+    atual = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessoes
+    return atual / 1e6
+
+
+def medir_store(periodo, n):
+    """Idem, incluindo o próprio armazém (criado uma vez por processo)"""
+    gc.collect()
+    tracemalloc.start()
+    store = DataStore()
+    sessoes = [sessao_store(store, periodo) for _ in range(n)]
+    atual = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessoes, store
+    return atual / 1e6
+
+
+def main():
+    contagens = [int(a) for a in sys.argv[1:]] or [1, 5, 20]
+    periodo = ensure_partitions()[-1]
+    base = dict(read_partition(GLOBAL_DIR)); base.update(read_partition(periodo))
+
+    print(f"Período {periodo} — memória alocada (MB, tracemalloc)")
+    print(f"{'sessões':>8} | {'cache_data':>12} | {'DataStore':>12} | {'redução':>8}")
+    for n in contagens:
+        antigo = medir(lambda: sessao_cache_data(base), n)
+        novo = medir_store(periodo, n)
+        print(f"{n:>8} | {antigo:>12.1f} | {novo:>12.1f} | {antigo / novo:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Módulo de Gráficos para Catálogos Grandes
+Scatter de produtos com WebGL e agregação da cauda longa no servidor
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from typing import Dict, Optional
+
+# Acima deste número de pontos os traces passam a ser desenhados em WebGL
+WEBGL_THRESHOLD = 1000
+# Acima deste número de produtos a cauda longa é agregada em grade de densidade
+DENSITY_THRESHOLD = 3000
+# Quantidade de produtos desenhados individualmente no modo densidade
+TOP_N_INDIVIDUAL = 300
+# Resolução da grade de densidade (bins × bins)
+DENSITY_BINS = 40
+
+
+def resolve_modo(n: int, agrupar_cauda: Optional[bool] = None) -> str:
+    """
+    Decide o modo de renderização conforme o tamanho do catálogo
+
+    Args:
+        n: Número de produtos a desenhar
+        agrupar_cauda: Força (True) ou desliga (False) a agregação da cauda.
+            None = automático pelo DENSITY_THRESHOLD
+
+    Returns:
+        'svg', 'webgl' ou 'densidade'
+    """
+    if agrupar_cauda is None:
+        agrupar_cauda = n > DENSITY_THRESHOLD
+    if agrupar_cauda and n > TOP_N_INDIVIDUAL:
+        return 'densidade'
+    return 'webgl' if n > WEBGL_THRESHOLD else 'svg'
+
+
+def _density_trace(cauda: pd.DataFrame, x: str, y: str, x_range, y_range, bins: int) -> go.Heatmap:
+    """Agrega a cauda longa em uma grade 2D (contagem de produtos por célula)"""
+    z, xe, ye = np.histogram2d(cauda[x].to_numpy(dtype=float), cauda[y].to_numpy(dtype=float),
+                               bins=bins, range=[x_range, y_range])
+    z = np.where(z > 0, z, np.nan).T  # células vazias ficam transparentes
+    return go.Heatmap(
+        x=(xe[:-1] + xe[1:]) / 2, y=(ye[:-1] + ye[1:]) / 2, z=z,
+        colorscale=[[0, 'rgba(200,200,200,0.25)'], [1, 'rgba(90,90,90,0.7)']],
+        showscale=False, name=f'Demais {len(cauda):,} produtos',
+        hovertemplate="%{z:.0f} produtos<extra>Cauda longa</extra>",
+    )
+
+
+def scatter_produtos(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    size: str,
+    color: str,
+    rank_by: str,
+    hover_name: str = 'Produto',
+    hover_data: Dict = None,
+    color_discrete_map: Dict = None,
+    size_max: int = 30,
+    agrupar_cauda: Optional[bool] = None,
+    top_n: int = TOP_N_INDIVIDUAL,
+    bins: int = DENSITY_BINS,
+) -> go.Figure:
+    """
+    Scatter de produtos com payload limitado para catálogos grandes
+
+    Até WEBGL_THRESHOLD pontos desenha em SVG como o px.scatter padrão; acima
+    disso usa WebGL. No modo densidade apenas os `top_n` produtos por `rank_by`
+    são enviados individualmente e o restante vira uma grade bins × bins
+    calculada no servidor, então o tamanho do payload não cresce com o catálogo.
+
+    Args:
+        df: DataFrame de produtos
+        x, y, size, color: Colunas mapeadas no gráfico
+        rank_by: Coluna usada para escolher os produtos desenhados individualmente
+        hover_name, hover_data, color_discrete_map, size_max: Repassados ao px.scatter
+        agrupar_cauda: Força/desliga a agregação da cauda (None = automático)
+        top_n: Produtos desenhados individualmente no modo densidade
+        bins: Resolução da grade de densidade
+
+    Returns:
+        Figura Plotly
+    """
+    modo = resolve_modo(len(df), agrupar_cauda)
+    pontos = df.nlargest(top_n, rank_by) if modo == 'densidade' else df
+    n_pontos = len(pontos)
+
+    fig = px.scatter(pontos, x=x, y=y, size=size, color=color, hover_name=hover_name,
+        hover_data=hover_data, color_discrete_map=color_discrete_map, size_max=size_max,
+        render_mode='webgl' if modo != 'svg' and n_pontos > 0 else 'svg')
+
+    if modo == 'densidade':
+        cauda = df.drop(pontos.index)
+        if not cauda.empty:
+            x_range = [float(df[x].min()), float(df[x].max())]
+            y_range = [float(df[y].min()), float(df[y].max())]
+            fig.add_trace(_density_trace(cauda, x, y, x_range, y_range, bins))
+            # Grade por baixo dos produtos individuais
+            fig.data = (fig.data[-1],) + fig.data[:-1]
+    return fig
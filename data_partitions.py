@@ -0,0 +1,189 @@
+"""
+Módulo de Partições Mensais
+Divide as tabelas fato por Periodo (MM/AAAA) em arquivos independentes,
+para que o dashboard carregue apenas o mês selecionado
+"""
+
+import json
+import os
+import re
+import shutil
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SOURCE_FILE = "Base_PowerBI.xlsx"
+PARTITIONS_DIR = Path(os.getenv("DUBAIRRO_PARTICOES", "dados/particoes"))
+GLOBAL_DIR = "_global"
+IMPORTED_DIR = "_importados"  # tabelas vindas da página de importação, sobrepostas às da planilha
+MANIFEST_FILE = "manifest.json"
+
+# Tabelas com coluna Periodo, particionadas por mês
+PARTITIONED_SHEETS = {
+    'vendas_mensais': 'fato_vendas_mensais',
+    'vendas_diarias': 'fato_vendas_diarias',
+    'erosao': 'alertas_erosao_margem',
+}
+# Tabelas sem Periodo, lidas inteiras
+GLOBAL_SHEETS = {
+    'produtos': 'dim_produtos',
+    'calendario': 'dim_calendario',
+    'yoy': 'comparativo_yoy',
+}
+
+
+def periodo_key(periodo: str) -> str:
+    """Converte 'MM/AAAA' em chave ordenável 'AAAA-MM'"""
+    mes, ano = str(periodo).strip().split('/')
+    return f"{int(ano):04d}-{int(mes):02d}"
+
+
+def periodo_label(key: str) -> str:
+    """Converte chave 'AAAA-MM' de volta para 'MM/AAAA'"""
+    ano, mes = key.split('-')
+    return f"{mes}/{ano}"
+
+
+def previous_key(key: str) -> str:
+    """Chave do mês anterior ('2026-01' -> '2025-12')"""
+    ano, mes = (int(p) for p in key.split('-'))
+    return f"{ano - 1:04d}-12" if mes == 1 else f"{ano:04d}-{mes - 1:02d}"
+
+
+def write_partition(key: str, tables: Dict[str, pd.DataFrame], root: Path = PARTITIONS_DIR) -> None:
+    """
+    Grava (substituindo) as tabelas de um mês
+
+    Args:
+        key: Chave do mês ('AAAA-MM')
+        tables: {nome da tabela: DataFrame do mês}
+        root: Diretório raiz das partições
+    """
+    folder = Path(root) / key
+    folder.mkdir(parents=True, exist_ok=True)
+    for name, df in tables.items():
+        tmp = folder / f"{name}.pkl.tmp"
+        df.reset_index(drop=True).to_pickle(tmp)
+        os.replace(tmp, folder / f"{name}.pkl")
+
+
+def imported_keys(root: Path = PARTITIONS_DIR) -> List[str]:
+    """Meses com tabelas importadas (sobrevivem à reconstrução a partir da planilha)"""
+    folder = Path(root) / IMPORTED_DIR
+    return sorted(p.name for p in folder.iterdir() if p.is_dir()) if folder.exists() else []
+
+
+def _write_manifest(root: Path, manifest: Dict) -> None:
+    tmp = Path(root) / f"{MANIFEST_FILE}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, Path(root) / MANIFEST_FILE)
+
+
+def build_partitions(source: str = SOURCE_FILE, root: Path = PARTITIONS_DIR) -> List[str]:
+    """
+    Lê a planilha uma vez e grava uma partição por mês
+
+    Meses que saíram da planilha (e não foram importados) têm a pasta
+    removida, para não sobrarem partições órfãs no disco.
+
+    Args:
+        source: Caminho da Base_PowerBI.xlsx
+        root: Diretório raiz das partições
+
+    Returns:
+        Lista de chaves de mês gravadas, em ordem
+    """
+    root = Path(root)
+    frames = {name: pd.read_excel(source, sheet_name=sheet) for name, sheet in PARTITIONED_SHEETS.items()}
+    keys = {name: df['Periodo'].map(periodo_key) for name, df in frames.items()}
+    all_keys = sorted(set().union(*(k.unique() for k in keys.values()), imported_keys(root)))
+    for key in all_keys:
+        # Meses sem alguma tabela recebem um DataFrame vazio com as mesmas colunas
+        write_partition(key, {name: df[keys[name] == key] for name, df in frames.items()}, root)
+    for folder in root.iterdir():
+        if folder.is_dir() and re.fullmatch(r'\d{4}-\d{2}', folder.name) and folder.name not in all_keys:
+            shutil.rmtree(folder)
+
+    write_partition(GLOBAL_DIR, {name: pd.read_excel(source, sheet_name=sheet) for name, sheet in GLOBAL_SHEETS.items()}, root)
+
+    manifest = {'source': os.path.abspath(source), 'source_mtime': os.path.getmtime(source), 'periodos': all_keys}
+    _write_manifest(root, manifest)
+    return manifest['periodos']
+
+
+def apply_import(updates: Dict[str, Dict[str, pd.DataFrame]], root: Path = PARTITIONS_DIR) -> List[str]:
+    """
+    Publica tabelas importadas sem reconstruir as demais partições
+
+    As tabelas importadas substituem as da planilha no mesmo mês (ver
+    read_partition). Um mês novo ganha uma partição base vazia com as
+    colunas do mês mais recente, para que todas as tabelas existam.
+
+    Args:
+        updates: {'AAAA-MM': {nome da tabela: DataFrame do mês}}
+        root: Diretório raiz das partições
+
+    Returns:
+        Chaves dos meses afetados
+    """
+    root = Path(root)
+    manifest = read_manifest(root) or {'periodos': []}
+    periodos = list(manifest['periodos'])
+    modelo = read_partition(periodos[-1], root) if periodos else {}
+    for key, tables in updates.items():
+        write_partition(f"{IMPORTED_DIR}/{key}", tables, root)
+        if key not in periodos:
+            write_partition(key, {name: modelo.get(name, tables.get(name, pd.DataFrame())).iloc[0:0] for name in PARTITIONED_SHEETS}, root)
+            periodos.append(key)
+    manifest['periodos'] = sorted(periodos)
+    _write_manifest(root, manifest)
+    return sorted(updates)
+
+
+def read_manifest(root: Path = PARTITIONS_DIR) -> Optional[Dict]:
+    """Lê o manifesto das partições (None se não existir)"""
+    path = Path(root) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def ensure_partitions(source: str = SOURCE_FILE, root: Path = PARTITIONS_DIR) -> List[str]:
+    """
+    Garante que as partições existem e estão atualizadas em relação à planilha
+
+    Returns:
+        Lista de chaves de mês disponíveis
+    """
+    manifest = read_manifest(root)
+    if manifest is None or (os.path.exists(source) and manifest.get('source_mtime') != os.path.getmtime(source)):
+        return build_partitions(source, root)
+    return manifest['periodos']
+
+
+def read_partition(key: str, root: Path = PARTITIONS_DIR) -> Dict[str, pd.DataFrame]:
+    """
+    Lê as tabelas de um mês
+
+    Args:
+        key: Chave do mês ('AAAA-MM') ou GLOBAL_DIR
+        root: Diretório raiz das partições
+
+    Returns:
+        {nome da tabela: DataFrame}
+    """
+    folder = Path(root) / key
+    if not folder.exists():
+        raise FileNotFoundError(f"Partição {key} não encontrada em {root}")
+    names = GLOBAL_SHEETS if key == GLOBAL_DIR else PARTITIONED_SHEETS
+    tables = {name: pd.read_pickle(folder / f"{name}.pkl") if (folder / f"{name}.pkl").exists() else pd.DataFrame() for name in names}
+    overlay = Path(root) / IMPORTED_DIR / key
+    if key != GLOBAL_DIR and overlay.exists():
+        for name in names:
+            if (overlay / f"{name}.pkl").exists():
+                imp = pd.read_pickle(overlay / f"{name}.pkl")
+                # Mantém as colunas da planilha; as ausentes no upload ficam NaN
+                tables[name] = imp.reindex(columns=tables[name].columns.union(imp.columns, sort=False))
+    return tables
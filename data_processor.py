@@ -3,12 +3,244 @@ Módulo de Processamento de Dados para Upload Excel
 Valida e transforma dados brutos para estrutura esperada
 """
 
+import numpy as np
 import pandas as pd
 import streamlit as st
-from datetime import datetime
-from typing import Dict, Tuple, List
+from functools import lru_cache
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple, List
 import os
 
+CHUNK_ROWS = 50_000       # linhas por lote na leitura em streaming
+MAX_ERROS_DETALHE = 5_000  # erros por linha guardados em detalhe (o total é sempre contado)
+COMPACTAR_A_CADA = 20      # lotes entre compactações dos parciais
+
+
+# Plano de colunas por formato: o que ler e com que tipo (nomes canônicos em maiúsculas)
+COLUMN_PLANS = {
+    'vendas': {'datas': ['DATA'], 'texto': ['CATEGORIA', 'PRODUTO'],
+               'numericos': ['QUANTIDADE', 'VALOR_UNITARIO', 'VLR_VENDA', 'CUSTO', 'VLR_LUCRO', 'QTDE_DOCUMENTOS']},
+    'produtos': {'datas': [], 'texto': ['PRODUTO', 'CATEGORIA'], 'numericos': ['CUSTO_MEDIO', 'PRECO', 'ESTOQUE']},
+    'simples': {'datas': ['DATA'], 'texto': ['CATEGORIA', 'PRODUTO'], 'numericos': ['FATURAMENTO']},
+}
+
+
+_DATA_BR = r'^\s*\d{1,2}/\d{1,2}/\d{4}'  # dd/mm/aaaa (com ou sem hora)
+
+
+def parse_datas(serie: pd.Series) -> pd.Series:
+    """
+    Converte a coluna de datas de um upload sem trocar dia e mês
+
+    ISO (AAAA-MM-DD, o formato documentado) primeiro; dayfirst só para o que
+    sobrou e tem cara de dd/mm/aaaa. Um único pd.to_datetime(dayfirst=True)
+    infere o formato pelo primeiro valor e lê '2026-02-13' como %Y-%d-%m.
+
+    Args:
+        serie: Textos, datetimes do Excel ou já datetime64
+
+    Returns:
+        Série datetime64 (NaT onde não houver data válida)
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    datas = pd.to_datetime(serie, format='ISO8601', errors='coerce')
+    texto = serie.astype('string').str.strip()
+    br = (datas.isna() & texto.str.match(_DATA_BR).fillna(False)).to_numpy()
+    if br.any():
+        datas = datas.copy()
+        datas[br] = pd.to_datetime(texto[br], format='mixed', dayfirst=True, errors='coerce')
+    return datas
+
+
+def _csv_sep(file) -> str:
+    """Separador pelo cabeçalho: planilhas exportadas em pt-BR costumam usar ';'"""
+    head = file.readline(); file.seek(0)
+    head = head.decode('utf-8', 'ignore') if isinstance(head, bytes) else head
+    return ';' if head.count(';') > head.count(',') else ','
+
+
+def _csv_formato(file) -> Dict:
+    """Opções de read_csv pelo separador: com ';' (pt-BR) os números vêm como 1.234,56"""
+    sep = _csv_sep(file)
+    return {'sep': sep, 'decimal': ',', 'thousands': '.'} if sep == ';' else {'sep': sep}
+
+
+def read_header(file, filename: str) -> List[str]:
+    """
+    Lê só a linha de cabeçalho de um upload CSV ou Excel
+
+    Args:
+        file: Arquivo (caminho ou objeto binário)
+        filename: Nome original (define o leitor pela extensão)
+
+    Returns:
+        Nomes das colunas, como estão no arquivo
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            return read_header(f, filename)
+    file.seek(0)
+    try:
+        if filename.lower().endswith('.csv'):
+            return list(pd.read_csv(file, sep=_csv_sep(file), nrows=0, encoding='utf-8-sig').columns)
+        import openpyxl
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            row = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+            return [str(c) if c is not None else f"COL_{i}" for i, c in enumerate(row)]
+        finally:
+            wb.close()
+    finally:
+        file.seek(0)
+
+
+@lru_cache(maxsize=32)
+def _compile_plan(header: Tuple[str, ...], data_type: str) -> Dict:
+    canon = {col: str(col).strip().upper() for col in header}
+    plano = COLUMN_PLANS.get(data_type, {})
+    tipos = {c: t for t, cols in plano.items() for c in cols}
+    usecols = [col for col in header if canon[col] in tipos]
+    return {
+        'usecols': usecols,
+        'rename': {col: canon[col] for col in usecols},
+        # Texto e datas como string (datas convertidas depois por parse_datas, sem
+        # trocar dia e mês); numéricos ficam com a inferência do parser C
+        # (float64 direto quando limpos, object só quando há sujeira a reportar)
+        'dtype': {col: 'string' for col in usecols if tipos[canon[col]] in ('texto', 'datas')},
+        'indices': [header.index(col) for col in usecols],
+    }
+
+
+def column_plan(header: Sequence[str], data_type: str) -> Dict:
+    """
+    Plano de leitura do formato para um cabeçalho real (compilado uma vez por cabeçalho)
+
+    Args:
+        header: Colunas do arquivo (read_header)
+        data_type: Formato ('vendas', 'produtos', 'simples')
+
+    Returns:
+        Dicionário com usecols, rename (para nomes canônicos), dtype e indices
+    """
+    return _compile_plan(tuple(header), data_type)
+
+
+def iter_chunks(file, filename: str, chunksize: int = CHUNK_ROWS, plan: Optional[Dict] = None) -> Iterator[Tuple[pd.DataFrame, int, float]]:
+    """
+    Lê um upload CSV ou Excel em lotes de tamanho limitado
+
+    Args:
+        file: Arquivo (caminho ou objeto binário, ex: UploadedFile)
+        filename: Nome original (define o leitor pela extensão)
+        chunksize: Linhas por lote
+        plan: Plano de colunas (column_plan); sem plano lê tudo como texto
+
+    Returns:
+        Iterador de (lote, linha inicial no arquivo, fração lida 0-1)
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            yield from iter_chunks(f, filename, chunksize, plan)
+        return
+    file.seek(0)
+    if filename.lower().endswith('.csv'):
+        file.seek(0, os.SEEK_END); size = file.tell(); file.seek(0)
+        opcoes = {'dtype': str} if plan is None else {
+            'usecols': plan['usecols'], 'dtype': plan['dtype']}
+        reader = pd.read_csv(file, chunksize=chunksize, encoding='utf-8-sig', **_csv_formato(file), **opcoes)
+        linha = 2  # linha 1 = cabeçalho
+        for chunk in reader:
+            if plan is not None:
+                chunk = chunk.rename(columns=plan['rename'])
+            yield chunk, linha, min(file.tell() / size, 1.0) if size else 0.0
+            linha += len(chunk)
+        return
+
+    import openpyxl
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        total = (ws.max_row or 0) - 1
+        rows = ws.iter_rows(values_only=True)
+        header = [str(c) if c is not None else f"COL_{i}" for i, c in enumerate(next(rows, ()))]
+        if plan is not None:
+            # Células do Excel já vêm tipadas; basta descartar as colunas fora do plano
+            pega = itemgetter(*plan['indices']) if len(plan['indices']) > 1 else (lambda r, i=plan['indices'][0]: (r[i],))
+            rows = (pega(r) for r in rows)
+            header = [plan['rename'][c] for c in plan['usecols']]
+        buf: List[tuple] = []; linha = 2
+        for row in rows:
+            buf.append(row)
+            if len(buf) == chunksize:
+                yield pd.DataFrame(buf, columns=header), linha, min((linha - 2 + len(buf)) / total, 1.0) if total > 0 else 0.0
+                linha += len(buf); buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=header), linha, 1.0
+    finally:
+        wb.close()
+
+
+class VendasAccumulator:
+    """
+    Agrega lotes de vendas em parciais mensais (ano, mês, categoria) e
+    diários (data, categoria); a memória cresce com o nº de grupos, não de linhas
+    """
+
+    SOMAS = ['VLR_VENDA', 'VLR_LUCRO', 'QTDE_DOCUMENTOS', 'MD_PESO']
+
+    def __init__(self):
+        self._mensal: List[pd.DataFrame] = []
+        self._diario: List[pd.DataFrame] = []
+        self.linhas = 0
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Soma um lote já validado (colunas em maiúsculas, DATA datetime)"""
+        if df.empty:
+            return
+        df = df.assign(ANO=df['DATA'].dt.year, MES=df['DATA'].dt.month, DIA=df['DATA'].dt.normalize(),
+                       MD_PESO=df['VLR_VENDA'] * df['MARKDOWN_PCT'])
+        self._mensal.append(df.groupby(['ANO', 'MES', 'CATEGORIA'])[self.SOMAS].sum())
+        self._diario.append(df.groupby(['DIA', 'CATEGORIA'])[self.SOMAS].sum())
+        self.linhas += len(df)
+        if len(self._diario) >= COMPACTAR_A_CADA:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Reduz os parciais acumulados a um único DataFrame por nível"""
+        if self._mensal:
+            self._mensal = [pd.concat(self._mensal).groupby(level=[0, 1, 2]).sum()]
+            self._diario = [pd.concat(self._diario).groupby(level=[0, 1]).sum()]
+
+    def result(self) -> Dict[str, pd.DataFrame]:
+        """
+        Fatos finais no formato da Base_PowerBI
+
+        Returns:
+            {'fato_vendas_mensais': ..., 'fato_vendas_diarias': ...}
+        """
+        self._compact()
+        if not self._mensal:
+            return {'fato_vendas_mensais': pd.DataFrame(columns=['Periodo', 'Mes', 'Ano', 'Categoria', 'Vlr_Venda', 'Vlr_Lucro', 'Qtde_Documentos', 'Markdown_Pct']),
+                    'fato_vendas_diarias': pd.DataFrame(columns=['Data', 'Periodo', 'Categoria', 'Vlr_Venda', 'Vlr_Lucro', 'Qtde_Documentos', 'Markdown_Pct'])}
+        m = self._mensal[0].reset_index()
+        mensal = pd.DataFrame({
+            'Periodo': m['MES'].map('{:02d}'.format) + '/' + m['ANO'].astype(str),
+            'Mes': m['MES'], 'Ano': m['ANO'], 'Categoria': m['CATEGORIA'],
+            'Vlr_Venda': m['VLR_VENDA'], 'Vlr_Lucro': m['VLR_LUCRO'], 'Qtde_Documentos': m['QTDE_DOCUMENTOS'],
+            # Markdown ponderado pela receita (a média simples super-representa itens baratos)
+            'Markdown_Pct': np.divide(m['MD_PESO'], m['VLR_VENDA'], out=np.zeros(len(m)), where=m['VLR_VENDA'].to_numpy() != 0),
+        })
+        d = self._diario[0].reset_index()
+        diario = pd.DataFrame({
+            'Data': d['DIA'].dt.strftime('%Y-%m-%d'), 'Periodo': d['DIA'].dt.strftime('%m/%Y'), 'Categoria': d['CATEGORIA'],
+            'Vlr_Venda': d['VLR_VENDA'], 'Vlr_Lucro': d['VLR_LUCRO'], 'Qtde_Documentos': d['QTDE_DOCUMENTOS'],
+            # Por dia também: o armazém de importações refaz o mês somando os dias
+            'Markdown_Pct': np.divide(d['MD_PESO'], d['VLR_VENDA'], out=np.zeros(len(d)), where=d['VLR_VENDA'].to_numpy() != 0),
+        })
+        return {'fato_vendas_mensais': mensal, 'fato_vendas_diarias': diario}
+
+
 class DataProcessor:
     """Processa e valida dados de upload Excel"""
 
@@ -62,11 +294,10 @@ class DataProcessor:
         df = df.copy()
         df.columns = df.columns.str.strip().str.upper()
 
-        # Converter Data para datetime
-        try:
-            df['DATA'] = pd.to_datetime(df['DATA'])
-        except:
-            st.warning("⚠️ Coluna 'Data' não pode ser convertida para data")
+        # Converter Data para datetime (ISO primeiro; dd/mm/aaaa só no que sobrar)
+        df['DATA'] = parse_datas(df['DATA'])
+        if df['DATA'].isna().any():
+            st.warning(f"⚠️ {int(df['DATA'].isna().sum())} linha(s) com 'Data' inválida serão ignoradas")
 
         # Preencher valores nulos
         df['QUANTIDADE'] = pd.to_numeric(df.get('QUANTIDADE', 0), errors='coerce').fillna(0)
@@ -81,6 +312,144 @@ class DataProcessor:
 
         return df
 
+    @staticmethod
+    def coerce_vendas_chunk(df: pd.DataFrame, primeira_linha: int = 2) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Valida e converte tipos de um lote de vendas, linha a linha
+
+        Linhas com data inválida, categoria vazia ou valores numéricos
+        ilegíveis são recusadas e registradas; as demais seguem as mesmas
+        regras de process_vendas (numéricos vazios = 0, documentos vazios = 1).
+
+        Args:
+            df: Lote bruto (nomes de colunas originais)
+            primeira_linha: Linha do arquivo correspondente à 1ª linha do lote
+
+        Returns:
+            Tupla (lote válido e convertido, erros [Linha, Coluna, Valor, Erro])
+        """
+        df = df.set_axis(df.columns.astype(str).str.strip().str.upper(), axis=1)
+        linhas = np.arange(primeira_linha, primeira_linha + len(df))
+        erros = []
+        ruim = np.zeros(len(df), dtype=bool)
+
+        def registrar(mask, coluna, msg):
+            mask = np.asarray(mask) & ~ruim
+            if mask.any():
+                erros.append(pd.DataFrame({'Linha': linhas[mask], 'Coluna': coluna,
+                                           'Valor': df[coluna].to_numpy()[mask] if coluna in df else None, 'Erro': msg}))
+            return mask
+
+        data = parse_datas(df['DATA'])
+        ruim |= registrar(data.isna().to_numpy(), 'DATA', 'data inválida')
+        cat = df['CATEGORIA'].astype('string').str.strip()
+        ruim |= registrar((cat.isna() | (cat == '')).to_numpy(), 'CATEGORIA', 'categoria vazia')
+
+        numericos = {}
+        for col, padrao in (('QUANTIDADE', 0), ('VALOR_UNITARIO', 0), ('VLR_VENDA', 0), ('CUSTO', 0), ('QTDE_DOCUMENTOS', 1)):
+            if col not in df:
+                numericos[col] = pd.Series(float(padrao), index=df.index)
+                continue
+            bruto = df[col]
+            if pd.api.types.is_numeric_dtype(bruto):  # já tipado pelo plano de colunas
+                valor = bruto
+            else:
+                valor = pd.to_numeric(bruto, errors='coerce')
+                ruim |= registrar((valor.isna() & bruto.notna() & (bruto.astype('string').str.strip() != '')).to_numpy(), col, 'valor não numérico')
+            numericos[col] = valor.fillna(padrao)
+
+        out = df.assign(DATA=data, CATEGORIA=cat, **numericos)
+        out['VLR_LUCRO'] = out['VLR_VENDA'] - out['CUSTO']
+        out['MARKDOWN_PCT'] = (out['VLR_LUCRO'] / out['VLR_VENDA'].where(out['VLR_VENDA'] != 0) * 100).fillna(0)
+        erros_df = pd.concat(erros, ignore_index=True) if erros else pd.DataFrame(columns=['Linha', 'Coluna', 'Valor', 'Erro'])
+        return out[~ruim], erros_df
+
+    @staticmethod
+    def coerce_simples_chunk(df: pd.DataFrame, primeira_linha: int = 2) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Converte a DATA de um lote no formato simples (ISO primeiro, dd/mm/aaaa depois)
+
+        Args:
+            df: Lote bruto
+            primeira_linha: Linha do arquivo correspondente à 1ª linha do lote
+
+        Returns:
+            Tupla (lote com DATA datetime, erros [Linha, Coluna, Valor, Erro] das datas inválidas)
+        """
+        df = df.set_axis(df.columns.astype(str).str.strip().str.upper(), axis=1)
+        data = parse_datas(df['DATA'])
+        ruim = data.isna().to_numpy()
+        erros_df = pd.DataFrame({'Linha': np.arange(primeira_linha, primeira_linha + len(df))[ruim], 'Coluna': 'DATA',
+                                 'Valor': df['DATA'].to_numpy()[ruim], 'Erro': 'data inválida'})
+        return df.assign(DATA=data)[~ruim], erros_df
+
+    @staticmethod
+    def process_stream(
+        file,
+        filename: str,
+        data_type: str,
+        chunksize: int = CHUNK_ROWS,
+        progress: Optional[Callable[[float, str], None]] = None,
+    ) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame, Dict[str, int]]:
+        """
+        Processa um upload grande em lotes, com memória constante
+
+        Args:
+            file: Arquivo CSV/Excel (caminho ou objeto binário)
+            filename: Nome original do arquivo
+            data_type: Formato detectado ('vendas', 'produtos', 'simples')
+            chunksize: Linhas por lote
+            progress: Callback opcional (fração 0-1, mensagem)
+
+        Returns:
+            Tupla (dicionário de abas, erros por linha, estatísticas)
+        """
+        acc = VendasAccumulator() if data_type == 'vendas' else None
+        partes: List[pd.DataFrame] = []
+        erros: List[pd.DataFrame] = []
+        stats = {'lidas': 0, 'validas': 0, 'erros': 0, 'lotes': 0}
+        guardados = 0
+
+        header = read_header(file, filename)
+        presentes = {str(c).strip().upper() for c in header}
+        missing = [col.upper() for col in DataProcessor.EXPECTED_COLUMNS.get(data_type, []) if col.upper() not in presentes]
+        if missing:
+            raise ValueError(f"❌ Colunas faltando: {', '.join(missing)}")
+        plan = column_plan(header, data_type)
+
+        for chunk, linha, frac in iter_chunks(file, filename, chunksize, plan):
+            stats['lidas'] += len(chunk); stats['lotes'] += 1
+            if data_type in ('vendas', 'simples'):
+                if acc is not None:
+                    validas, err = DataProcessor.coerce_vendas_chunk(chunk, linha)
+                    acc.add(validas)
+                else:  # simples: DATA normalizada antes de gravar
+                    validas, err = DataProcessor.coerce_simples_chunk(chunk, linha)
+                    partes.append(validas)
+                stats['validas'] += len(validas)
+                stats['erros'] += len(err)
+                if guardados < MAX_ERROS_DETALHE and not err.empty:
+                    erros.append(err.head(MAX_ERROS_DETALHE - guardados)); guardados += len(erros[-1])
+            elif data_type == 'produtos':
+                partes.append(DataProcessor.process_produtos(chunk)); stats['validas'] += len(chunk)
+            else:
+                partes.append(chunk); stats['validas'] += len(chunk)
+            if progress:
+                progress(frac, f"{stats['lidas']:,} linhas lidas ({stats['erros']:,} com erro)")
+
+        if stats['lotes'] == 0:
+            raise ValueError("❌ Arquivo vazio!")
+        if acc is not None:
+            data_dict = acc.result()
+        elif data_type == 'produtos':
+            data_dict = {'dim_produtos': pd.concat(partes, ignore_index=True)}
+        else:
+            data_dict = {'dados_importados': pd.concat(partes, ignore_index=True)}
+        erros_df = pd.concat(erros, ignore_index=True) if erros else pd.DataFrame(columns=['Linha', 'Coluna', 'Valor', 'Erro'])
+        if progress:
+            progress(1.0, f"{stats['validas']:,} linhas válidas, {stats['erros']:,} recusadas")
+        return data_dict, erros_df, stats
+
     @staticmethod
     def process_produtos(df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -106,79 +475,89 @@ class DataProcessor:
         return df
 
     @staticmethod
-    def aggregate_to_monthly(df: pd.DataFrame, mes: int, ano: int) -> Dict[str, pd.DataFrame]:
+    def aggregate_to_monthly(df: pd.DataFrame, mes: Optional[int] = None, ano: Optional[int] = None) -> Dict[str, pd.DataFrame]:
         """
-        Agrega dados diários em formato mensal para Base_PowerBI.xlsx
+        Agrega dados de vendas nos fatos mensais e diários da Base_PowerBI.xlsx
+
+        Um único groupby por (ano, mês, categoria) cobre arquivos com vários
+        meses; o markdown é ponderado pela receita e os fatos diários saem
+        agregados por (data, categoria).
 
         Args:
-            df: DataFrame com dados processados
-            mes: Mês (1-12)
-            ano: Ano
+            df: DataFrame com dados processados (process_vendas)
+            mes: Mês (1-12) para restringir o resultado (opcional)
+            ano: Ano para restringir o resultado (opcional)
 
         Returns:
             Dicionário com DataFrames para cada aba
         """
-        result = {}
-
-        # Vendas Mensais
-        vendas_mensais = df.groupby('CATEGORIA').agg({
-            'VLR_VENDA': 'sum',
-            'VLR_LUCRO': 'sum',
-            'QTDE_DOCUMENTOS': 'sum',
-            'MARKDOWN_PCT': 'mean'
-        }).reset_index()
-        vendas_mensais.columns = ['Categoria', 'Vlr_Venda', 'Vlr_Lucro', 'Qtde_Documentos', 'Markdown_Pct']
-        result['fato_vendas_mensais'] = vendas_mensais
-
-        # Vendas Diárias
-        vendas_diarias = df[['DATA', 'CATEGORIA', 'VLR_VENDA', 'VLR_LUCRO', 'QTDE_DOCUMENTOS']].copy()
-        vendas_diarias.columns = ['Data', 'Categoria', 'Vlr_Venda', 'Vlr_Lucro', 'Qtde_Documentos']
-        result['fato_vendas_diarias'] = vendas_diarias
-
+        acc = VendasAccumulator()
+        acc.add(df[df['DATA'].notna()])
+        result = acc.result()
+        if mes is not None and ano is not None:
+            periodo = f"{int(mes):02d}/{int(ano)}"
+            result = {aba: fato[fato['Periodo'] == periodo].reset_index(drop=True) for aba, fato in result.items()}
         return result
 
     @staticmethod
-    def save_processed_data(data_dict: Dict[str, pd.DataFrame], filename: str = None) -> Tuple[bool, str]:
+    def to_partitions(data_dict: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, pd.DataFrame]]:
         """
-        Salva dados processados em Excel
+        Divide os fatos agregados em partições mensais no formato do dashboard
 
         Args:
-            data_dict: Dicionário com DataFrames
-            filename: Nome do arquivo (default: data_<timestamp>.xlsx)
+            data_dict: Saída de aggregate_to_monthly/process_stream (abas da Base_PowerBI)
 
         Returns:
-            Tupla (sucesso, caminho do arquivo)
+            {'AAAA-MM': {nome da tabela: DataFrame do mês}}; só inclui as
+            tabelas presentes no upload (ex: sem 'erosao')
         """
-        try:
-            if filename is None:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"data_upload_{timestamp}.xlsx"
+        from data_partitions import PARTITIONED_SHEETS, periodo_key
 
-            filepath = os.path.join("/home/user/dubairro/dados_importados", filename)
+        particoes: Dict[str, Dict[str, pd.DataFrame]] = {}
+        for nome, aba in PARTITIONED_SHEETS.items():
+            fato = data_dict.get(aba)
+            if fato is None or fato.empty:
+                continue
+            for periodo, grupo in fato.groupby('Periodo', sort=True):
+                particoes.setdefault(periodo_key(periodo), {})[nome] = grupo.reset_index(drop=True)
+        return dict(sorted(particoes.items()))
 
-            # Criar diretório se não existir
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    @staticmethod
+    def save_processed_data(data_dict: Dict[str, pd.DataFrame], store=None) -> Tuple[bool, str]:
+        """
+        Salva dados processados no armazém de importações (SQLite, com upsert)
 
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                for sheet_name, df in data_dict.items():
-                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+        Args:
+            data_dict: Dicionário com DataFrames
+            store: ImportStore de destino (default: banco em import_store.DB_FILE)
 
-            return True, filepath
+        Returns:
+            Tupla (sucesso, mensagem com as linhas gravadas por tabela)
+        """
+        try:
+            from import_store import ImportStore
+
+            store = store or ImportStore()
+            gravadas = store.save(data_dict)
+            if not gravadas:
+                return False, "Nenhuma tabela reconhecida para gravar"
+            resumo = ", ".join(f"{tabela}: {n:,} linhas" for tabela, n in gravadas.items())
+            return True, f"{store.path} ({resumo})"
         except Exception as e:
             return False, f"Erro ao salvar dados: {str(e)}"
 
     @staticmethod
-    def detect_format(df: pd.DataFrame) -> str:
+    def detect_format(df) -> str:
         """
         Detecta o formato dos dados (simples, vendas, produtos)
 
         Args:
-            df: DataFrame a analisar
+            df: DataFrame a analisar ou só a lista de colunas (read_header)
 
         Returns:
             String indicando o formato detectado
         """
-        cols_upper = [col.upper().strip() for col in df.columns]
+        cols_upper = [str(col).upper().strip() for col in getattr(df, 'columns', df)]
 
         # Verificar formato de vendas (mais completo)
         if all(col in cols_upper for col in ['VLR_VENDA', 'CUSTO', 'QTDE_DOCUMENTOS']):
@@ -0,0 +1,221 @@
+"""
+Módulo de Armazém de Dados Compartilhado
+Mantém uma única cópia, somente leitura, das tabelas e agregados por processo;
+cada sessão do Streamlit recebe apenas visões baratas sobre ela
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import forecasting
+import perf
+import rolling
+from data_partitions import (
+    apply_import, ensure_partitions, read_partition, previous_key,
+    GLOBAL_DIR, PARTITIONS_DIR, SOURCE_FILE,
+)
+
+DIAS_SEMANA_PT = {'Monday': 'Segunda', 'Tuesday': 'Terça', 'Wednesday': 'Quarta', 'Thursday': 'Quinta',
+                  'Friday': 'Sexta', 'Saturday': 'Sábado', 'Sunday': 'Domingo'}
+
+
+def copy_on_write() -> bool:
+    """Copy-on-Write ativo: sempre no pandas >= 3.0; no 2.x só se a aplicação ligou mode.copy_on_write"""
+    return int(pd.__version__.split('.')[0]) >= 3 or pd.get_option("mode.copy_on_write") is True
+
+
+def _view(tables: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Cópias para a sessão: ela pode alterar e adicionar colunas sem tocar nos dados compartilhados
+
+    Com Copy-on-Write (padrão do pandas >= 3, exigido em requirements.txt) a
+    cópia rasa basta: fatias e cópias rasas nunca alteram o original. Num
+    pandas 2.x sem ele a cópia teria de ser profunda.
+    """
+    rasa = copy_on_write()
+    return {name: df.copy(deep=not rasa) for name, df in tables.items()}
+
+
+def compute_aggregates(tables: Dict[str, pd.DataFrame]) -> Dict:
+    """
+    Pré-calcula os agregados de um mês usados por várias páginas
+
+    Args:
+        tables: Tabelas da partição (vendas_mensais, vendas_diarias, erosao)
+
+    Returns:
+        Dicionário com totais do mês e faturamento diário já com dia da semana
+    """
+    vm = tables['vendas_mensais']; vd = tables['vendas_diarias']
+    fat = float(vm['Vlr_Venda'].sum()) if not vm.empty else 0.0
+    agg = {
+        'fat': fat,
+        'lucro': float(vm['Vlr_Lucro'].sum()) if not vm.empty else 0.0,
+        'cupons': float(vm['Qtde_Documentos'].sum()) if not vm.empty else 0.0,
+        'markdown': float((vm['Vlr_Venda'] * vm['Markdown_Pct']).sum() / fat) if fat else 0.0,
+    }
+    if vd.empty:
+        agg['diario'] = pd.DataFrame(columns=['Data', 'Vlr_Venda', 'Sem', 'DSP'])
+    else:
+        diario = vd.groupby(pd.to_datetime(vd['Data']))['Vlr_Venda'].sum().reset_index()
+        diario['Sem'] = diario['Data'].dt.isocalendar().week.astype(int)
+        diario['DSP'] = diario['Data'].dt.day_name().map(DIAS_SEMANA_PT)
+        agg['diario'] = diario
+    return agg
+
+
+class DataStore:
+    """Armazém somente leitura compartilhado entre todas as sessões do processo"""
+
+    def __init__(self, source: str = SOURCE_FILE, root: Path = PARTITIONS_DIR, max_periodos: int = 12):
+        """
+        Inicializa o armazém
+
+        Args:
+            source: Planilha de origem das partições
+            root: Diretório das partições mensais
+            max_periodos: Quantos meses manter em memória (LRU)
+        """
+        self.source = source
+        self.root = root
+        self.max_periodos = max_periodos
+        self.version = 0
+        self._lock = threading.RLock()
+        self._periodos_disponiveis: List[str] = []
+        self._globais: Optional[Dict[str, pd.DataFrame]] = None
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._resumos: Dict[str, Dict] = {}  # contribuição de cada mês ao histórico (forecasting.month_summary)
+        self._derived: Dict = {}
+        self.refresh()
+
+    def refresh(self, periodos: Optional[List[str]] = None) -> int:
+        """
+        Gancho de atualização após ingestão de dados novos
+
+        Args:
+            periodos: Meses afetados ('AAAA-MM'); None descarta tudo
+
+        Returns:
+            Nova versão do armazém
+        """
+        with self._lock:
+            self._periodos_disponiveis = ensure_partitions(self.source, self.root)
+            if periodos is None:
+                self._globais = None
+                self._cache.clear()
+                self._resumos.clear()
+            else:
+                for key in periodos:
+                    self._cache.pop(key, None)
+                    self._resumos.pop(key, None)
+            # Histórico, previsões e janelas móveis cobrem todos os meses: são refeitos,
+            # mas a partir dos resumos guardados, relendo só os meses afetados
+            self._derived.clear()
+            self.version += 1
+            # Agregados globais recalculados já na ingestão, não no primeiro acesso
+            self.previsoes()
+            return self.version
+
+    def apply_import(self, updates: Dict[str, Dict[str, pd.DataFrame]]) -> int:
+        """
+        Publica meses importados e invalida só as partições afetadas
+
+        Args:
+            updates: {'AAAA-MM': {nome da tabela: DataFrame do mês}}
+
+        Returns:
+            Nova versão do armazém
+        """
+        with self._lock:
+            return self.refresh(apply_import(updates, self.root))
+
+    def periodos(self) -> List[str]:
+        """Meses disponíveis, em ordem crescente"""
+        return list(self._periodos_disponiveis)
+
+    def globais(self) -> Dict[str, pd.DataFrame]:
+        """Tabelas sem partição (produtos, calendário, yoy)"""
+        with self._lock:
+            if self._globais is None:
+                self._globais = read_partition(GLOBAL_DIR, self.root)
+            return self._globais
+
+    def partition(self, key: str) -> Dict:
+        """
+        Tabelas e agregados de um mês, carregados uma vez por processo
+
+        Returns:
+            {'tables': {...}, 'agg': {...}}
+        """
+        with self._lock:
+            if key in self._cache:
+                perf.count_cache(True)
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            perf.count_cache(False)
+            tables = read_partition(key, self.root)
+            entry = {'tables': tables, 'agg': compute_aggregates(tables)}
+            self._cache[key] = entry
+            while len(self._cache) > self.max_periodos:
+                self._cache.popitem(last=False)
+            return entry
+
+    def derived(self, name: str, fn: Callable):
+        """
+        Memoiza um agregado derivado até a próxima atualização (versão)
+
+        Args:
+            name: Chave do agregado
+            fn: Função sem argumentos que o calcula
+        """
+        with self._lock:
+            perf.count_cache(name in self._derived)
+            if name not in self._derived:
+                self._derived[name] = fn()
+            return self._derived[name]
+
+    def historico(self) -> Tuple[pd.DataFrame, pd.DatetimeIndex, np.ndarray]:
+        """Cubo séries × meses de faturamento (total, categorias, top produtos) da versão atual"""
+        return self.derived('historico', lambda: forecasting.build_history(
+            self.globais(), resumos={k: self._resumo(k) for k in self._periodos_disponiveis}))
+
+    def _resumo(self, key: str) -> Dict:
+        """Contribuição do mês ao histórico, calculada uma vez por versão da partição"""
+        with self._lock:
+            if key not in self._resumos:
+                tables = self._cache[key]['tables'] if key in self._cache else read_partition(key, self.root)
+                self._resumos[key] = forecasting.month_summary(tables)
+            return self._resumos[key]
+
+    def previsoes(self) -> Dict[str, pd.DataFrame]:
+        """Projeções de 12 meses (total, categorias e top produtos) da versão atual"""
+        return self.derived('previsoes', lambda: forecasting.precompute(None, None, self.historico()))
+
+    def rolling(self, janela: int = 12) -> pd.DataFrame:
+        """Métricas móveis de todas as séries para a janela, memoizadas por versão"""
+        return self.derived(f'rolling_{janela}', lambda: rolling.calcular(*self.historico(), janela=janela))
+
+    def snapshot(self, key: str) -> Dict:
+        """
+        Visão de um mês para uma sessão: tabelas globais + do mês + mês anterior
+
+        Args:
+            key: Mês selecionado ('AAAA-MM')
+
+        Returns:
+            Dicionário no formato esperado pelas páginas do dashboard
+        """
+        entry = self.partition(key)
+        data = _view(self.globais())
+        data.update(_view(entry['tables']))
+        data['agg'] = {k: v.copy(deep=not copy_on_write()) if isinstance(v, pd.DataFrame) else v for k, v in entry['agg'].items()}
+        data['previsoes'] = _view(self.previsoes())
+        data['periodo'] = key
+        data['version'] = self.version
+        anterior = previous_key(key)
+        data['anterior'] = _view(self.partition(anterior)['tables']) if anterior in self._periodos_disponiveis else None
+        return data
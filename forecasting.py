@@ -0,0 +1,265 @@
+"""
+Módulo de Previsão Sazonal
+Ajusta modelos sazonais para o total da loja, cada categoria e os principais
+produtos em uma única passada NumPy sobre o cubo de histórico (séries × meses)
+e pré-calcula 12 meses de projeção com intervalos de previsão
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple
+
+HORIZONTE = 12
+SAZONALIDADE = 12
+TOP_PRODUTOS = 20
+JANELA_HW = 36  # meses usados pelo Holt-Winters
+Z_INTERVALO = 1.2816  # intervalo de previsão de 80%
+SIGMA_PADRAO = 0.10  # incerteza (log) quando não há resíduos suficientes
+
+# Grade de parâmetros do Holt-Winters avaliada em lote (α, β, γ)
+HW_GRID = np.array([(a, b, g) for a in (0.1, 0.3, 0.5) for b in (0.0, 0.05, 0.15) for g in (0.05, 0.2, 0.4)])
+
+
+def month_summary(tables: Dict[str, pd.DataFrame]) -> Dict:
+    """
+    Contribuição de um mês ao cubo de histórico
+
+    Args:
+        tables: Tabelas da partição (vendas_mensais, vendas_diarias)
+
+    Returns:
+        {'total': faturamento (None sem vendas), 'categorias': Series por categoria,
+         'produtos': Series por produto (None nos fatos importados, que vêm por data e categoria)}
+    """
+    vm = tables['vendas_mensais']; vd = tables['vendas_diarias']
+    return {
+        'total': float(vm['Vlr_Venda'].sum()) if not vm.empty else None,
+        'categorias': vm.groupby('Categoria')['Vlr_Venda'].sum() if not vm.empty else pd.Series(dtype=float),
+        'produtos': vd.groupby('Produto')['Vlr_Venda'].sum() if not vd.empty and 'Produto' in vd else None,
+    }
+
+
+def build_history(globais: Dict[str, pd.DataFrame], partitions: Optional[Dict[str, Dict[str, pd.DataFrame]]] = None,
+                  resumos: Optional[Dict[str, Dict]] = None) -> Tuple[pd.DataFrame, pd.DatetimeIndex, np.ndarray]:
+    """
+    Monta o cubo de histórico mensal de faturamento
+
+    Args:
+        globais: Tabelas globais (usa comparativo_yoy para o total da loja)
+        partitions: {chave 'AAAA-MM': tabelas do mês}
+        resumos: {chave 'AAAA-MM': month_summary do mês}, no lugar de partitions
+
+    Returns:
+        Tupla (séries [Serie, Nivel], meses, matriz séries × meses com NaN onde não há dado)
+    """
+    series: Dict[Tuple[str, str], Dict[pd.Timestamp, float]] = {}
+    total = series.setdefault(('Total', 'total'), {})
+
+    yoy = globais.get('yoy', pd.DataFrame())
+    for col in yoy.columns:
+        m = re.fullmatch(r'Receita_(\d{4})', col)
+        if m:
+            for mes, v in zip(yoy['Mes_Num'], yoy[col]):
+                if v > 0:
+                    total[pd.Timestamp(int(m.group(1)), int(mes), 1)] = float(v)
+
+    if resumos is None:
+        resumos = {key: month_summary(tables) for key, tables in (partitions or {}).items()}
+    produtos_mes = []
+    for key, resumo in resumos.items():
+        data = pd.Timestamp(f"{key}-01")
+        if resumo['total'] is not None:
+            total[data] = resumo['total']
+            for cat, v in resumo['categorias'].items():
+                series.setdefault((cat, 'categoria'), {})[data] = float(v)
+        if resumo['produtos'] is not None:
+            produtos_mes.append(resumo['produtos'].rename(data))
+
+    if produtos_mes:
+        pm = pd.concat(produtos_mes, axis=1).sort_index(axis=1)
+        recentes = pm.iloc[:, -SAZONALIDADE:].sum(axis=1).nlargest(TOP_PRODUTOS).index
+        for prod in recentes:
+            series[(prod, 'produto')] = pm.loc[prod].dropna().to_dict()
+
+    todas = sorted({d for s in series.values() for d in s})
+    meses = pd.date_range(todas[0], todas[-1], freq='MS') if todas else pd.DatetimeIndex([])
+    Y = np.full((len(series), len(meses)), np.nan)
+    pos = {d: i for i, d in enumerate(meses)}
+    for i, valores in enumerate(series.values()):
+        for d, v in valores.items():
+            Y[i, pos[d]] = v
+    # Categoria/produto sem venda em um mês depois de aparecer = 0, não "sem dado"
+    nivel = np.array([n for _, n in series])
+    iniciou = np.cumsum(~np.isnan(Y), axis=1) > 0
+    Y = np.where(np.isnan(Y) & iniciou & (nivel != 'total')[:, None], 0.0, Y)
+
+    meta = pd.DataFrame(list(series), columns=['Serie', 'Nivel'])
+    return meta, meses, Y
+
+
+def seasonal_naive_drift(Y: np.ndarray, horizonte: int = HORIZONTE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sazonal ingênuo com deriva multiplicativa, vetorizado sobre as séries
+
+    ŷ(T+h) = y(T+h−12k) · r^k, com k = ceil(h/12) e r = Σy(t) / Σy(t−12)
+    sobre os pares válidos. A incerteza vem do desvio dos log-crescimentos.
+
+    Returns:
+        Tupla (previsões S×H, crescimento r por série, sigma log por série)
+    """
+    S, T = Y.shape
+    r = np.full(S, np.nan); sigma = np.full(S, np.nan)
+    if T > SAZONALIDADE:
+        cur, prev = Y[:, SAZONALIDADE:], Y[:, :-SAZONALIDADE]
+        ok = (cur > 0) & (prev > 0)
+        n = ok.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = np.where(n > 0, np.where(ok, cur, 0).sum(axis=1) / np.where(ok, prev, 0).sum(axis=1), np.nan)
+            logres = np.where(ok, np.log(np.where(ok, cur / np.where(ok, prev, 1), 1)) - np.log(r)[:, None], 0)
+            sigma = np.where(n > 1, np.sqrt((logres ** 2).sum(axis=1) / np.maximum(n - 1, 1)), np.nan)
+
+    h = np.arange(1, horizonte + 1)
+    k = np.ceil(h / SAZONALIDADE)
+    if T >= SAZONALIDADE:
+        base = Y[:, T - SAZONALIDADE:][:, (h - 1) % SAZONALIDADE]
+    else:
+        base = np.full((S, horizonte), np.nan)
+    return base * r[:, None] ** k, r, sigma
+
+
+def holt_winters(Y: np.ndarray, horizonte: int = HORIZONTE, grid: np.ndarray = HW_GRID) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Holt-Winters aditivo ajustado em lote: séries × combinações de parâmetros
+
+    Todas as séries precisam de ao menos duas temporadas completas sem NaN.
+    Para cada série escolhe a combinação (α, β, γ) de menor erro quadrático
+    de um passo à frente.
+
+    Returns:
+        Tupla (previsões S×H, desvio-padrão dos resíduos por série)
+    """
+    S, T = Y.shape
+    m = SAZONALIDADE
+    a, b, g = grid[:, 0], grid[:, 1], grid[:, 2]
+    P = len(grid)
+
+    l0 = Y[:, :m].mean(axis=1)
+    b0 = (Y[:, m:2 * m].mean(axis=1) - l0) / m
+    L = np.repeat(l0[:, None], P, axis=1)
+    B = np.repeat(b0[:, None], P, axis=1)
+    season = np.repeat((Y[:, :m] - l0[:, None])[:, :, None], P, axis=2)
+    sse = np.zeros((S, P))
+
+    for t in range(m, T):
+        s = season[:, t % m, :]
+        y = Y[:, t, None]
+        sse += (y - (L + B + s)) ** 2
+        L_new = a * (y - s) + (1 - a) * (L + B)
+        B = b * (L_new - L) + (1 - b) * B
+        season[:, t % m, :] = g * (y - L_new) + (1 - g) * s
+        L = L_new
+
+    best = sse.argmin(axis=1)
+    idx = np.arange(S)
+    h = np.arange(1, horizonte + 1)
+    slots = (T - 1 + h) % m
+    prev = L[idx, best][:, None] + h * B[idx, best][:, None] + season[idx[:, None], slots[None, :], best[:, None]]
+    sigma = np.sqrt(sse[idx, best] / max(T - m, 1))
+    return prev, sigma
+
+
+def forecast(meta: pd.DataFrame, meses: pd.DatetimeIndex, Y: np.ndarray, horizonte: int = HORIZONTE) -> Dict[str, pd.DataFrame]:
+    """
+    Projeta todas as séries do cubo
+
+    Holt-Winters para séries com 24+ meses completos na janela; sazonal
+    ingênuo com deriva para as demais com uma temporada completa; e rateio
+    do total (top-down) para séries com menos de 12 meses de histórico.
+
+    Returns:
+        {'previsoes': Serie/Nivel/Data/Ano/Mes_Num/Previsao/Inf/Sup,
+         'modelos': Serie/Nivel/Modelo/Crescimento/Sigma/N_obs,
+         'indices': Serie/Nivel/Mes_Num/Indice}
+    """
+    S, T = Y.shape
+    nivel = meta['Nivel'].to_numpy()
+    total = int(np.flatnonzero(nivel == 'total')[0])
+
+    h = np.arange(1, horizonte + 1)
+    k = np.ceil(h / SAZONALIDADE)
+    prev, r, sigma_log = seasonal_naive_drift(Y, horizonte)
+    # Séries com uma temporada mas sem pares ano contra ano usam o crescimento da loja
+    if T >= SAZONALIDADE:
+        r_loja = r[total] if np.isfinite(r[total]) else 1.0
+        base = Y[:, T - SAZONALIDADE:][:, (h - 1) % SAZONALIDADE]
+        sem_r = ~np.isfinite(r) & np.isfinite(base).all(axis=1)
+        prev[sem_r] = base[sem_r] * r_loja ** k
+        r[sem_r] = r_loja
+
+    # Sigma agrupado por nível quando a série não tem resíduos próprios
+    for nv in np.unique(nivel):
+        sel = nivel == nv
+        pool = sigma_log[sel][np.isfinite(sigma_log[sel])]
+        sigma_log[sel & ~np.isfinite(sigma_log)] = np.sqrt(np.mean(pool ** 2)) if len(pool) else SIGMA_PADRAO
+    fator = np.exp(Z_INTERVALO * sigma_log[:, None] * np.sqrt(k))
+    inf, sup = prev / fator, prev * fator
+    modelo = np.where(np.isfinite(prev).all(axis=1), 'sazonal_ingenuo', 'rateio_total').astype(object)
+
+    # Holt-Winters em lote para quem tem duas temporadas completas na janela
+    w = min(T, JANELA_HW)
+    janela = Y[:, T - w:]
+    hw = np.isfinite(janela).all(axis=1) if w >= 2 * SAZONALIDADE else np.zeros(S, dtype=bool)
+    if hw.any():
+        p_hw, s_hw = holt_winters(janela[hw], horizonte)
+        prev[hw] = p_hw
+        inf[hw] = p_hw - Z_INTERVALO * s_hw[:, None] * np.sqrt(h)
+        sup[hw] = p_hw + Z_INTERVALO * s_hw[:, None] * np.sqrt(h)
+        sigma_log[hw] = s_hw / np.maximum(np.abs(janela[hw]).mean(axis=1), 1e-9)
+        modelo[hw] = 'holt_winters'
+
+    # Rateio: participação recente da série no total × previsão do total
+    td = modelo == 'rateio_total'
+    if td.any():
+        ult = slice(max(0, T - SAZONALIDADE), T)
+        validos = np.isfinite(Y[td, ult])
+        tot = np.where(validos, Y[total, ult][None, :], 0).sum(axis=1)
+        share = np.where(tot > 0, np.nansum(Y[td, ult], axis=1) / np.where(tot > 0, tot, 1), 0)
+        prev[td] = share[:, None] * prev[total]
+        inf[td] = share[:, None] * inf[total]
+        sup[td] = share[:, None] * sup[total]
+
+    prev = np.clip(prev, 0, None); inf = np.clip(inf, 0, None); sup = np.clip(sup, 0, None)
+    futuro = pd.date_range(meses[-1] + pd.offsets.MonthBegin(1), periods=horizonte, freq='MS')
+
+    previsoes = pd.DataFrame({
+        'Serie': np.repeat(meta['Serie'].to_numpy(), horizonte),
+        'Nivel': np.repeat(nivel, horizonte),
+        'Data': np.tile(futuro, S),
+        'Previsao': prev.ravel(), 'Inf': inf.ravel(), 'Sup': sup.ravel(),
+    })
+    previsoes['Ano'] = previsoes['Data'].dt.year
+    previsoes['Mes_Num'] = previsoes['Data'].dt.month
+
+    modelos = meta.assign(Modelo=modelo, Crescimento=r, Sigma=sigma_log, N_obs=np.isfinite(Y).sum(axis=1))
+
+    # Índice sazonal por série: mês projetado ÷ média dos 12 meses projetados
+    media = prev.mean(axis=1, keepdims=True)
+    idx = np.where(media > 0, prev / np.where(media > 0, media, 1), 1.0)
+    indices = pd.DataFrame({
+        'Serie': np.repeat(meta['Serie'].to_numpy(), horizonte),
+        'Nivel': np.repeat(nivel, horizonte),
+        'Mes_Num': np.tile(futuro.month, S),
+        'Indice': idx.ravel(),
+    })
+    return {'previsoes': previsoes, 'modelos': modelos, 'indices': indices}
+
+
+def precompute(globais: Dict[str, pd.DataFrame], partitions: Dict[str, Dict[str, pd.DataFrame]],
+               historico: Optional[Tuple[pd.DataFrame, pd.DatetimeIndex, np.ndarray]] = None) -> Dict[str, pd.DataFrame]:
+    """Monta o cubo (ou usa o já montado) e projeta tudo (chamado na ingestão/atualização do armazém)"""
+    meta, meses, Y = historico if historico is not None else build_history(globais, partitions)
+    if len(meses) == 0:
+        vazio = pd.DataFrame(columns=['Serie', 'Nivel'])
+        return {'previsoes': vazio, 'modelos': vazio, 'indices': vazio}
+    return forecast(meta, meses, Y)
@@ -0,0 +1,164 @@
+"""
+Módulo de Fila de Importações
+Processa uploads em segundo plano (pool de threads limitado) e registra
+cada job em uma tabela SQLite; recarregar a página não cancela o trabalho
+"""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from import_store import DB_FILE, ImportStore
+
+UPLOAD_DIR = Path(os.getenv("DUBAIRRO_UPLOADS", "dados/uploads"))
+MAX_WORKERS = int(os.getenv("DUBAIRRO_IMPORT_WORKERS", "2"))
+PROGRESSO_INTERVALO = 0.5  # segundos entre gravações de progresso
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, arquivo TEXT NOT NULL, nome TEXT NOT NULL, formato TEXT NOT NULL, usuario TEXT,
+    status TEXT NOT NULL, progresso REAL DEFAULT 0, mensagem TEXT, resultado TEXT,
+    criado_em TEXT, iniciado_em TEXT, concluido_em TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_criado ON jobs (criado_em);
+"""
+
+PENDENTE, PROCESSANDO, CONCLUIDO, ERRO = 'pendente', 'processando', 'concluido', 'erro'
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class JobRunner:
+    """Fila persistente de importações com limite de workers"""
+
+    def __init__(self, db: Path = DB_FILE, upload_dir: Path = UPLOAD_DIR, max_workers: int = MAX_WORKERS,
+                 store: Optional[ImportStore] = None, on_complete: Optional[Callable[[List[str]], None]] = None):
+        """
+        Inicializa a fila e retoma jobs interrompidos por reinício do servidor
+
+        Args:
+            db: Banco SQLite da tabela de jobs (o mesmo das importações por padrão)
+            upload_dir: Onde os arquivos enviados ficam até serem processados
+            max_workers: Uploads processados em paralelo
+            store: Armazém de destino (default: ImportStore no mesmo banco)
+            on_complete: Chamado com os meses gravados ao fim de cada job bem-sucedido
+        """
+        self.db = Path(db)
+        self.upload_dir = Path(upload_dir)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.store = store or ImportStore(self.db)
+        self.max_workers = max_workers
+        self.on_complete = on_complete
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="importacao")
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._recover()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _update(self, job_id: str, **campos) -> None:
+        with self._connect() as conn, conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in campos)} WHERE id = ?", [*campos.values(), job_id])
+
+    def _recover(self) -> None:
+        """Reenfileira jobs que estavam pendentes ou em andamento quando o processo parou"""
+        with self._connect() as conn:
+            ids = [r['id'] for r in conn.execute("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY criado_em", (PENDENTE, PROCESSANDO))]
+        for job_id in ids:
+            self._update(job_id, status=PENDENTE, progresso=0.0, mensagem="Retomado após reinício")
+            self._executor.submit(self._run, job_id)
+
+    def submit(self, conteudo: bytes, nome: str, formato: str, usuario: Optional[str] = None) -> str:
+        """
+        Grava o arquivo e enfileira o processamento
+
+        Args:
+            conteudo: Bytes do arquivo enviado
+            nome: Nome original (a extensão define o leitor)
+            formato: Formato detectado ('vendas', 'produtos', 'simples')
+            usuario: Quem enviou
+
+        Returns:
+            Identificador do job
+        """
+        job_id = uuid.uuid4().hex[:12]
+        arquivo = self.upload_dir / f"{job_id}_{Path(nome).name}"
+        arquivo.write_bytes(conteudo)
+        with self._connect() as conn, conn:
+            conn.execute("INSERT INTO jobs (id, arquivo, nome, formato, usuario, status, mensagem, criado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (job_id, str(arquivo), nome, formato, usuario, PENDENTE, "Na fila", _agora()))
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id: str) -> None:
+        """Executa um job no worker (fora da thread do script do Streamlit)"""
+        from data_processor import DataProcessor
+
+        job = self.get(job_id)
+        if job is None:
+            return
+        self._update(job_id, status=PROCESSANDO, iniciado_em=_agora(), mensagem="Lendo arquivo")
+        ultimo = [0.0]
+
+        def progresso(frac: float, msg: str) -> None:
+            if time.monotonic() - ultimo[0] >= PROGRESSO_INTERVALO or frac >= 1.0:
+                ultimo[0] = time.monotonic()
+                self._update(job_id, progresso=round(float(frac), 3), mensagem=msg)
+
+        try:
+            data_dict, erros, stats = DataProcessor.process_stream(job['arquivo'], job['nome'], job['formato'], progress=progresso)
+            ok, msg = DataProcessor.save_processed_data(data_dict, self.store)
+            if not erros.empty:
+                erros.to_csv(self.erros_path(job_id), index=False, encoding='utf-8-sig')
+            resultado = {'stats': stats, 'meses': list(DataProcessor.to_partitions(data_dict)), 'destino': msg}
+            if ok and self.on_complete and resultado['meses']:
+                # Publica antes do status final: um job concluído já tem os meses no seletor do dashboard
+                self._update(job_id, progresso=1.0, mensagem="Publicando os meses no dashboard")
+                self.on_complete(resultado['meses'])
+            self._update(job_id, status=CONCLUIDO if ok else ERRO, progresso=1.0, mensagem=msg,
+                         resultado=json.dumps(resultado, ensure_ascii=False), concluido_em=_agora())
+            if ok:
+                os.remove(job['arquivo'])
+        except Exception as e:
+            self._update(job_id, status=ERRO, mensagem=str(e), concluido_em=_agora())
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Estado atual de um job (None se não existir)"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['resultado'] = json.loads(job['resultado']) if job['resultado'] else None
+        return job
+
+    def list(self, limit: int = 20) -> pd.DataFrame:
+        """Jobs mais recentes primeiro"""
+        with self._connect() as conn:
+            return pd.read_sql_query("SELECT * FROM jobs ORDER BY criado_em DESC, rowid DESC LIMIT ?", conn, params=[limit])
+
+    def ativos(self) -> int:
+        """Quantos jobs ainda estão na fila ou em andamento"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (PENDENTE, PROCESSANDO)).fetchone()[0]
+
+    def erros_path(self, job_id: str) -> Path:
+        """Arquivo CSV com as linhas recusadas do job"""
+        return self.upload_dir / f"{job_id}_erros.csv"
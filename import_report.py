@@ -0,0 +1,86 @@
+"""
+Relatório de tempo de importação (cold start) do dashboard.
+
+Executa um interpretador novo com `python -X importtime`, importando o app
+como o Streamlit faz na primeira execução, e agrega o custo por pacote de
+topo. Com --json, acrescenta o resultado a um arquivo JSON Lines para
+acompanhar a evolução entre versões.
+
+Uso:
+    python import_report.py
+    python import_report.py --modules pandas plotly.express --top 20
+    python import_report.py --json logs/import_times.jsonl
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from datetime import datetime
+
+# Importar o app executa o corpo do script (set_page_config, CSS, constantes),
+# mas não main(): é exatamente o custo fixo de cada cold start.
+DEFAULT_TARGET = "app"
+
+
+def measure(modules):
+    """
+    Roda as importações em um processo limpo e devolve as linhas do importtime
+
+    Returns:
+        Lista de (self_us, cumulative_us, nível, nome do módulo)
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cum_us), level, name.strip()))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return rows
+
+
+def summarize(rows):
+    """Soma o tempo próprio (self) de cada módulo no pacote de topo correspondente"""
+    per_pkg = defaultdict(int)
+    for self_us, _, _, name in rows:
+        per_pkg[name.split(".")[0]] += self_us
+    return dict(sorted(per_pkg.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", nargs="+", default=[DEFAULT_TARGET], help="Módulos a importar (padrão: app)")
+    parser.add_argument("--top", type=int, default=15, help="Quantos pacotes listar")
+    parser.add_argument("--json", help="Arquivo JSON Lines onde acrescentar o resultado")
+    args = parser.parse_args()
+
+    rows = measure(args.modules)
+    per_pkg = summarize(rows)
+    total = sum(per_pkg.values())
+
+    print(f"Cold start de {', '.join(args.modules)}: {total / 1000:.0f} ms em {len(rows)} módulos")
+    print(f"{'pacote':<28} {'ms':>8} {'%':>6}")
+    for pkg, us in list(per_pkg.items())[:args.top]:
+        print(f"{pkg:<28} {us / 1000:>8.1f} {us / total * 100:>5.1f}%")
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "modules": args.modules,
+                "total_ms": round(total / 1000, 1),
+                "packages_ms": {k: round(v / 1000, 1) for k, v in per_pkg.items()},
+            }, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
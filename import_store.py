@@ -0,0 +1,260 @@
+"""
+Módulo de Armazém de Importações
+Banco SQLite embutido (só biblioteca padrão) com os fatos e produtos
+importados; reenviar o mesmo mês substitui as linhas em vez de duplicá-las.
+Os fatos mensais das vendas são refeitos a partir dos diários, então
+arquivos com partes de um mesmo mês se somam em vez de se sobrescrever
+"""
+
+import os
+import sqlite3
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+DB_FILE = Path(os.getenv("DUBAIRRO_IMPORT_DB", "dados/importacao.db"))
+BATCH_ROWS = 5_000  # linhas por executemany dentro da transação
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vendas_mensais (
+    ano INTEGER NOT NULL, mes INTEGER NOT NULL, categoria TEXT NOT NULL,
+    vlr_venda REAL, vlr_lucro REAL, qtde_documentos REAL, markdown_pct REAL, atualizado_em TEXT,
+    PRIMARY KEY (ano, mes, categoria)
+);
+CREATE INDEX IF NOT EXISTS ix_mensais_categoria ON vendas_mensais (categoria, ano, mes);
+
+CREATE TABLE IF NOT EXISTS vendas_diarias (
+    data TEXT NOT NULL, categoria TEXT NOT NULL,
+    vlr_venda REAL, vlr_lucro REAL, qtde_documentos REAL, markdown_pct REAL, atualizado_em TEXT,
+    PRIMARY KEY (data, categoria)
+);
+CREATE INDEX IF NOT EXISTS ix_diarias_categoria ON vendas_diarias (categoria, data);
+
+CREATE TABLE IF NOT EXISTS produtos (
+    produto TEXT PRIMARY KEY, categoria TEXT,
+    custo_medio REAL, preco REAL, estoque REAL, margem REAL, atualizado_em TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_produtos_categoria ON produtos (categoria);
+
+CREATE TABLE IF NOT EXISTS vendas_simples (
+    data TEXT NOT NULL, categoria TEXT NOT NULL, produto TEXT NOT NULL, faturamento REAL, atualizado_em TEXT,
+    PRIMARY KEY (data, categoria, produto)
+);
+CREATE INDEX IF NOT EXISTS ix_simples_produto ON vendas_simples (produto, data);
+CREATE INDEX IF NOT EXISTS ix_simples_categoria ON vendas_simples (categoria, data);
+"""
+
+# aba de origem -> (tabela, {coluna do DataFrame: coluna do banco}, chave natural)
+TABELAS = {
+    'fato_vendas_mensais': ('vendas_mensais', {
+        'Ano': 'ano', 'Mes': 'mes', 'Categoria': 'categoria', 'Vlr_Venda': 'vlr_venda',
+        'Vlr_Lucro': 'vlr_lucro', 'Qtde_Documentos': 'qtde_documentos', 'Markdown_Pct': 'markdown_pct'},
+        ('ano', 'mes', 'categoria')),
+    'fato_vendas_diarias': ('vendas_diarias', {
+        'Data': 'data', 'Categoria': 'categoria', 'Vlr_Venda': 'vlr_venda',
+        'Vlr_Lucro': 'vlr_lucro', 'Qtde_Documentos': 'qtde_documentos', 'Markdown_Pct': 'markdown_pct'},
+        ('data', 'categoria')),
+    'dim_produtos': ('produtos', {
+        'PRODUTO': 'produto', 'CATEGORIA': 'categoria', 'CUSTO_MEDIO': 'custo_medio',
+        'PRECO': 'preco', 'ESTOQUE': 'estoque', 'MARGEM': 'margem'},
+        ('produto',)),
+    'dados_importados': ('vendas_simples', {
+        'DATA': 'data', 'CATEGORIA': 'categoria', 'PRODUTO': 'produto', 'FATURAMENTO': 'faturamento'},
+        ('data', 'categoria', 'produto')),
+}
+# aba -> colunas cujos valores o arquivo cobre por inteiro: as linhas antigas desses dias/meses
+# saem antes da gravação (categoria que sumiu do reenvio não fica para trás)
+SUBSTITUI = {'fato_vendas_diarias': ('data',), 'fato_vendas_mensais': ('ano', 'mes')}
+
+# Fatos mensais dos meses tocados, somados dos diários (markdown ponderado pela receita)
+MENSAIS_DE_DIARIAS = """
+INSERT INTO vendas_mensais (ano, mes, categoria, vlr_venda, vlr_lucro, qtde_documentos, markdown_pct, atualizado_em)
+SELECT CAST(substr(data, 1, 4) AS INTEGER), CAST(substr(data, 6, 2) AS INTEGER), categoria, SUM(vlr_venda), SUM(vlr_lucro),
+       SUM(qtde_documentos), COALESCE(SUM(vlr_venda * markdown_pct) / NULLIF(SUM(vlr_venda), 0), 0), ?
+FROM vendas_diarias WHERE substr(data, 1, 7) = ? GROUP BY 1, 2, 3
+"""
+
+
+class ImportStore:
+    """Fatos e produtos importados, gravados com upsert pela chave natural"""
+
+    def __init__(self, path: Path = DB_FILE):
+        """
+        Abre (ou cria) o banco de importações
+
+        Args:
+            path: Caminho do arquivo SQLite
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn, conn:
+            conn.executescript(SCHEMA)
+            if 'markdown_pct' not in {c[1] for c in conn.execute("PRAGMA table_info(vendas_diarias)")}:
+                # Bancos anteriores: os dias herdam o markdown do mês para que refazer o mês não o zere
+                conn.execute("ALTER TABLE vendas_diarias ADD COLUMN markdown_pct REAL")
+                conn.execute("UPDATE vendas_diarias SET markdown_pct = (SELECT m.markdown_pct FROM vendas_mensais m WHERE "
+                             "m.ano = CAST(substr(data, 1, 4) AS INTEGER) AND m.mes = CAST(substr(data, 6, 2) AS INTEGER) "
+                             "AND m.categoria = vendas_diarias.categoria)")
+
+    @contextmanager
+    def _connect(self):
+        """Conexão curta por operação (seguro entre threads do Streamlit)"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def upsert(self, aba: str, df: pd.DataFrame) -> int:
+        """
+        Insere ou substitui linhas de uma aba em uma única transação
+
+        Dias (fato_vendas_diarias) e meses (fato_vendas_mensais) presentes no
+        lote são substituídos por inteiro; gravar diários refaz os mensais
+        dos meses tocados.
+
+        Args:
+            aba: Nome da aba de origem (chave de TABELAS)
+            df: Linhas a gravar
+
+        Returns:
+            Número de linhas gravadas
+        """
+        with self._connect() as conn, conn:  # uma transação para o lote inteiro
+            return self._gravar(conn, aba, df)[TABELAS[aba][0]]
+
+    def _gravar(self, conn: sqlite3.Connection, aba: str, df: pd.DataFrame) -> Dict[str, int]:
+        """Grava uma aba na transação aberta; devolve {tabela: linhas gravadas} (inclui mensais refeitos)"""
+        tabela, colmap, chave = TABELAS[aba]
+        df = df.set_axis(df.columns.astype(str).str.strip(), axis=1)
+        if aba in ('dim_produtos', 'dados_importados'):
+            df = df.set_axis(df.columns.str.upper(), axis=1)
+        faltando = [c for c in colmap if c not in df.columns]
+        if faltando:
+            raise KeyError(f"Colunas faltando para {tabela}: {', '.join(faltando)}")
+
+        dados = df[list(colmap)].rename(columns=colmap)
+        for col in dados.columns:
+            if pd.api.types.is_datetime64_any_dtype(dados[col]):
+                dados[col] = dados[col].dt.strftime('%Y-%m-%d')
+        dados = dados.astype(object).where(dados.notna(), None)
+        agora = datetime.now().isoformat(timespec='seconds')
+        dados['atualizado_em'] = agora
+
+        substitui = SUBSTITUI.get(aba, ())
+        escopo = list(dados[list(substitui)].drop_duplicates().itertuples(index=False, name=None)) if substitui else []
+        if escopo:
+            conn.executemany(f"DELETE FROM {tabela} WHERE {' AND '.join(f'{c} = ?' for c in substitui)}", escopo)
+
+        cols = list(dados.columns)
+        atualiza = ", ".join(f"{c} = excluded.{c}" for c in cols if c not in chave)
+        sql = (f"INSERT INTO {tabela} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+               f"ON CONFLICT ({', '.join(chave)}) DO UPDATE SET {atualiza}")
+        linhas = dados.itertuples(index=False, name=None)
+        gravadas = {tabela: 0}
+        while True:
+            lote = [row for _, row in zip(range(BATCH_ROWS), linhas)]
+            if not lote:
+                break
+            conn.executemany(sql, lote)
+            gravadas[tabela] += len(lote)
+
+        if aba == 'fato_vendas_diarias':
+            meses = sorted({str(d)[:7] for (d,) in escopo})
+            conn.executemany("DELETE FROM vendas_mensais WHERE ano = ? AND mes = ?", [(int(m[:4]), int(m[5:])) for m in meses])
+            gravadas['vendas_mensais'] = sum(conn.execute(MENSAIS_DE_DIARIAS, (agora, m)).rowcount for m in meses)
+        return gravadas
+
+    def save(self, data_dict: Dict[str, pd.DataFrame]) -> Dict[str, int]:
+        """
+        Grava todas as abas reconhecidas de um processamento em uma transação
+
+        Com fatos diários, os mensais do processamento são ignorados: vêm
+        da soma dos diários do banco (que inclui outras partes do mês).
+
+        Returns:
+            {tabela: linhas gravadas}
+        """
+        abas = {aba: df for aba, df in data_dict.items() if aba in TABELAS and not df.empty}
+        if 'fato_vendas_diarias' in abas:
+            abas.pop('fato_vendas_mensais', None)
+        gravadas: Dict[str, int] = {}
+        with self._connect() as conn, conn:
+            for aba, df in abas.items():
+                gravadas.update(self._gravar(conn, aba, df))
+        return gravadas
+
+    def _query(self, sql: str, params: Sequence = ()) -> pd.DataFrame:
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=list(params))
+
+    def vendas_diarias(self, inicio: Optional[str] = None, fim: Optional[str] = None,
+                       categorias: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Fatos diários em um intervalo de datas (usa o índice da chave)
+
+        Args:
+            inicio: Data inicial 'AAAA-MM-DD' (inclusiva)
+            fim: Data final 'AAAA-MM-DD' (inclusiva)
+            categorias: Filtra categorias (usa ix_diarias_categoria)
+
+        Returns:
+            DataFrame [Data, Periodo, Categoria, Vlr_Venda, Vlr_Lucro, Qtde_Documentos]
+        """
+        where, params = ["data BETWEEN ? AND ?"], [inicio or '0000-01-01', fim or '9999-12-31']
+        if categorias:
+            where.append(f"categoria IN ({', '.join('?' * len(categorias))})"); params += list(categorias)
+        return self._query(
+            "SELECT data AS Data, substr(data, 6, 2) || '/' || substr(data, 1, 4) AS Periodo, categoria AS Categoria, "
+            "vlr_venda AS Vlr_Venda, vlr_lucro AS Vlr_Lucro, qtde_documentos AS Qtde_Documentos "
+            f"FROM vendas_diarias WHERE {' AND '.join(where)} ORDER BY data, categoria", params)
+
+    def vendas_mensais(self, inicio: Optional[str] = None, fim: Optional[str] = None,
+                       categorias: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Fatos mensais em um intervalo de meses
+
+        Args:
+            inicio: Mês inicial 'AAAA-MM' (inclusivo)
+            fim: Mês final 'AAAA-MM' (inclusivo)
+            categorias: Filtra categorias
+
+        Returns:
+            DataFrame [Periodo, Mes, Ano, Categoria, Vlr_Venda, Vlr_Lucro, Qtde_Documentos, Markdown_Pct]
+        """
+        a0, m0 = (int(p) for p in (inicio or '0000-01').split('-'))
+        a1, m1 = (int(p) for p in (fim or '9999-12').split('-'))
+        where, params = ["(ano, mes) >= (?, ?) AND (ano, mes) <= (?, ?)"], [a0, m0, a1, m1]
+        if categorias:
+            where.append(f"categoria IN ({', '.join('?' * len(categorias))})"); params += list(categorias)
+        return self._query(
+            "SELECT printf('%02d/%04d', mes, ano) AS Periodo, mes AS Mes, ano AS Ano, categoria AS Categoria, "
+            "vlr_venda AS Vlr_Venda, vlr_lucro AS Vlr_Lucro, qtde_documentos AS Qtde_Documentos, markdown_pct AS Markdown_Pct "
+            f"FROM vendas_mensais WHERE {' AND '.join(where)} ORDER BY ano, mes, categoria", params)
+
+    def produtos(self, categorias: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Cadastro de produtos importado (opcionalmente filtrado por categoria)"""
+        if categorias:
+            return self._query(f"SELECT * FROM produtos WHERE categoria IN ({', '.join('?' * len(categorias))}) ORDER BY produto", categorias)
+        return self._query("SELECT * FROM produtos ORDER BY produto")
+
+    def partition_tables(self, key: str) -> Dict[str, pd.DataFrame]:
+        """
+        Fatos de um mês no formato das partições do dashboard
+
+        Args:
+            key: Mês 'AAAA-MM'
+
+        Returns:
+            {'vendas_mensais': ..., 'vendas_diarias': ...}
+        """
+        return {'vendas_mensais': self.vendas_mensais(key, key), 'vendas_diarias': self.vendas_diarias(f"{key}-01", f"{key}-31")}
+
+    def periodos(self) -> List[str]:
+        """Meses ('AAAA-MM') com fatos mensais importados"""
+        with self._connect() as conn:
+            return [f"{a:04d}-{m:02d}" for a, m in conn.execute("SELECT DISTINCT ano, mes FROM vendas_mensais ORDER BY ano, mes")]
@@ -0,0 +1,328 @@
+"""
+Módulo de Agendamento do Mobne
+Sincroniza produtos e vendas de forma incremental na frequência configurada
+para cada CNPJ, em uma thread do APScheduler fora do ciclo do Streamlit.
+A configuração e o histórico ficam no SQLite do Mobne: ao reiniciar, os
+agendamentos voltam e as execuções perdidas viram uma só. Um lock do
+processo impede duas sincronizações ao mesmo tempo (agendadas ou manuais)
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+
+from mobne_api import MOBNE_API_KEY, MobneAPIClient, obter_cliente
+from mobne_outbox import Outbox
+from mobne_store import DB_FILE, MobneStore, normalizar_cnpj
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIAS = ["A cada 1 hora", "A cada 4 horas", "Diária", "Semanal"]
+DIAS_SEMANA = {'mon': 'Segunda', 'tue': 'Terça', 'wed': 'Quarta', 'thu': 'Quinta',
+               'fri': 'Sexta', 'sat': 'Sábado', 'sun': 'Domingo'}
+ENTIDADES_AGENDADAS = ('produtos', 'vendas')
+AGENDA_TOLERANCIA = int(os.getenv("MOBNE_AGENDA_TOLERANCIA", "3600"))  # segundos de atraso aceitos (e de espera pelo lock)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agendamentos (
+    cnpj TEXT PRIMARY KEY, base_url TEXT, frequencia TEXT NOT NULL, horario TEXT NOT NULL,
+    dia_semana TEXT, ativo INTEGER NOT NULL DEFAULT 1, atualizado_em TEXT
+);
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, cnpj TEXT NOT NULL, inicio TEXT, fim TEXT,
+    status TEXT, produtos INTEGER, vendas INTEGER, mensagem TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_execucoes_cnpj ON execucoes (cnpj, inicio);
+"""
+
+_sync_lock = threading.Lock()
+
+
+@contextmanager
+def sincronizacao_exclusiva(timeout: float = -1):
+    """
+    Lock do processo para sincronizações com o Mobne
+
+    Args:
+        timeout: Segundos de espera pelo lock (-1 = espera o quanto for preciso)
+
+    Yields:
+        True se o lock foi obtido (o bloco roda sozinho); False se esgotou o tempo
+    """
+    obtido = _sync_lock.acquire(timeout=timeout)
+    try:
+        yield obtido
+    finally:
+        if obtido:
+            _sync_lock.release()
+
+
+def gatilho(frequencia: str, horario: str, dia_semana: Optional[str] = None) -> CronTrigger:
+    """
+    Gatilho cron de uma frequência da página
+
+    Args:
+        frequencia: Um de FREQUENCIAS
+        horario: 'HH:MM'; nas frequências por hora, só os minutos (e a fase, nas 4 horas) contam
+        dia_semana: 'mon'...'sun' da frequência semanal
+
+    Returns:
+        CronTrigger no fuso local
+    """
+    hora, minuto = (int(p) for p in horario.split(':')[:2])
+    if frequencia == "A cada 1 hora":
+        return CronTrigger(minute=minuto)
+    if frequencia == "A cada 4 horas":
+        return CronTrigger(hour=f"{hora % 4}-23/4", minute=minuto)
+    if frequencia == "Diária":
+        return CronTrigger(hour=hora, minute=minuto)
+    if frequencia == "Semanal":
+        return CronTrigger(day_of_week=dia_semana or 'mon', hour=hora, minute=minuto)
+    raise ValueError(f"Frequência desconhecida: {frequencia}")
+
+
+class MobneAgendador:
+    """Agendamentos de sincronização por CNPJ, executados em segundo plano"""
+
+    def __init__(self, store: Optional[MobneStore] = None, outbox: Optional[Outbox] = None, db: Path = DB_FILE):
+        """
+        Abre (ou cria) as tabelas, inicia o scheduler e reagenda o que estava ativo
+
+        Args:
+            store: Armazém local (o mesmo da página, para aquecer as leituras dela)
+            outbox: Fila de envio drenada após cada sincronização
+            db: Banco SQLite (o mesmo do armazém local do Mobne por padrão)
+        """
+        self.db = Path(db)
+        self.db.parent.mkdir(parents=True, exist_ok=True)
+        self.store = store or MobneStore(self.db)
+        self.outbox = outbox
+        self._clientes: Dict[str, MobneAPIClient] = {}
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        # coalesce: atrasos viram uma execução; max_instances: um CNPJ nunca roda em paralelo consigo
+        self.scheduler = BackgroundScheduler(daemon=True, job_defaults={
+            'coalesce': True, 'max_instances': 1, 'misfire_grace_time': AGENDA_TOLERANCIA})
+        self.scheduler.start()
+        for config in self.configuracoes():
+            self._agendar(config, recuperar=True)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def configuracoes(self) -> list:
+        """Agendamentos ativos, como dicionários"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(r) for r in conn.execute("SELECT * FROM agendamentos WHERE ativo = 1")]
+
+    def configuracao(self, cnpj: str) -> Optional[Dict]:
+        """Agendamento do CNPJ (ativo ou não) ou None"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM agendamentos WHERE cnpj = ?", (normalizar_cnpj(cnpj),)).fetchone()
+        return dict(row) if row else None
+
+    def salvar(self, client: MobneAPIClient, frequencia: str, horario: str,
+               dia_semana: Optional[str] = None, ativo: bool = True) -> Optional[datetime]:
+        """
+        Grava o agendamento do CNPJ do cliente e o (re)agenda
+
+        A chave de API não vai para o banco: fica em memória enquanto o
+        processo roda. Após um reinício, usa MOBNE_API_KEY ou espera o Mobne
+        ser conectado de novo na página (registrar_cliente).
+
+        Args:
+            client: Cliente conectado do CNPJ
+            frequencia: Um de FREQUENCIAS
+            horario: 'HH:MM'
+            dia_semana: 'mon'...'sun' (frequência semanal)
+            ativo: False remove o agendamento sem apagar o histórico
+
+        Returns:
+            Próxima execução (None se inativo)
+        """
+        gatilho(frequencia, horario, dia_semana)  # valida antes de gravar
+        cnpj = normalizar_cnpj(client.cnpj)
+        self.registrar_cliente(client)
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT INTO agendamentos (cnpj, base_url, frequencia, horario, dia_semana, ativo, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (cnpj) DO UPDATE SET base_url = excluded.base_url, "
+                "frequencia = excluded.frequencia, horario = excluded.horario, dia_semana = excluded.dia_semana, "
+                "ativo = excluded.ativo, atualizado_em = excluded.atualizado_em",
+                (cnpj, client.base_url, frequencia, horario, dia_semana, int(ativo), datetime.now().isoformat(timespec='seconds')))
+        if not ativo:
+            if self.scheduler.get_job(f"mobne-{cnpj}"):
+                self.scheduler.remove_job(f"mobne-{cnpj}")
+            return None
+        return self._agendar(self.configuracao(cnpj))
+
+    def registrar_cliente(self, client: MobneAPIClient) -> None:
+        """Guarda em memória o cliente autenticado que as execuções do CNPJ usam"""
+        self._clientes[normalizar_cnpj(client.cnpj)] = client
+
+    def _agendar(self, config: Dict, recuperar: bool = False) -> Optional[datetime]:
+        """
+        Cria ou substitui o job do CNPJ
+
+        Args:
+            config: Linha de agendamentos
+            recuperar: Na subida do processo, roda já uma vez se alguma execução
+                foi perdida enquanto estava parado (várias perdidas contam como uma)
+        """
+        trigger = gatilho(config['frequencia'], config['horario'], config['dia_semana'])
+        proxima = None
+        if recuperar:
+            ultima = self.historico(config['cnpj'], 1)
+            referencia = ultima['Inicio'].iloc[0] if not ultima.empty else config['atualizado_em']
+            # +1 s: 'inicio' é truncado ao segundo e cairia no próprio horário que executou
+            referencia = (datetime.fromisoformat(referencia) + timedelta(seconds=1)).astimezone(trigger.timezone)
+            perdida = trigger.get_next_fire_time(None, referencia)
+            if perdida is not None and perdida <= datetime.now(trigger.timezone):
+                proxima = datetime.now(trigger.timezone)
+                logger.info(f"Agendamento Mobne {config['cnpj']}: execução de {perdida:%d/%m %H:%M} perdida, rodando agora")
+        kwargs = {'next_run_time': proxima} if proxima else {}
+        job = self.scheduler.add_job(self.executar, trigger, args=[config['cnpj']], id=f"mobne-{config['cnpj']}",
+                                     name=f"Sincronização Mobne {config['cnpj']}", replace_existing=True, **kwargs)
+        return job.next_run_time
+
+    def proxima(self, cnpj: str) -> Optional[datetime]:
+        """Próxima execução agendada do CNPJ"""
+        job = self.scheduler.get_job(f"mobne-{normalizar_cnpj(cnpj)}")
+        return job.next_run_time if job else None
+
+    def _cliente(self, cnpj: str) -> Optional[MobneAPIClient]:
+        """Cliente registrado na página ou, sem ele, o das variáveis de ambiente"""
+        if cnpj in self._clientes:
+            return self._clientes[cnpj]
+        if MOBNE_API_KEY:
+            config = self.configuracao(cnpj) or {}
+            return obter_cliente(MOBNE_API_KEY, cnpj, config.get('base_url'))
+        return None
+
+    def executar(self, cnpj: str) -> Dict:
+        """
+        Uma execução agendada: sincronização incremental, envio pendente e aquecimento
+
+        Espera até AGENDA_TOLERANCIA por outra sincronização em andamento;
+        depois disso a execução é registrada como ignorada.
+
+        Args:
+            cnpj: CNPJ (só dígitos)
+
+        Returns:
+            Registro gravado em execucoes
+        """
+        inicio = datetime.now().isoformat(timespec='seconds')
+        registro = {'cnpj': cnpj, 'inicio': inicio, 'status': 'ok', 'produtos': None, 'vendas': None, 'mensagem': None}
+        with sincronizacao_exclusiva(AGENDA_TOLERANCIA) as livre:
+            client = self._cliente(cnpj)
+            if not livre:
+                registro.update(status='ignorada', mensagem="Outra sincronização não terminou a tempo")
+            elif client is None:
+                registro.update(status='sem credenciais', mensagem="Conecte o Mobne na página ou defina MOBNE_API_KEY")
+            else:
+                t0 = time.perf_counter()
+                for entidade in ENTIDADES_AGENDADAS:
+                    try:
+                        sucesso, df = client.sync_incremental(entidade, self.store)
+                    except Exception:
+                        sucesso, df = False, None
+                        logger.exception(f"Sincronização agendada de {entidade} ({cnpj})")
+                    if not sucesso:
+                        registro.update(status='erro', mensagem=f"Falha ao sincronizar {entidade}")
+                        break
+                    registro[entidade] = len(df)
+                if registro['status'] == 'ok':
+                    self.aquecer(cnpj)
+                    registro['mensagem'] = f"{time.perf_counter() - t0:.1f}s"
+                if self.outbox is not None and self.outbox.resumo(cnpj)['pendente']:
+                    self.outbox.flusher(client)
+        registro['fim'] = datetime.now().isoformat(timespec='seconds')
+        with self._connect() as conn, conn:
+            conn.execute("INSERT INTO execucoes (cnpj, inicio, fim, status, produtos, vendas, mensagem) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (cnpj, registro['inicio'], registro['fim'], registro['status'], registro['produtos'],
+                          registro['vendas'], registro['mensagem']))
+        logger.info(f"Sincronização agendada Mobne {cnpj}: {registro['status']} ({registro['mensagem']})")
+        return registro
+
+    def aquecer(self, cnpj: str, hoje: Optional[date] = None) -> None:
+        """
+        Carrega em memória as consultas que a página mostra depois de sincronizar
+
+        Produtos e clientes completos, vendas no modo incremental (todas até
+        hoje) e no período padrão (últimos 30 dias); a próxima abertura da
+        página não relê o SQLite enquanto nada mudar.
+        """
+        hoje = hoje or date.today()
+        self.store.carregar(cnpj, "produtos")
+        self.store.carregar(cnpj, "clientes")
+        self.store.carregar(cnpj, "vendas", None, hoje.isoformat())
+        self.store.carregar(cnpj, "vendas", (hoje - timedelta(days=30)).isoformat(), hoje.isoformat())
+
+    def historico(self, cnpj: str, limit: int = 10) -> pd.DataFrame:
+        """Execuções mais recentes do CNPJ"""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT inicio AS Inicio, fim AS Fim, status AS Status, produtos AS Produtos, vendas AS Vendas, "
+                "mensagem AS Mensagem FROM execucoes WHERE cnpj = ? ORDER BY id DESC LIMIT ?",
+                conn, params=[normalizar_cnpj(cnpj), limit])
+
+    def parar(self) -> None:
+        self.scheduler.shutdown(wait=False)
+
+
+_agendador_padrao: Optional[MobneAgendador] = None
+_agendador_lock = threading.Lock()
+
+
+def agendador_padrao() -> MobneAgendador:
+    """
+    Agendador único do processo, com o armazém e a fila de envio padrão
+
+    O app.py o inicia na subida do servidor e a página de integração usa o
+    mesmo: um só scheduler (e um só lock de sincronização) por processo.
+    """
+    global _agendador_padrao
+    with _agendador_lock:
+        if _agendador_padrao is None:
+            _agendador_padrao = MobneAgendador(MobneStore(), Outbox())
+        return _agendador_padrao
+
+
+def main():
+    """Serviço avulso: roda os agendamentos gravados sem o Streamlit (python mobne_agendador.py)"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    agendador = agendador_padrao()
+    for config in agendador.configuracoes():
+        logger.info(f"Agendamento Mobne {config['cnpj']}: {config['frequencia']} às {config['horario']}, "
+                    f"próxima em {agendador.proxima(config['cnpj']):%d/%m %H:%M}")
+    if not MOBNE_API_KEY:
+        logger.warning("MOBNE_API_KEY não definida: as execuções serão registradas como 'sem credenciais'")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        agendador.parar()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,27 @@ Sincroniza dados entre Mercado duBairro e ERP Mobne via API REST
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
 import logging
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
 from functools import wraps
+from itertools import chain, count
+import hashlib
+import json
 import os
+import random
+import threading
+import time
+
+from mobne_cache import CACHE_MAX_MB, MobneCache, chave_cache
+from mobne_store import MobneStore
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -21,12 +35,133 @@ MOBNE_API_BASE_URL = os.getenv("MOBNE_API_URL", "https://apiexternal.mobne.com.b
 MOBNE_API_TIMEOUT = 30  # segundos
 MOBNE_API_KEY = os.getenv("MOBNE_API_KEY", "")
 MOBNE_CNPJ = os.getenv("MOBNE_CNPJ", "")
+MOBNE_PAGE_SIZE = 1000  # registros por página nas iterações paginadas
+MOBNE_CONCURRENCY = int(os.getenv("MOBNE_CONCURRENCY", "4"))  # páginas buscadas em paralelo
+MOBNE_DIAS_INICIAIS = 30  # janela de vendas da primeira sincronização incremental
+MOBNE_MAX_RETRIES = int(os.getenv("MOBNE_MAX_RETRIES", "3"))  # novas tentativas após a primeira
+MOBNE_BACKOFF_BASE = 0.5  # segundos; dobra a cada tentativa (com jitter)
+MOBNE_BACKOFF_MAX = 30.0  # teto de espera entre tentativas, inclusive Retry-After
+MOBNE_RATE_LIMIT = float(os.getenv("MOBNE_RATE_LIMIT", "20"))  # requisições/s por chave de API (0 = sem limite)
+MOBNE_RATE_BURST = float(os.getenv("MOBNE_RATE_BURST", "0")) or None  # rajada máxima (default: 1 s de taxa)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MOBNE_BATCH_ENDPOINT = os.getenv("MOBNE_BATCH_ENDPOINT", "")  # ex: /api/v1/vendas/lote; vazio = uma venda por POST
+MOBNE_BATCH_SIZE = int(os.getenv("MOBNE_BATCH_SIZE", "100"))  # vendas por requisição no endpoint de lote
+COLUNAS_ENVIO_CSV = ['Data', 'Cliente_ID', 'Produto_ID', 'Quantidade', 'Valor_Unitario', 'Valor_Total']
+MOBNE_POOL_EXTRA = 2  # conexões além da concorrência (chamadas avulsas da página durante uma sincronização)
+
+
+class MobneAPIError(Exception):
+    """Falha da API no meio de uma iteração paginada"""
+
+
+class TokenBucket:
+    """Limitador de taxa (token bucket) seguro entre threads"""
+
+    def __init__(self, taxa: float, capacidade: Optional[float] = None):
+        """
+        Args:
+            taxa: Tokens (requisições) repostos por segundo; <= 0 desliga o limite
+            capacidade: Rajada máxima (default: um segundo de taxa)
+        """
+        self.taxa = taxa
+        self.capacidade = capacidade or max(1.0, taxa)
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+        self._pausa_ate = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Bloqueia até haver um token (ou acabar uma pausa); devolve os segundos esperados"""
+        esperou = 0.0
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                espera = self._pausa_ate - agora
+                if espera <= 0:
+                    if self.taxa <= 0:
+                        return esperou
+                    self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                    self._ultimo = agora
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return esperou
+                    espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+            esperou += espera
+
+    def ajustar(self, taxa: float, capacidade: Optional[float] = None) -> None:
+        """Troca a taxa e a rajada sem perder os tokens já consumidos nem as pausas em curso"""
+        with self._lock:
+            agora = time.monotonic()
+            if self.taxa > 0:
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            self.taxa = taxa
+            self.capacidade = capacidade or max(1.0, taxa)
+            self._tokens = min(self._tokens, self.capacidade)
+
+    def pausar(self, segundos: float) -> None:
+        """Segura todas as threads por `segundos` (ex: após um 429)"""
+        with self._lock:
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + segundos)
+
+
+_limitadores: Dict[Tuple[str, str], TokenBucket] = {}
+_limitadores_lock = threading.Lock()
+
+
+def limitador(base_url: str, api_key: str, taxa: float = MOBNE_RATE_LIMIT, capacidade: Optional[float] = MOBNE_RATE_BURST) -> TokenBucket:
+    """
+    Limitador único por processo para cada URL + chave de API, compartilhado
+    por todos os clientes e threads que falam com a mesma conta do ERP
+
+    Pedir outra taxa ajusta o mesmo limitador (vale para todos que o usam)
+    em vez de criar um novo, que deixaria os clientes antigos fora da conta.
+    """
+    with _limitadores_lock:
+        bucket = _limitadores.get((base_url, api_key))
+        if bucket is None:
+            bucket = _limitadores[(base_url, api_key)] = TokenBucket(taxa, capacidade)
+        elif bucket.taxa != taxa or bucket.capacidade != (capacidade or max(1.0, taxa)):
+            bucket.ajustar(taxa, capacidade)
+        return bucket
+
+
+_cache_padrao: Optional[MobneCache] = None
+_cache_lock = threading.Lock()
+
+
+def cache_padrao() -> Optional[MobneCache]:
+    """Cache de GETs em disco compartilhado pelo processo (None se MOBNE_CACHE_MB=0)"""
+    global _cache_padrao
+    with _cache_lock:
+        if _cache_padrao is None and CACHE_MAX_MB > 0:
+            _cache_padrao = MobneCache()
+        return _cache_padrao
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Segundos pedidos no header Retry-After (número ou data HTTP)"""
+    valor = response.headers.get("Retry-After")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        data = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (data - datetime.now(data.tzinfo)).total_seconds())
 
 
 class MobneAPIClient:
     """Cliente para comunicação com API Mobne"""
 
-    def __init__(self, api_key: str = None, cnpj: str = None, base_url: str = None):
+    def __init__(self, api_key: str = None, cnpj: str = None, base_url: str = None, concorrencia: int = None,
+                 max_retries: int = None, taxa: float = None, cache: Optional[MobneCache] = None,
+                 usar_cache: bool = True):
         """
         Inicializa o cliente da API Mobne
 
@@ -34,30 +169,110 @@ class MobneAPIClient:
             api_key: Chave de autenticação da API
             cnpj: CNPJ da empresa no Mobne
             base_url: URL base da API (padrão: https://apiexternal.mobne.com.br)
+            concorrencia: Máximo de páginas em voo nas iterações (1 = sequencial)
+            max_retries: Novas tentativas em falhas transitórias (padrão: MOBNE_MAX_RETRIES)
+            taxa: Requisições/s permitidas para esta chave de API (padrão: MOBNE_RATE_LIMIT; 0 = sem limite)
+            cache: Cache de GETs condicionais (padrão: o do processo)
+            usar_cache: False desliga o cache (benchmarks e testes que medem a rede)
         """
         self.api_key = api_key or MOBNE_API_KEY
         self.cnpj = cnpj or MOBNE_CNPJ
         self.base_url = base_url or MOBNE_API_BASE_URL
+        self.concorrencia = max(1, int(concorrencia or MOBNE_CONCURRENCY))
+        self.max_retries = MOBNE_MAX_RETRIES if max_retries is None else max_retries
+        self.limitador = limitador(self.base_url, self.api_key, MOBNE_RATE_LIMIT if taxa is None else taxa)
+        self.cache = (cache if cache is not None else cache_padrao()) if usar_cache else None
+        self._escopo_cache = hashlib.sha256(f"{self.api_key}|{self.cnpj}".encode()).hexdigest()[:16]
+        self.contadores = dict.fromkeys(['requisicoes', 'tentativas', 'retries', 'falhas', 'http_429',
+                                         'throttle_esperas', 'throttle_segundos', 'cache_304'], 0)
+        self._contadores_lock = threading.Lock()
         self.session = requests.Session()
+        self._pool_lock = threading.Lock()
+        self._setup_pool(self.concorrencia)
         self._setup_headers()
         self.last_sync = None
 
+    def _setup_pool(self, concorrencia: int) -> None:
+        """
+        Monta um adapter com pool do tamanho da concorrência: cada thread de
+        uma iteração reaproveita sua conexão keep-alive em vez de abrir outra
+        (o pool padrão guarda 10 e descarta o excedente). As novas tentativas
+        ficam com _make_request, então o adapter não repete nada.
+
+        O adapter anterior é fechado (libera as conexões ociosas do pool antigo;
+        as que estão em uso são fechadas ao voltar).
+        """
+        self._pool_size = concorrencia + MOBNE_POOL_EXTRA
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size, max_retries=0)
+        antigos = {id(a): a for a in (self.session.adapters.get("https://"), self.session.adapters.get("http://")) if a is not None}
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        for antigo in antigos.values():
+            antigo.close()
+
+    def _garantir_pool(self, concorrencia: Optional[int]) -> int:
+        """Concorrência efetiva de uma operação, aumentando o pool se ela pedir mais
+
+        A sessão pode ser compartilhada (obter_cliente): a troca do adapter é
+        feita sob lock, uma vez só quando várias threads pedem mais ao mesmo tempo.
+        """
+        concorrencia = self.concorrencia if concorrencia is None else max(1, concorrencia)
+        with self._pool_lock:
+            if concorrencia + MOBNE_POOL_EXTRA > self._pool_size:
+                self._setup_pool(concorrencia)
+        return concorrencia
+
     def _setup_headers(self) -> None:
-        """Configura headers de autenticação"""
+        """Configura headers de autenticação e pede respostas comprimidas"""
         self.session.headers.update({
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
             "X-CNPJ": self.cnpj,
             "User-Agent": "Mercado-duBairro/1.0"
         })
 
-    def _make_request(self, method: str, endpoint: str, **kwargs) -> Tuple[bool, Dict]:
+    def _contar(self, nome: str, valor: float = 1) -> None:
+        with self._contadores_lock:
+            self.contadores[nome] += valor
+
+    def metricas(self) -> Dict[str, float]:
+        """Contadores de requisições, novas tentativas e espera no limitador desde a criação do cliente"""
+        with self._contadores_lock:
+            return {**self.contadores, 'throttle_segundos': round(self.contadores['throttle_segundos'], 3)}
+
+    def _backoff(self, tentativa: int) -> float:
+        """Espera exponencial com jitter completo (evita que threads repitam juntas)"""
+        return random.uniform(0, min(MOBNE_BACKOFF_MAX, MOBNE_BACKOFF_BASE * 2 ** (tentativa - 1)))
+
+    def _aguardar_vez(self) -> None:
+        """Consome um token do limitador antes de cada requisição HTTP, contando as esperas"""
+        esperou = self.limitador.acquire()
+        if esperou:
+            self._contar('throttle_esperas'); self._contar('throttle_segundos', esperou)
+        self._contar('tentativas')
+
+    def _make_request(self, method: str, endpoint: str, idempotente: Optional[bool] = None, **kwargs) -> Tuple[bool, Dict]:
         """
-        Realiza requisição HTTP com tratamento de erro
+        Realiza requisição HTTP com tratamento de erro, novas tentativas e limite de taxa
+
+        Cada tentativa consome um token do limitador compartilhado. Falhas de
+        conexão, timeouts e HTTP 429/5xx são repetidas até max_retries vezes
+        com backoff exponencial e jitter; um Retry-After da resposta tem
+        precedência, e um 429 pausa o limitador para todas as threads.
+        Requisições não idempotentes (POST, por padrão) só são repetidas
+        após 429, quando o servidor garantidamente não as processou.
+
+        GETs com cópia no cache vão com If-None-Match/If-Modified-Since; um
+        304 devolve a cópia local, e um 200 com ETag/Last-Modified a atualiza.
+        Se a cópia sumiu antes do 304, a nova busca também passa pelo limitador.
 
         Args:
             method: GET, POST, PUT, DELETE
             endpoint: Endpoint da API (sem base URL)
+            idempotente: Se a requisição pode ser repetida sem efeito duplicado (padrão: tudo menos POST)
             **kwargs: Argumentos adicionais para requests
 
         Returns:
@@ -65,27 +280,61 @@ class MobneAPIClient:
         """
         url = f"{self.base_url}{endpoint}"
         kwargs.setdefault("timeout", MOBNE_API_TIMEOUT)
-
-        try:
-            response = self.session.request(method, url, **kwargs)
-            response.raise_for_status()
-            return True, response.json()
-        except requests.exceptions.ConnectionError:
-            msg = f"Erro de conexão com Mobne API: {url}"
-            logger.error(msg)
-            return False, {"error": msg}
-        except requests.exceptions.Timeout:
-            msg = f"Timeout na requisição para Mobne API"
-            logger.error(msg)
-            return False, {"error": msg}
-        except requests.exceptions.HTTPError as e:
-            msg = f"Erro HTTP {response.status_code}: {response.text}"
-            logger.error(msg)
-            return False, {"error": msg}
-        except Exception as e:
-            msg = f"Erro ao comunicar com Mobne API: {str(e)}"
-            logger.error(msg)
-            return False, {"error": msg}
+        idempotente = method.upper() != "POST" if idempotente is None else idempotente
+        self._contar('requisicoes')
+        chave, condicionais = None, {}
+        if self.cache is not None and method.upper() == "GET":
+            chave = chave_cache(self._escopo_cache, url, kwargs.get("params"))
+            condicionais = self.cache.validadores(chave)
+            if condicionais:
+                kwargs["headers"] = {**(kwargs.get("headers") or {}), **condicionais}
+
+        for tentativa in range(self.max_retries + 1):
+            self._aguardar_vez()
+            repetir, espera = idempotente, None
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code == 304 and chave:
+                    corpo = self.cache.obter(chave)
+                    if corpo is not None:
+                        self._contar('cache_304')
+                        return True, json.loads(corpo)
+                    # Cópia descartada entre a consulta e a resposta: busca o corpo sem condicionais
+                    kwargs["headers"] = {k: v for k, v in kwargs["headers"].items() if k not in condicionais}
+                    self._aguardar_vez()
+                    response = self.session.request(method, url, **kwargs)
+                if response.status_code == 429:
+                    self._contar('http_429')
+                    espera = _retry_after(response)
+                    espera = min(espera if espera is not None else self._backoff(tentativa + 1), MOBNE_BACKOFF_MAX)
+                    self.limitador.pausar(espera)
+                    repetir = True
+                response.raise_for_status()
+                if chave and response.status_code == 200:
+                    self.cache.gravar(chave, url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+                return True, response.json()
+            except requests.exceptions.ConnectionError:
+                msg = f"Erro de conexão com Mobne API: {url}"
+            except requests.exceptions.Timeout:
+                msg = f"Timeout na requisição para Mobne API"
+            except requests.exceptions.HTTPError as e:
+                msg = f"Erro HTTP {response.status_code}: {response.text}"
+                repetir = repetir and response.status_code in RETRY_STATUS
+                espera = espera if espera is not None else _retry_after(response)
+            except Exception as e:
+                msg = f"Erro ao comunicar com Mobne API: {str(e)}"
+                repetir = False
+
+            if not repetir or tentativa == self.max_retries:
+                break
+            espera = min(espera, MOBNE_BACKOFF_MAX) if espera is not None else self._backoff(tentativa + 1)
+            self._contar('retries')
+            logger.warning(f"{msg} — tentativa {tentativa + 2}/{self.max_retries + 1} em {espera:.1f}s")
+            time.sleep(espera)
+
+        self._contar('falhas')
+        logger.error(msg)
+        return False, {"error": msg}
 
     def verify_connection(self) -> Tuple[bool, str]:
         """
@@ -101,6 +350,144 @@ class MobneAPIClient:
         else:
             return False, f"❌ Erro ao conectar: {response.get('error')}"
 
+    def _buscar_pagina(self, endpoint: str, params: Optional[Dict], page_size: int, offset: int) -> Dict:
+        """Uma página bruta ({data, total, has_more}); levanta MobneAPIError se falhar"""
+        success, response = self._make_request("GET", endpoint, params={**(params or {}), "limit": page_size, "offset": offset})
+        if not success:
+            raise MobneAPIError(response.get("error", "Erro desconhecido"))
+        return response
+
+    def iter_paginas(self, endpoint: str, params: Optional[Dict] = None, page_size: int = MOBNE_PAGE_SIZE,
+                     concorrencia: int = None) -> Iterator[List[Dict]]:
+        """
+        Percorre todas as páginas de um endpoint sob demanda
+
+        A primeira página é buscada sozinha. Com concorrência > 1, as seguintes
+        são buscadas em paralelo (janela deslizante de `concorrencia` offsets
+        sobre a mesma sessão) e entregues na ordem; com 'total' conhecido os
+        offsets param no fim, senão a janela avança até a primeira página
+        curta (as especulativas além dela são descartadas). A iteração termina
+        com página vazia, com 'total' atingido, com 'has_more' falso ou com uma
+        página menor que page_size.
+
+        Args:
+            endpoint: Endpoint da API (sem base URL)
+            params: Filtros da consulta (limit/offset são controlados aqui)
+            page_size: Registros por página
+            concorrencia: Páginas em voo (default: a do cliente; 1 = sequencial)
+
+        Returns:
+            Iterador de páginas (listas de registros)
+
+        Raises:
+            MobneAPIError: se alguma página falhar
+        """
+        concorrencia = self._garantir_pool(concorrencia)
+        response = self._buscar_pagina(endpoint, params, page_size, 0)
+        page = response.get("data", [])
+        if not page:
+            return
+        yield page
+        total = response.get("total")
+        if (total is not None and len(page) >= int(total)) or response.get("has_more") is False or len(page) < page_size:
+            return
+
+        if concorrencia == 1:
+            offset = len(page)
+            while True:
+                response = self._buscar_pagina(endpoint, params, page_size, offset)
+                page = response.get("data", [])
+                if not page:
+                    return
+                yield page
+                offset += len(page)
+                total = response.get("total")
+                if (total is not None and offset >= int(total)) or response.get("has_more") is False or len(page) < page_size:
+                    return
+
+        offsets = iter(range(page_size, int(total), page_size)) if total is not None else count(page_size, page_size)
+        pool = ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="mobne")
+        em_voo = deque()
+        try:
+            for offset in offsets:
+                em_voo.append(pool.submit(self._buscar_pagina, endpoint, params, page_size, offset))
+                if len(em_voo) < concorrencia:
+                    continue
+                response = em_voo.popleft().result()
+                page = response.get("data", [])
+                if not page:
+                    return
+                yield page
+                if response.get("has_more") is False or len(page) < page_size:
+                    return
+            while em_voo:
+                response = em_voo.popleft().result()
+                page = response.get("data", [])
+                if not page:
+                    return
+                yield page
+                if response.get("has_more") is False or len(page) < page_size:
+                    return
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def iter_produtos(self, page_size: int = MOBNE_PAGE_SIZE, concorrencia: int = None) -> Iterator[List[Dict]]:
+        """Todas as páginas de produtos (lazy)"""
+        return self.iter_paginas("/api/v1/produtos", page_size=page_size, concorrencia=concorrencia)
+
+    def iter_clientes(self, page_size: int = MOBNE_PAGE_SIZE, concorrencia: int = None) -> Iterator[List[Dict]]:
+        """Todas as páginas de clientes (lazy)"""
+        return self.iter_paginas("/api/v1/clientes", page_size=page_size, concorrencia=concorrencia)
+
+    def iter_vendas(self, data_inicio: datetime = None, data_fim: datetime = None, page_size: int = MOBNE_PAGE_SIZE,
+                    concorrencia: int = None) -> Iterator[List[Dict]]:
+        """
+        Todas as páginas de vendas de um período (lazy)
+
+        Args:
+            data_inicio: Data de início (padrão: últimos 30 dias)
+            data_fim: Data de fim (padrão: hoje)
+            page_size: Registros por página
+            concorrencia: Páginas em voo (default: a do cliente)
+        """
+        if data_fim is None:
+            data_fim = datetime.now()
+        if data_inicio is None:
+            data_inicio = data_fim - timedelta(days=30)
+        params = {"data_inicio": data_inicio.strftime("%Y-%m-%d"), "data_fim": data_fim.strftime("%Y-%m-%d")}
+        return self.iter_paginas("/api/v1/vendas", params=params, page_size=page_size, concorrencia=concorrencia)
+
+    @staticmethod
+    def iter_registros(paginas: Iterable[List[Dict]]) -> Iterator[Dict]:
+        """Achata um iterador de páginas em registros individuais"""
+        return chain.from_iterable(paginas)
+
+    def _paginas_para_dataframe(self, paginas: Iterable[List[Dict]], entidade: str) -> Tuple[bool, pd.DataFrame]:
+        """
+        Monta um DataFrame página a página (os dicionários de cada página são
+        descartados após a conversão, então só o resultado colunar fica em memória)
+
+        Args:
+            paginas: Iterador de páginas (iter_*)
+            entidade: Nome para o log ('produtos', 'clientes', 'vendas')
+
+        Returns:
+            Tupla (sucesso, DataFrame)
+        """
+        try:
+            frames = [pd.DataFrame.from_records(pagina) for pagina in paginas]
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            df['DATA_SYNC'] = datetime.now()
+            self.last_sync = datetime.now()
+            logger.info(f"Sincronizados {len(df)} {entidade} do Mobne em {len(frames)} página(s)")
+            return True, df
+        except MobneAPIError as e:
+            logger.error(f"Sincronização de {entidade} interrompida: {str(e)}")
+            return False, pd.DataFrame()
+        except Exception as e:
+            logger.error(f"Erro ao processar {entidade}: {str(e)}")
+            return False, pd.DataFrame()
+
     def fetch_produtos(self, limit: int = 1000, offset: int = 0) -> Tuple[bool, List[Dict]]:
         """
         Busca lista de produtos do Mobne
@@ -188,12 +575,14 @@ class MobneAPIClient:
         else:
             return False, []
 
-    def send_venda(self, venda_data: Dict) -> Tuple[bool, str]:
+    def send_venda(self, venda_data: Dict, chave_idempotencia: Optional[str] = None) -> Tuple[bool, str]:
         """
         Envia dados de venda para o Mobne
 
         Args:
             venda_data: Dicionário com dados da venda
+            chave_idempotencia: Enviada no header Idempotency-Key; com ela o
+                POST pode ser repetido sem duplicar a venda
 
         Returns:
             Tupla (sucesso, ID da venda ou mensagem de erro)
@@ -206,62 +595,188 @@ class MobneAPIClient:
             logger.error(msg)
             return False, msg
 
+        success, venda_id = self._post_venda(venda_data, chave_idempotencia)
+        if success:
+            logger.info(f"Venda {venda_id} enviada para Mobne com sucesso")
+        return success, venda_id
+
+    def _post_venda(self, venda_data: Dict, chave: Optional[str]) -> Tuple[bool, str]:
+        """POST de uma venda; com chave, repetível com segurança"""
         success, response = self._make_request(
             "POST",
             "/api/v1/vendas",
-            json=venda_data
+            idempotente=chave is not None,
+            json=venda_data,
+            headers={"Idempotency-Key": chave} if chave else None
         )
-
         if success:
-            venda_id = response.get("id")
-            logger.info(f"Venda {venda_id} enviada para Mobne com sucesso")
-            return True, venda_id
-        else:
-            return False, response.get("error", "Erro desconhecido")
+            return True, response.get("id")
+        return False, response.get("error", "Erro desconhecido")
 
-    def sync_produtos_para_dataframe(self) -> Tuple[bool, pd.DataFrame]:
+    def _post_lote(self, vendas: List[Dict], chaves: List[str]) -> List[Tuple[bool, str]]:
+        """
+        POST de um lote no MOBNE_BATCH_ENDPOINT
+
+        Contrato: {"vendas": [{..., "idempotency_key": ...}]} ->
+        {"resultados": [{"id": ...} | {"error": ...}]}, na mesma ordem.
+        O lote inteiro tem sua própria chave (hash das chaves das vendas).
         """
-        Sincroniza produtos do Mobne e retorna como DataFrame
+        chave_lote = hashlib.sha256("|".join(chaves).encode()).hexdigest()[:32]
+        success, response = self._make_request(
+            "POST", MOBNE_BATCH_ENDPOINT, idempotente=True,
+            json={"vendas": [{**v, "idempotency_key": k} for v, k in zip(vendas, chaves)]},
+            headers={"Idempotency-Key": chave_lote})
+        if not success:
+            return [(False, response.get("error", "Erro desconhecido"))] * len(vendas)
+        resultados = response.get("resultados", [])
+        if len(resultados) != len(vendas):
+            return [(False, f"Resposta do lote com {len(resultados)} resultados para {len(vendas)} vendas")] * len(vendas)
+        return [(True, r.get("id")) if r.get("id") is not None else (False, r.get("error", "Recusada no lote")) for r in resultados]
+
+    def preparar_vendas(self, df: pd.DataFrame) -> Tuple[List[Optional[Dict]], pd.DataFrame]:
+        """
+        Valida um CSV de vendas inteiro de uma vez e monta os payloads
+
+        Args:
+            df: Colunas COLUNAS_ENVIO_CSV (Data AAAA-MM-DD, IDs inteiros, valores positivos)
 
         Returns:
-            Tupla (sucesso, DataFrame com produtos)
+            Tupla (payloads alinhados às linhas, None nas inválidas;
+            DataFrame [Linha, Chave, Status, ID_Mobne, Mensagem] com Status
+            'pendente' ou 'inválida' e a linha do arquivo, contando o cabeçalho)
+
+        Raises:
+            ValueError: se faltar alguma coluna
         """
-        success, products = self.fetch_produtos()
+        faltando = [c for c in COLUNAS_ENVIO_CSV if c not in df.columns]
+        if faltando:
+            raise ValueError(f"Colunas faltando: {', '.join(faltando)}")
+        df = df.reset_index(drop=True)
+        datas = pd.to_datetime(df['Data'].astype(str).str.strip(), format='ISO8601', errors='coerce')
+        nums = df[COLUNAS_ENVIO_CSV[1:]].apply(pd.to_numeric, errors='coerce')
+
+        erros = pd.Series('', index=df.index)
+        regras = [(datas.isna(), "Data inválida (use AAAA-MM-DD)")]
+        regras += [(nums[c].isna() | (nums[c] % 1 != 0) | (nums[c] <= 0), f"{c} deve ser inteiro positivo")
+                   for c in ('Cliente_ID', 'Produto_ID', 'Quantidade')]
+        regras += [(nums[c].isna() | (nums[c] <= 0), f"{c} deve ser número positivo") for c in ('Valor_Unitario', 'Valor_Total')]
+        for falhou, msg in regras:
+            erros = erros.where(~falhou, erros + msg + "; ")
+        valida = (erros == '').to_numpy()
+
+        linhas = np.arange(len(df)) + 2
+        payloads: List[Optional[Dict]] = [None] * len(df)
+        chaves: List[Optional[str]] = [None] * len(df)
+        ok = np.flatnonzero(valida)
+        canonicos: Dict[int, str] = {}
+        for i, data, cli, prod, qtd, unit, total in zip(
+                ok, datas.dt.strftime('%Y-%m-%d').to_numpy()[ok], *(nums[c].to_numpy()[ok] for c in COLUNAS_ENVIO_CSV[1:])):
+            payloads[i] = {"data": data, "cliente_id": int(cli),
+                           "produtos": [{"produto_id": int(prod), "quantidade": int(qtd), "valor_unitario": float(unit)}],
+                           "valor_total": float(total)}
+            canonicos[i] = json.dumps(payloads[i], sort_keys=True)
+        # Chave = arquivo + conteúdo + quantas vendas idênticas vieram antes. O arquivo entra pelo
+        # conjunto das vendas (independe da ordem): reenviar o mesmo arquivo não duplica, e a mesma
+        # venda (ex.: consumidor final, mesmo produto e dia) em outro upload ganha chave nova
+        upload = hashlib.sha256("\n".join(sorted(canonicos.values())).encode()).hexdigest()[:16]
+        ocorrencias: Dict[str, int] = {}
+        for i, canonico in canonicos.items():
+            n = ocorrencias[canonico] = ocorrencias.get(canonico, -1) + 1
+            chaves[i] = hashlib.sha256(f"{self.cnpj}|{upload}|{canonico}|{n}".encode()).hexdigest()[:32]
+
+        resultado = pd.DataFrame({
+            'Linha': linhas, 'Chave': chaves,
+            'Status': np.where(valida, 'pendente', 'inválida'),
+            'ID_Mobne': None, 'Mensagem': erros.str.rstrip('; ').to_numpy(),
+        })
+        return payloads, resultado
 
-        if not success:
-            return False, pd.DataFrame()
+    def enviar_payloads(self, payloads: List[Dict], chaves: List[str], concorrencia: int = None,
+                        progresso: Optional[Callable[[int, int], None]] = None) -> List[Tuple[bool, str]]:
+        """
+        Envia vendas já validadas com concorrência limitada
 
-        try:
-            df = pd.DataFrame(products)
-            df['DATA_SYNC'] = datetime.now()
-            self.last_sync = datetime.now()
-            logger.info(f"Sincronizados {len(df)} produtos do Mobne")
-            return True, df
-        except Exception as e:
-            logger.error(f"Erro ao processar produtos: {str(e)}")
-            return False, pd.DataFrame()
+        Usa o endpoint de lote quando MOBNE_BATCH_ENDPOINT está configurado
+        (MOBNE_BATCH_SIZE vendas por requisição); senão, um POST por venda.
+        Toda venda leva sua chave de idempotência, então as novas tentativas
+        de _make_request nunca a duplicam.
 
-    def sync_clientes_para_dataframe(self) -> Tuple[bool, pd.DataFrame]:
+        Args:
+            payloads: Vendas no formato da API
+            chaves: Chave de idempotência de cada venda
+            concorrencia: Requisições em voo (default: a do cliente)
+            progresso: Chamado na thread de quem chamou com (vendas resolvidas, total)
+
+        Returns:
+            (sucesso, ID da venda ou mensagem de erro) para cada venda, na ordem recebida
         """
-        Sincroniza clientes do Mobne e retorna como DataFrame
+        tamanho = MOBNE_BATCH_SIZE if MOBNE_BATCH_ENDPOINT else 1
+        grupos = [range(i, min(i + tamanho, len(payloads))) for i in range(0, len(payloads), tamanho)]
+
+        def enviar(grupo):
+            if MOBNE_BATCH_ENDPOINT:
+                return self._post_lote([payloads[i] for i in grupo], [chaves[i] for i in grupo])
+            return [self._post_venda(payloads[grupo[0]], chaves[grupo[0]])]
+
+        resultados: List[Tuple[bool, str]] = [None] * len(payloads)
+        feitas = 0
+        with ThreadPoolExecutor(max_workers=self._garantir_pool(concorrencia), thread_name_prefix="mobne-envio") as pool:
+            futuros = {pool.submit(enviar, g): g for g in grupos}
+            for futuro in as_completed(futuros):
+                for i, resultado in zip(futuros[futuro], futuro.result()):
+                    resultados[i] = resultado
+                feitas += len(futuros[futuro])
+                if progresso:
+                    progresso(feitas, len(payloads))
+        return resultados
+
+    def send_vendas(self, df: pd.DataFrame, concorrencia: int = None,
+                    progresso: Optional[Callable[[int, int], None]] = None) -> pd.DataFrame:
+        """
+        Valida e envia um lote de vendas (ver enviar_payloads)
+
+        Args:
+            df: Vendas no formato do CSV (COLUNAS_ENVIO_CSV)
+            concorrencia: Requisições em voo (default: a do cliente)
+            progresso: Chamado na thread de quem chamou com (vendas resolvidas, total válidas)
 
         Returns:
-            Tupla (sucesso, DataFrame com clientes)
+            DataFrame [Linha, Chave, Status, ID_Mobne, Mensagem]; Status
+            'enviada', 'erro' ou 'inválida'
         """
-        success, clients = self.fetch_clientes()
+        payloads, resultado = self.preparar_vendas(df)
+        validas = np.flatnonzero(resultado['Status'].to_numpy() == 'pendente')
+        chaves = resultado['Chave'].tolist()
+        enviados = self.enviar_payloads([payloads[i] for i in validas], [chaves[i] for i in validas], concorrencia, progresso)
+
+        status, mensagens = (resultado[c].to_numpy(dtype=object, copy=True) for c in ('Status', 'Mensagem'))
+        ids = [None] * len(resultado)
+        for i, (ok, valor) in zip(validas, enviados):
+            status[i], ids[i], mensagens[i] = ('enviada', valor, '') if ok else ('erro', None, valor)
+
+        resultado = resultado.assign(Status=status, ID_Mobne=ids, Mensagem=mensagens)
+        contagem = resultado['Status'].value_counts()
+        logger.info(f"Envio em lote: {contagem.get('enviada', 0)} enviadas, {contagem.get('erro', 0)} com erro, "
+                    f"{contagem.get('inválida', 0)} inválidas")
+        return resultado
 
-        if not success:
-            return False, pd.DataFrame()
+    def sync_produtos_para_dataframe(self) -> Tuple[bool, pd.DataFrame]:
+        """
+        Sincroniza todos os produtos do Mobne (todas as páginas) como DataFrame
 
-        try:
-            df = pd.DataFrame(clients)
-            df['DATA_SYNC'] = datetime.now()
-            self.last_sync = datetime.now()
-            logger.info(f"Sincronizados {len(df)} clientes do Mobne")
-            return True, df
-        except Exception as e:
-            logger.error(f"Erro ao processar clientes: {str(e)}")
-            return False, pd.DataFrame()
+        Returns:
+            Tupla (sucesso, DataFrame com produtos)
+        """
+        return self._paginas_para_dataframe(self.iter_produtos(), "produtos")
+
+    def sync_clientes_para_dataframe(self) -> Tuple[bool, pd.DataFrame]:
+        """
+        Sincroniza todos os clientes do Mobne (todas as páginas) como DataFrame
+
+        Returns:
+            Tupla (sucesso, DataFrame com clientes)
+        """
+        return self._paginas_para_dataframe(self.iter_clientes(), "clientes")
 
     def sync_vendas_para_dataframe(
         self,
@@ -269,25 +784,70 @@ class MobneAPIClient:
         data_fim: datetime = None
     ) -> Tuple[bool, pd.DataFrame]:
         """
-        Sincroniza vendas do Mobne e retorna como DataFrame
+        Sincroniza todas as vendas do período (todas as páginas) como DataFrame
 
         Returns:
             Tupla (sucesso, DataFrame com vendas)
         """
-        success, vendas = self.fetch_vendas(data_inicio, data_fim)
+        return self._paginas_para_dataframe(self.iter_vendas(data_inicio, data_fim), "vendas")
 
-        if not success:
-            return False, pd.DataFrame()
+    def sync_incremental(self, entidade: str, store: Optional[MobneStore] = None,
+                         data_fim: datetime = None) -> Tuple[bool, pd.DataFrame]:
+        """
+        Busca só o que é mais novo que a marca d'água do CNPJ e mescla no armazém local
 
-        try:
-            df = pd.DataFrame(vendas)
-            df['DATA_SYNC'] = datetime.now()
-            self.last_sync = datetime.now()
-            logger.info(f"Sincronizadas {len(df)} vendas do Mobne")
-            return True, df
-        except Exception as e:
-            logger.error(f"Erro ao processar vendas: {str(e)}")
-            return False, pd.DataFrame()
+        Vendas são pedidas a partir da data da marca (inclusive, pois o dia
+        pode ter recebido vendas depois); cadastros com updated_since. Cada
+        página é mesclada pelo id assim que chega, e a marca só avança se a
+        sincronização terminar, então repetir ou interromper nunca duplica
+        nem pula registros.
+
+        Args:
+            entidade: 'vendas', 'produtos' ou 'clientes'
+            store: Armazém local (default: MobneStore no banco padrão)
+            data_fim: Fim da janela de vendas (padrão: agora)
+
+        Returns:
+            Tupla (sucesso, DataFrame só com os registros recebidos)
+        """
+        store = store or MobneStore()
+        marca = store.watermark(self.cnpj, entidade)
+        if entidade == 'vendas':
+            data_fim = data_fim or datetime.now()
+            inicio = datetime.strptime(marca, "%Y-%m-%d") if marca else data_fim - timedelta(days=MOBNE_DIAS_INICIAIS)
+            paginas = self.iter_vendas(inicio, data_fim)
+        else:
+            paginas = self.iter_paginas(f"/api/v1/{entidade}", params={"updated_since": marca} if marca else None)
+
+        def mesclando(paginas):
+            for pagina in paginas:
+                store.merge(self.cnpj, entidade, pagina)
+                yield pagina
+
+        success, df = self._paginas_para_dataframe(mesclando(paginas), entidade)
+        if success:
+            nova = store.marcar(self.cnpj, entidade, df, data_fim.strftime("%Y-%m-%d") if entidade == 'vendas' else None)
+            logger.info(f"Marca de {entidade} ({self.cnpj}): {marca} -> {nova}")
+        return success, df
+
+
+_clientes: Dict[Tuple[str, str, str], MobneAPIClient] = {}
+_clientes_lock = threading.Lock()
+
+
+def obter_cliente(api_key: str, cnpj: str, base_url: str = None) -> MobneAPIClient:
+    """
+    Cliente único por processo para cada URL + chave + CNPJ
+
+    Reconectar (ou outra sessão do Streamlit com a mesma conta) reaproveita
+    a sessão HTTP, o pool de conexões abertas e os contadores.
+    """
+    base_url = base_url or MOBNE_API_BASE_URL
+    with _clientes_lock:
+        chave = (base_url, api_key, cnpj)
+        if chave not in _clientes:
+            _clientes[chave] = MobneAPIClient(api_key=api_key, cnpj=cnpj, base_url=base_url)
+        return _clientes[chave]
 
 
 class MobneIntegration:
@@ -321,7 +881,7 @@ class MobneIntegration:
             Tupla (sucesso, mensagem)
         """
         try:
-            self.client = MobneAPIClient(api_key=api_key, cnpj=cnpj)
+            self.client = obter_cliente(api_key, cnpj)
             success, message = self.client.verify_connection()
 
             if success:
@@ -394,6 +954,11 @@ def display_mobne_status():
 
     if integration.is_connected():
         st.success(f"✅ Conectado ao Mobne - CNPJ: {st.session_state.mobne_cnpj}")
+        client = integration.get_client()
+        if client is not None:
+            m = client.metricas()
+            st.caption(f"📈 {m['requisicoes']} requisições · {m['retries']} novas tentativas · {m['http_429']} × 429 · "
+                       f"{m['falhas']} falhas · {m['throttle_segundos']:.1f}s no limitador · {m['cache_304']} respostas do cache")
         if st.button("🔌 Desconectar do Mobne"):
             integration.disconnect()
             st.rerun()
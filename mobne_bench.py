@@ -0,0 +1,103 @@
+"""
+Mede a sincronização paginada do Mobne contra o servidor local (mobne_fake_server).
+
+Modos:
+    concorrencia  busca sequencial × concorrente (janela de N páginas em voo)
+                  da mesma sincronização de vendas, conferindo que o resultado
+                  é idêntico e em ordem
+    conexao       requisições/s, bytes transferidos e conexões TCP abertas ao
+                  sincronizar produtos, clientes e vendas: conexão nova por
+                  requisição × Session padrão sem compressão × pool ajustado
+                  à concorrência com gzip (configuração do cliente)
+
+Uso:
+    python mobne_bench.py                    # 20 000 vendas, páginas de 500, 50 ms
+    python mobne_bench.py --latencia 0.1 --vendas 50000 --concorrencia 1 4 8 16
+    python mobne_bench.py conexao --latencia 0.02 --banda 2 --concorrencia 4 16
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from mobne_api import MobneAPIClient
+from mobne_fake_server import gerar_dados, iniciar
+
+
+def sincronizar(client, page_size, concorrencia):
+    """Percorre todas as páginas de vendas; devolve (segundos, páginas, ids)"""
+    inicio = time.perf_counter()
+    paginas = list(client.iter_vendas(datetime.now() - timedelta(days=365), datetime.now(),
+                                      page_size=page_size, concorrencia=concorrencia))
+    return time.perf_counter() - inicio, len(paginas), [v['id'] for p in paginas for v in p]
+
+
+def bench_concorrencia(servidor, args):
+    client = MobneAPIClient("chave", "00000000000000", base_url=servidor.url, taxa=args.taxa, usar_cache=False)
+    print(f"{args.vendas} vendas, páginas de {args.page_size}, latência {args.latencia * 1000:.0f} ms")
+    print(f"{'concorrência':>12} | {'páginas':>8} | {'tempo (s)':>10} | {'vendas/s':>10} | {'ganho':>6}")
+    base, referencia = None, None
+    for n in args.concorrencia or [1, 2, 4, 8]:
+        segundos, paginas, ids = sincronizar(client, args.page_size, n)
+        if referencia is None:
+            referencia = ids
+        elif ids != referencia:
+            raise SystemExit(f"Resultado divergente com concorrência {n}")
+        base = base or segundos
+        print(f"{n:>12} | {paginas:>8} | {segundos:>10.2f} | {len(ids) / segundos:>10.0f} | {base / segundos:>5.1f}x")
+
+
+def cliente_variante(variante, url, concorrencia, taxa):
+    """Cliente com a sessão HTTP de cada configuração comparada"""
+    client = MobneAPIClient("chave", "00000000000000", base_url=url, concorrencia=concorrencia, taxa=taxa, usar_cache=False)
+    if variante != "pool + gzip":
+        client.session = requests.Session()
+        client._setup_headers()
+        client.session.headers["Accept-Encoding"] = "identity"
+        if variante == "sem keep-alive":
+            client.session.headers["Connection"] = "close"
+    return client
+
+
+def bench_conexao(servidor, args):
+    logging.getLogger("urllib3").setLevel(logging.ERROR)  # o descarte de conexões aparece na coluna 'conexões'
+    banda = f"{args.banda:g} MB/s por conexão" if args.banda else "sem limite de banda"
+    print(f"produtos + clientes + vendas, páginas de {args.page_size}, latência {args.latencia * 1000:.0f} ms, {banda}")
+    print(f"{'configuração':>16} | {'conc.':>5} | {'req':>5} | {'req/s':>7} | {'MB':>7} | {'conexões':>8} | {'tempo (s)':>9}")
+    for n in args.concorrencia or [4, 16]:
+        for variante in ("sem keep-alive", "Session padrão", "pool + gzip"):
+            client = cliente_variante(variante, servidor.url, n, args.taxa)
+            servidor.zerar()
+            inicio = time.perf_counter()
+            total = sum(len(p) for p in client.iter_produtos(page_size=args.page_size))
+            total += sum(len(p) for p in client.iter_clientes(page_size=args.page_size))
+            total += sincronizar(client, args.page_size, n)[1]
+            segundos = time.perf_counter() - inicio
+            print(f"{variante:>16} | {n:>5} | {servidor.requisicoes:>5} | {servidor.requisicoes / segundos:>7.0f} | "
+                  f"{servidor.bytes_enviados / 1e6:>7.2f} | {servidor.conexoes:>8} | {segundos:>9.2f}")
+            client.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das sincronizações do Mobne")
+    parser.add_argument("modo", nargs="?", choices=["concorrencia", "conexao"], default="concorrencia")
+    parser.add_argument("--vendas", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos por requisição")
+    parser.add_argument("--concorrencia", type=int, nargs="+", help="níveis comparados (default: 1 2 4 8 / 4 16)")
+    parser.add_argument("--taxa", type=float, default=0, help="limite de requisições/s do cliente (0 = sem limite)")
+    parser.add_argument("--banda", type=float, default=0, help="MB/s simulados por conexão no servidor (0 = loopback)")
+    args = parser.parse_args()
+
+    servidor = iniciar(latencia=args.latencia, banda=args.banda * 1e6,
+                       dados=gerar_dados(n_produtos=5_000, n_clientes=5_000, n_vendas=args.vendas, dias=365))
+    try:
+        (bench_conexao if args.modo == "conexao" else bench_concorrencia)(servidor, args)
+    finally:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
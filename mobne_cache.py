@@ -0,0 +1,124 @@
+"""
+Módulo de Cache HTTP do Mobne
+Guarda em disco (SQLite) o corpo das respostas GET com ETag/Last-Modified
+para revalidar com requisições condicionais: um 304 devolve a cópia local
+sem baixar o corpo de novo. O tamanho total é limitado, com descarte LRU
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+CACHE_FILE = Path(os.getenv("MOBNE_CACHE", "dados/mobne_cache.db"))
+CACHE_MAX_MB = float(os.getenv("MOBNE_CACHE_MB", "64"))  # corpos comprimidos; 0 desliga o cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS respostas (
+    chave TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT,
+    corpo BLOB NOT NULL, tamanho INTEGER NOT NULL, gravado_em TEXT, acessado_em REAL
+);
+CREATE INDEX IF NOT EXISTS ix_respostas_acesso ON respostas (acessado_em);
+"""
+
+
+def chave_cache(escopo: str, url: str, params: Optional[Dict] = None) -> str:
+    """Chave estável de uma consulta (escopo = conta; parâmetros em ordem)"""
+    consulta = urlencode(sorted((params or {}).items()))
+    return hashlib.sha256(f"{escopo}|{url}?{consulta}".encode()).hexdigest()
+
+
+class MobneCache:
+    """Cache de respostas GET validado por ETag/Last-Modified"""
+
+    def __init__(self, path: Path = CACHE_FILE, max_mb: float = CACHE_MAX_MB):
+        """
+        Abre (ou cria) o cache
+
+        Args:
+            path: Arquivo SQLite do cache
+            max_mb: Tamanho máximo dos corpos guardados (comprimidos), em MB
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1e6)
+        self._lock = threading.Lock()  # serializa gravação + descarte entre threads do processo
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def validadores(self, chave: str) -> Dict[str, str]:
+        """Headers condicionais (If-None-Match / If-Modified-Since) da cópia guardada"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT etag, last_modified FROM respostas WHERE chave = ?", (chave,)).fetchone()
+        if row is None:
+            return {}
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def obter(self, chave: str) -> Optional[bytes]:
+        """Corpo guardado (None se foi descartado) e marca o acesso para o LRU"""
+        with self._connect() as conn, conn:
+            row = conn.execute("SELECT corpo FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (datetime.now().timestamp(), chave))
+        return zlib.decompress(row[0])
+
+    def gravar(self, chave: str, url: str, corpo: bytes, etag: Optional[str], last_modified: Optional[str]) -> bool:
+        """
+        Guarda uma resposta 200 que tenha validador; descarta as menos usadas se passar do limite
+
+        Returns:
+            True se foi guardada
+        """
+        if not (etag or last_modified) or self.max_bytes <= 0:
+            return False
+        dados = zlib.compress(corpo, 6)
+        if len(dados) > self.max_bytes:
+            return False
+        agora = datetime.now()
+        with self._lock, self._connect() as conn, conn:
+            conn.execute("INSERT INTO respostas (chave, url, etag, last_modified, corpo, tamanho, gravado_em, acessado_em) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (chave) DO UPDATE SET url = excluded.url, "
+                         "etag = excluded.etag, last_modified = excluded.last_modified, corpo = excluded.corpo, "
+                         "tamanho = excluded.tamanho, gravado_em = excluded.gravado_em, acessado_em = excluded.acessado_em",
+                         (chave, url, etag, last_modified, dados, len(dados), agora.isoformat(timespec='seconds'), agora.timestamp()))
+            excesso = conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0] - self.max_bytes
+            if excesso > 0:
+                descartar, liberado = [], 0
+                for k, tamanho in conn.execute("SELECT chave, tamanho FROM respostas WHERE chave != ? ORDER BY acessado_em", (chave,)):
+                    descartar.append((k,)); liberado += tamanho
+                    if liberado >= excesso:
+                        break
+                conn.executemany("DELETE FROM respostas WHERE chave = ?", descartar)
+        return True
+
+    def tamanho(self) -> Tuple[int, int]:
+        """(respostas guardadas, bytes ocupados pelos corpos)"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()
+
+    def limpar(self) -> None:
+        """Remove todas as respostas guardadas"""
+        with self._lock, self._connect() as conn, conn:
+            conn.execute("DELETE FROM respostas")
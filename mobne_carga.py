@@ -0,0 +1,223 @@
+"""
+Teste de carga das sincronizações do Mobne contra o servidor local (mobne_fake_server).
+
+O servidor roda em um processo separado (não divide o GIL nem a memória com
+o cliente). Para cada nível de concorrência roda os cenários abaixo com um
+cliente novo e mede vazão (registros/s), latência por requisição HTTP
+(p50/p95/p99, da chamada até o corpo lido, novas tentativas incluídas como
+requisições separadas), os contadores do cliente (novas tentativas, 429) e,
+com --memoria, o pico de memória alocada pelo Python (tracemalloc, que
+deixa o cliente ~2x mais lento: compare tempos só entre rodadas iguais):
+
+    produtos / clientes   cadastro completo paginado
+    vendas                período completo (dias do conjunto)
+    incremental 1ª / 2ª   sync_incremental de vendas em um armazém vazio e
+                          logo em seguida (só a data da marca d'água)
+    envio                 --envios vendas novas por enviar_payloads (lote se
+                          MOBNE_BATCH_ENDPOINT estiver configurado)
+
+O servidor pode injetar erros 500/503 (--erros) e responder 429 acima de um
+limite por chave (--limite); o teste confere que todos os registros chegam
+mesmo assim e sai com código 1 se algum cenário ficou incompleto. O cache de GETs condicionais fica desligado para medir a rede.
+
+Uso:
+    python mobne_carga.py                                  # 20 000 vendas, 20 ms
+    python mobne_carga.py --vendas 100000 --concorrencia 1 4 8 --envios 2000
+    python mobne_carga.py --erros 0.05 --limite 50 --json carga.json
+    python mobne_carga.py --memoria --concorrencia 8
+"""
+import argparse
+import json
+import logging
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from mobne_api import MOBNE_DIAS_INICIAIS, MobneAPIClient, MobneAPIError
+from mobne_fake_server import gerar_dados
+from mobne_store import MobneStore
+
+
+def subir_servidor(args) -> tuple:
+    """
+    Inicia mobne_fake_server.py em outro processo numa porta livre
+
+    Returns:
+        Tupla (processo, URL base), já respondendo ao health
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        porta = s.getsockname()[1]
+    processo = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("mobne_fake_server.py")), "--porta", str(porta),
+         "--latencia", str(args.latencia), "--produtos", str(args.produtos), "--clientes", str(args.clientes),
+         "--vendas", str(args.vendas), "--dias", str(args.dias), "--erros", str(args.erros), "--limite", str(args.limite)],
+        stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{porta}"
+    for _ in range(300):
+        try:
+            requests.get(f"{url}/api/v1/health", timeout=1).raise_for_status()
+            return processo, url
+        except requests.RequestException:
+            if processo.poll() is not None:
+                raise SystemExit(f"Servidor fictício encerrou com código {processo.returncode}")
+            time.sleep(0.1)
+    processo.terminate()
+    raise SystemExit("Servidor fictício não respondeu em 30 s")
+
+
+def medir_latencias(client) -> list:
+    """Envolve session.request do cliente; devolve a lista (thread-safe por append) das durações"""
+    latencias, original = [], client.session.request
+
+    def request(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            latencias.append(time.perf_counter() - inicio)
+
+    client.session.request = request
+    return latencias
+
+
+def executar(nome, concorrencia, url, args, funcao, esperado=None):
+    """
+    Roda um cenário com um cliente novo e mede tempo, latências e memória
+
+    Args:
+        nome: Nome do cenário na tabela
+        concorrencia: Páginas/envios em voo
+        url: URL base do servidor
+        args: Opções da linha de comando
+        funcao: Recebe o cliente e devolve a quantidade de registros processados
+        esperado: Registros que devem chegar (None = não confere)
+
+    Returns:
+        Dicionário com as medidas do cenário ('faltando' > 0 se vieram menos registros que o esperado)
+    """
+    client = MobneAPIClient("carga", "00000000000000", base_url=url, concorrencia=concorrencia,
+                            taxa=args.taxa, usar_cache=False)
+    latencias = medir_latencias(client)
+    if args.memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        registros = funcao(client)
+    except MobneAPIError:
+        registros = 0  # uma página esgotou as tentativas; aparece em 'falhas' e 'faltando'
+    finally:
+        segundos = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] if args.memoria else 0
+        tracemalloc.stop()
+        client.session.close()
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) * 1000 if latencias else (0, 0, 0)
+    metricas = client.metricas()
+    return {'cenario': nome, 'concorrencia': concorrencia, 'registros': registros, 'requisicoes': len(latencias),
+            'retries': metricas['retries'], 'http_429': metricas['http_429'], 'falhas': metricas['falhas'],
+            'faltando': 0 if esperado is None else esperado - registros, 'segundos': round(segundos, 3),
+            'registros_s': round(registros / segundos, 1), 'p50_ms': round(p50, 1), 'p95_ms': round(p95, 1),
+            'p99_ms': round(p99, 1), 'pico_mb': round(pico / 1e6, 1) if args.memoria else None}
+
+
+def cenarios(conjunto, args, concorrencia, pasta):
+    """
+    Cenários de uma rodada, na ordem (o envio por último: ele acrescenta vendas ao servidor)
+
+    Args:
+        conjunto: {'produtos': n, 'clientes': n, 'vendas': [datas]} espelhando o servidor; o envio atualiza as datas
+        args: Opções da linha de comando
+        concorrencia: Nível da rodada
+        pasta: Diretório temporário do armazém local
+
+    Yields:
+        Tuplas (nome, função do cliente, registros esperados ou None)
+    """
+    hoje = datetime.now()
+    store = MobneStore(Path(pasta) / f"carga_{concorrencia}.db")
+    contar = lambda paginas: sum(len(p) for p in paginas)
+    desde = (hoje - timedelta(days=MOBNE_DIAS_INICIAIS)).strftime('%Y-%m-%d')  # janela de sync_incremental sem marca
+
+    def incremental(client):
+        sucesso, df = client.sync_incremental('vendas', store, hoje)
+        return len(df) if sucesso else 0
+
+    def enviar(client):
+        enviadas = sum(ok for ok, _ in client.enviar_payloads(payloads, chaves))
+        conjunto['vendas'].extend([hoje.strftime('%Y-%m-%d')] * enviadas)
+        return enviadas
+
+    yield "produtos", lambda c: contar(c.iter_produtos(page_size=args.page_size)), conjunto['produtos']
+    yield "clientes", lambda c: contar(c.iter_clientes(page_size=args.page_size)), conjunto['clientes']
+    yield ("vendas", lambda c: contar(c.iter_vendas(hoje - timedelta(days=args.dias), hoje, page_size=args.page_size)),
+           len(conjunto['vendas']))
+    yield "incremental 1ª", incremental, sum(d >= desde for d in conjunto['vendas'])
+    yield "incremental 2ª", incremental, None
+    if args.envios:
+        payloads = [{'data': hoje.strftime('%Y-%m-%d'), 'cliente_id': 1 + i % 100,
+                     'produtos': [{'produto_id': 1 + i % 50, 'quantidade': 1, 'valor_unitario': 10.0}],
+                     'valor_total': 10.0} for i in range(args.envios)]
+        chaves = [f"carga-{time.time_ns()}-{concorrencia}-{i}" for i in range(args.envios)]
+        yield "envio", enviar, args.envios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga das sincronizações do Mobne")
+    parser.add_argument("--produtos", type=int, default=5_000)
+    parser.add_argument("--clientes", type=int, default=5_000)
+    parser.add_argument("--vendas", type=int, default=20_000)
+    parser.add_argument("--dias", type=int, default=90, help="janela de datas das vendas")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--latencia", type=float, default=0.02, help="segundos por requisição no servidor")
+    parser.add_argument("--erros", type=float, default=0, help="fração de respostas 500/503 do servidor")
+    parser.add_argument("--limite", type=float, default=0, help="req/s aceitas pelo servidor antes de 429 (0 = sem limite)")
+    parser.add_argument("--taxa", type=float, default=0, help="limite de requisições/s do cliente (0 = sem limite)")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--envios", type=int, default=500, help="vendas enviadas por rodada (0 = sem envio)")
+    parser.add_argument("--memoria", action="store_true", help="mede o pico de memória (tracemalloc; mais lento)")
+    parser.add_argument("--json", help="grava as medidas neste arquivo para comparar rodadas")
+    args = parser.parse_args()
+    logging.getLogger("mobne_api").setLevel(logging.CRITICAL)  # tentativas e falhas já aparecem na tabela
+
+    dados = gerar_dados(args.produtos, args.clientes, args.vendas, dias=args.dias)  # o mesmo conjunto do servidor (seed fixa)
+    conjunto = {'produtos': len(dados['produtos']), 'clientes': len(dados['clientes']), 'vendas': [v['data'] for v in dados['vendas']]}
+    del dados
+    processo, url = subir_servidor(args)
+    print(f"{args.produtos} produtos, {args.clientes} clientes, {args.vendas} vendas em {args.dias} dias, "
+          f"páginas de {args.page_size}, latência {args.latencia * 1000:.0f} ms, {args.erros:.0%} de erros, "
+          f"limite {args.limite:g} req/s")
+    print(f"{'cenário':>14} | {'conc.':>5} | {'registros':>9} | {'req':>5} | {'retries':>7} | {'429':>4} | {'falhas':>6} | "
+          f"{'tempo (s)':>9} | {'reg/s':>8} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'pico MB':>7}")
+    resultados = []
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            for n in args.concorrencia:
+                for nome, funcao, esperado in cenarios(conjunto, args, n, pasta):
+                    r = executar(nome, n, url, args, funcao, esperado)
+                    resultados.append(r)
+                    print(f"{nome:>14} | {n:>5} | {r['registros']:>9} | {r['requisicoes']:>5} | {r['retries']:>7} | "
+                          f"{r['http_429']:>4} | {r['falhas']:>6} | {r['segundos']:>9.2f} | {r['registros_s']:>8.0f} | {r['p50_ms']:>7.1f} | "
+                          f"{r['p95_ms']:>7.1f} | {r['p99_ms']:>7.1f} | {'-' if r['pico_mb'] is None else r['pico_mb']:>7}")
+    finally:
+        processo.terminate()
+        processo.wait()
+    if args.json:
+        Path(args.json).write_text(json.dumps({'opcoes': vars(args), 'resultados': resultados}, indent=2, ensure_ascii=False))
+        print(f"Medidas gravadas em {args.json}")
+    incompletos = [r for r in resultados if r['faltando']]
+    for r in incompletos:
+        print(f"INCOMPLETO: {r['cenario']} (concorrência {r['concorrencia']}) — faltaram {r['faltando']} registros")
+    if incompletos:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Servidor local que imita a API Mobne para testes e benchmarks.
+
+Serve /api/v1/health, produtos, clientes e vendas com paginação
+limit/offset (respostas {data, total, has_more}), filtros incrementais
+(data_inicio/data_fim nas vendas, updated_since nos cadastros), POST de
+vendas (avulso e em /api/v1/vendas/lote, idempotente por Idempotency-Key),
+GETs condicionais (ETag/Last-Modified -> 304), gzip e keep-alive, e
+latência, erros 500/503 aleatórios e limite de requisições por chave
+(429 com Retry-After) injetados, sem depender de apiexternal.mobne.com.br.
+Conta requisições, conexões TCP, bytes enviados, erros e 429.
+
+Uso:
+    python mobne_fake_server.py                      # porta 8765, 20 ms
+    python mobne_fake_server.py --porta 9000 --latencia 0.1 --vendas 50000
+    python mobne_fake_server.py --erros 0.05 --limite 10  # 5% de 5xx, 10 req/s por chave
+
+    from mobne_fake_server import iniciar
+    servidor = iniciar(latencia=0.05)                # thread em segundo plano
+    client = MobneAPIClient("chave", "cnpj", base_url=servidor.url)
+    servidor.shutdown()
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CATEGORIAS = ['MERCEARIA', 'BEBIDAS', 'HORTIFRUTI', 'PADARIA', 'ACOUGUE', 'LIMPEZA', 'FRIOS']
+
+
+def gerar_dados(n_produtos: int = 2_000, n_clientes: int = 5_000, n_vendas: int = 20_000,
+                dias: int = 90, seed: int = 42) -> dict:
+    """
+    Gera o conjunto fictício servido pela API
+
+    Args:
+        n_produtos: Quantidade de produtos
+        n_clientes: Quantidade de clientes
+        n_vendas: Quantidade de vendas, espalhadas pelos últimos `dias`
+        dias: Janela de datas das vendas (até hoje)
+        seed: Semente para dados reprodutíveis
+
+    Returns:
+        {'produtos': [...], 'clientes': [...], 'vendas': [...]} com vendas em ordem de data
+    """
+    rnd = random.Random(seed)
+    agora = datetime.now().replace(microsecond=0)
+    atualizado = lambda: (agora - timedelta(minutes=rnd.randrange(dias * 24 * 60))).isoformat()
+    produtos = [{'id': i, 'nome': f"Produto {i}", 'sku': f"SKU{i:06d}", 'categoria': rnd.choice(CATEGORIAS),
+                 'preco': round(rnd.uniform(2, 80), 2), 'custo_medio': round(rnd.uniform(1, 60), 2),
+                 'estoque': rnd.randint(0, 500), 'updated_at': atualizado()} for i in range(1, n_produtos + 1)]
+    clientes = [{'id': i, 'nome': f"Cliente {i}", 'cnpj_cpf': f"{rnd.randrange(10**10, 10**11)}",
+                 'email': f"cliente{i}@exemplo.com", 'cidade': 'Fortaleza', 'estado': 'CE', 'updated_at': atualizado()}
+                for i in range(1, n_clientes + 1)]
+    inicio = date.today() - timedelta(days=dias - 1)
+    vendas = []
+    for i in range(1, n_vendas + 1):
+        qtd, unit = rnd.randint(1, 6), round(rnd.uniform(2, 80), 2)
+        vendas.append({'id': i, 'data': (inicio + timedelta(days=(i - 1) * dias // max(n_vendas, 1))).isoformat(),
+                       'cliente_id': rnd.randint(1, max(n_clientes, 1)),
+                       'produtos': [{'produto_id': rnd.randint(1, max(n_produtos, 1)), 'quantidade': qtd, 'valor_unitario': unit}],
+                       'valor_total': round(qtd * unit, 2), 'status': 'concluida'})
+    return {'produtos': produtos, 'clientes': clientes, 'vendas': vendas}
+
+
+class MobneFakeHandler(BaseHTTPRequestHandler):
+    """Atende as rotas da API com o conjunto do servidor"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, como o servidor real
+    disable_nagle_algorithm = True  # cabeçalho e corpo saem em writes separados; com Nagle + ACK atrasado, +40 ms por resposta
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.contar('conexoes')  # uma por conexão TCP; keep-alive atende várias requisições
+
+    def _responder_condicional(self, corpo: dict) -> None:
+        """200 com ETag/Last-Modified, ou 304 sem corpo se o cliente já tem esta versão"""
+        payload = json.dumps(corpo).encode('utf-8')
+        etag = f'"{hashlib.md5(payload).hexdigest()}"'
+        modificado = formatdate(self.server.modificado_em, usegmt=True)
+        inm, ims = self.headers.get('If-None-Match'), self.headers.get('If-Modified-Since')
+        try:
+            nao_mudou = etag in inm.split(', ') if inm else bool(ims) and parsedate_to_datetime(ims).timestamp() >= int(self.server.modificado_em)
+        except (TypeError, ValueError):
+            nao_mudou = False
+        if nao_mudou:
+            self.server.contar('respostas_304')
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._responder(200, corpo, {"ETag": etag, "Last-Modified": modificado}, payload)
+
+    def _falha_injetada(self) -> bool:
+        """Responde 429 (acima do limite da chave) ou 500/503 (taxa de erro); True se respondeu"""
+        espera = self.server.consumir(self.headers.get('Authorization', ''))
+        if espera:
+            self.server.contar('respostas_429')
+            self._responder(429, {'error': "Limite de requisições excedido"}, {"Retry-After": f"{espera:.2f}"})
+            return True
+        if self.server.erros and self.server.sortear() < self.server.erros:
+            self.server.contar('erros_injetados')
+            self._responder(self.server.sortear_status(), {'error': "Falha simulada"})
+            return True
+        return False
+
+    def _responder(self, status: int, corpo: dict, headers: dict = None, payload: bytes = None) -> None:
+        payload = payload if payload is not None else json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.send_header("Content-Type", "application/json")
+        if 'gzip' in self.headers.get('Accept-Encoding', '') and len(payload) > 1024:
+            payload = gzip.compress(payload, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if self.server.banda:
+            time.sleep(len(payload) / self.server.banda)  # tempo de transmissão num link de `banda` bytes/s
+        self.wfile.write(payload)
+        self.server.contar('bytes_enviados', len(payload))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        qs = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        time.sleep(self.server.latencia)
+        self.server.contar('requisicoes')
+
+        rota = url.path.rstrip('/')
+        if rota == '/api/v1/health':
+            return self._responder(200, {'status': 'ok'})
+        if self._falha_injetada():
+            return
+        entidade = rota.rsplit('/', 1)[-1]
+        if not rota.startswith('/api/v1/') or entidade not in self.server.dados:
+            return self._responder(404, {'error': f"Rota não encontrada: {url.path}"})
+
+        registros = self.server.dados[entidade]
+        if entidade == 'vendas' and ('data_inicio' in qs or 'data_fim' in qs):
+            ini, fim = qs.get('data_inicio', '0000-01-01'), qs.get('data_fim', '9999-12-31')
+            registros = [v for v in registros if ini <= v['data'] <= fim]
+        elif 'updated_since' in qs:
+            registros = [r for r in registros if r.get('updated_at', '') >= qs['updated_since']]
+        try:
+            limit, offset = int(qs.get('limit', 1000)), int(qs.get('offset', 0))
+        except ValueError:
+            return self._responder(400, {'error': "limit/offset inválidos"})
+        pagina = registros[offset:offset + limit]
+        self._responder_condicional({'data': pagina, 'total': len(registros), 'has_more': offset + len(pagina) < len(registros)})
+
+
+    def _registrar_venda(self, venda: dict, chave: str) -> tuple:
+        """Grava uma venda (ou devolve a já gravada com a mesma chave)"""
+        faltando = [c for c in ('data', 'cliente_id', 'produtos', 'valor_total') if c not in venda]
+        if faltando:
+            return 422, {'error': f"Campos obrigatórios faltando: {', '.join(faltando)}"}
+        with self.server._lock:
+            if chave and chave in self.server.chaves:
+                return 200, {'id': self.server.chaves[chave]}
+            vendas = self.server.dados['vendas']
+            novo = (vendas[-1]['id'] if vendas else 0) + 1
+            vendas.append({**{k: v for k, v in venda.items() if k != 'idempotency_key'}, 'id': novo, 'status': 'concluida'})
+            if chave:
+                self.server.chaves[chave] = novo
+            self.server.recebidas += 1
+            self.server.modificado_em = time.time()
+        return 201, {'id': novo}
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        time.sleep(self.server.latencia)
+        self.server.contar('requisicoes')
+        try:
+            corpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except ValueError:
+            return self._responder(400, {'error': "JSON inválido"})
+        if self._falha_injetada():  # depois de ler o corpo, para não sujar a conexão keep-alive
+            return
+
+        rota = url.path.rstrip('/')
+        if rota == '/api/v1/vendas':
+            return self._responder(*self._registrar_venda(corpo, self.headers.get('Idempotency-Key')))
+        if rota == '/api/v1/vendas/lote':
+            resultados = []
+            for venda in corpo.get('vendas', []):
+                status, resposta = self._registrar_venda(venda, venda.get('idempotency_key'))
+                resultados.append(resposta)
+            return self._responder(200, {'resultados': resultados})
+        self._responder(404, {'error': f"Rota não encontrada: {url.path}"})
+
+
+class MobneFakeServer(ThreadingHTTPServer):
+    """Servidor HTTP com o conjunto de dados, a latência e as falhas configurados"""
+
+    daemon_threads = True
+    request_queue_size = 128  # o padrão (5) recusa conexões com concorrência alta sem keep-alive
+
+    def __init__(self, porta: int = 0, latencia: float = 0.0, dados: dict = None, banda: float = 0.0,
+                 erros: float = 0.0, limite: float = 0.0, seed: int = 42):
+        super().__init__(("127.0.0.1", porta), MobneFakeHandler)
+        self.latencia = latencia
+        self.banda = banda
+        self.erros = erros
+        self.limite = limite
+        self.dados = dados if dados is not None else gerar_dados()
+        self.requisicoes = self.conexoes = self.bytes_enviados = self.recebidas = self.respostas_304 = 0
+        self.respostas_429 = self.erros_injetados = 0
+        self._baldes = {}  # Authorization -> (fichas, instante), um balde de `limite` req/s por chave
+        self._rnd = random.Random(seed)
+        self.modificado_em = time.time()  # Last-Modified do conjunto; avança a cada venda recebida
+        self.chaves = {}  # Idempotency-Key -> id da venda gravada
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def contar(self, contador: str, valor: int = 1) -> None:
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + valor)
+
+    def zerar(self) -> None:
+        """Zera requisições, conexões, bytes e falhas (entre rodadas de um benchmark)"""
+        with self._lock:
+            self.requisicoes = self.conexoes = self.bytes_enviados = self.respostas_304 = 0
+            self.respostas_429 = self.erros_injetados = 0
+            self._baldes.clear()
+
+    def sortear(self) -> float:
+        with self._lock:
+            return self._rnd.random()
+
+    def sortear_status(self) -> int:
+        with self._lock:
+            return self._rnd.choice((500, 503))
+
+    def consumir(self, chave: str) -> float:
+        """
+        Gasta uma ficha do balde da chave (capacidade de 1 s de requisições)
+
+        Returns:
+            0 se a requisição está dentro do limite; senão, segundos até a próxima ficha
+        """
+        if self.limite <= 0:
+            return 0.0
+        agora = time.monotonic()
+        with self._lock:
+            fichas, antes = self._baldes.get(chave, (self.limite, agora))
+            fichas = min(self.limite, fichas + (agora - antes) * self.limite)
+            if fichas < 1:
+                self._baldes[chave] = (fichas, agora)
+                return (1 - fichas) / self.limite
+            self._baldes[chave] = (fichas - 1, agora)
+            return 0.0
+
+
+def iniciar(porta: int = 0, latencia: float = 0.0, dados: dict = None, banda: float = 0.0,
+            erros: float = 0.0, limite: float = 0.0) -> MobneFakeServer:
+    """
+    Sobe o servidor em uma thread daemon
+
+    Args:
+        porta: Porta local (0 = qualquer livre)
+        latencia: Atraso por requisição, em segundos
+        dados: Conjunto de gerar_dados() (default: tamanho padrão)
+        banda: Bytes/s simulados por conexão (0 = sem limite, como no loopback)
+        erros: Fração das requisições respondidas com 500/503 (0 a 1)
+        limite: Requisições/s aceitas por chave de API antes de responder 429 (0 = sem limite)
+
+    Returns:
+        Servidor em execução (use .url e .shutdown())
+    """
+    servidor = MobneFakeServer(porta, latencia, dados, banda, erros, limite)
+    threading.Thread(target=servidor.serve_forever, name="mobne-fake", daemon=True).start()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API Mobne local para testes")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.02, help="segundos por requisição")
+    parser.add_argument("--produtos", type=int, default=2_000)
+    parser.add_argument("--clientes", type=int, default=5_000)
+    parser.add_argument("--vendas", type=int, default=20_000)
+    parser.add_argument("--dias", type=int, default=90, help="janela de datas das vendas")
+    parser.add_argument("--banda", type=float, default=0, help="MB/s por conexão (0 = sem limite)")
+    parser.add_argument("--erros", type=float, default=0, help="fração de respostas 500/503 (ex: 0.05)")
+    parser.add_argument("--limite", type=float, default=0, help="req/s por chave antes de 429 (0 = sem limite)")
+    args = parser.parse_args()
+
+    servidor = MobneFakeServer(args.porta, args.latencia, gerar_dados(args.produtos, args.clientes, args.vendas, args.dias),
+                               args.banda * 1e6, args.erros, args.limite)
+    print(f"API Mobne fictícia em {servidor.url} (latência {args.latencia * 1000:.0f} ms, "
+          f"{args.erros:.0%} de erros, limite {args.limite:g} req/s) — Ctrl+C para sair")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Módulo de Caixa de Saída do Mobne
+Vendas a enviar ficam em uma tabela SQLite antes de sair; uma thread por
+CNPJ as drena em lotes e grava o status e o id de cada uma, então um envio
+interrompido (aba fechada, API fora, reinício) continua de onde parou
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+import pandas as pd
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from mobne_store import DB_FILE, normalizar_cnpj
+
+OUTBOX_LOTE = int(os.getenv("MOBNE_OUTBOX_LOTE", "200"))  # vendas reservadas por rodada do flusher
+OUTBOX_INTERVALO = 5.0  # segundos entre verificações da fila quando ociosa
+OUTBOX_MAX_TENTATIVAS = 3  # rodadas do flusher antes de marcar a venda como erro definitivo
+OUTBOX_ESPERA = float(os.getenv("MOBNE_OUTBOX_ESPERA", "30"))  # segundos até a 2ª rodada de uma falha; dobra a cada rodada
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    chave TEXT PRIMARY KEY, cnpj TEXT NOT NULL, envio TEXT NOT NULL, linha INTEGER,
+    payload TEXT NOT NULL, status TEXT NOT NULL, tentativas INTEGER DEFAULT 0,
+    id_mobne TEXT, mensagem TEXT, criado_em TEXT, atualizado_em TEXT, proxima_tentativa TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_outbox_fila ON outbox (cnpj, status, criado_em);
+CREATE INDEX IF NOT EXISTS ix_outbox_envio ON outbox (envio, linha);
+"""
+
+PENDENTE, ENVIANDO, ENVIADA, ERRO = 'pendente', 'enviando', 'enviada', 'erro'
+
+
+def _agora(segundos: float = 0) -> str:
+    return (datetime.now() + timedelta(seconds=segundos)).isoformat(timespec='seconds')
+
+
+class Outbox:
+    """Fila persistente de vendas para o Mobne, chaveada pela chave de idempotência"""
+
+    def __init__(self, db: Path = DB_FILE):
+        """
+        Abre (ou cria) a fila e devolve para a fila o que estava em voo
+
+        Args:
+            db: Banco SQLite (o mesmo do armazém local do Mobne por padrão)
+        """
+        self.db = Path(db)
+        self.db.parent.mkdir(parents=True, exist_ok=True)
+        self._flushers: Dict[str, "OutboxFlusher"] = {}
+        self._lock = threading.Lock()
+        with self._connect() as conn, conn:
+            conn.executescript(SCHEMA)
+            if 'proxima_tentativa' not in {c[1] for c in conn.execute("PRAGMA table_info(outbox)")}:
+                conn.execute("ALTER TABLE outbox ADD COLUMN proxima_tentativa TEXT")  # filas criadas antes da espera entre rodadas
+            # Reservadas por um processo que parou: a chave de idempotência torna o reenvio seguro
+            conn.execute("UPDATE outbox SET status = ? WHERE status = ?", (PENDENTE, ENVIANDO))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def enfileirar(self, cnpj: str, payloads: Sequence[Dict], chaves: Sequence[str], linhas: Sequence[int]) -> str:
+        """
+        Grava vendas na fila em uma transação
+
+        Uma chave já enfileirada não é duplicada: passa para o novo envio e,
+        se tinha falhado, volta a pendente; se já foi enviada, continua enviada.
+
+        Args:
+            cnpj: CNPJ da empresa
+            payloads: Vendas no formato da API
+            chaves: Chave de idempotência de cada venda
+            linhas: Linha do arquivo de origem de cada venda
+
+        Returns:
+            Identificador do envio
+        """
+        envio, agora, cnpj = uuid.uuid4().hex[:12], _agora(), normalizar_cnpj(cnpj)
+        with self._connect() as conn, conn:
+            conn.executemany(
+                "INSERT INTO outbox (chave, cnpj, envio, linha, payload, status, criado_em, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (chave) DO UPDATE SET envio = excluded.envio, "
+                "linha = excluded.linha, atualizado_em = excluded.atualizado_em, tentativas = CASE WHEN status = 'erro' "
+                "THEN 0 ELSE tentativas END, proxima_tentativa = CASE WHEN status = 'erro' THEN NULL ELSE proxima_tentativa END, "
+                "status = CASE WHEN status = 'erro' THEN 'pendente' ELSE status END",
+                [(k, cnpj, envio, int(l), json.dumps(p, ensure_ascii=False), PENDENTE, agora, agora)
+                 for p, k, l in zip(payloads, chaves, linhas)])
+        flusher = self._flushers.get(cnpj)
+        if flusher is not None:
+            flusher.acordar()
+        return envio
+
+    def reservar(self, cnpj: str, limite: int = OUTBOX_LOTE) -> List[tuple]:
+        """
+        Marca as próximas vendas pendentes como em envio
+
+        Vendas que falharam só voltam depois da espera da rodada (proxima_tentativa).
+
+        Returns:
+            Lista de (chave, payload) na ordem de chegada
+        """
+        with self._connect() as conn, conn:
+            linhas = conn.execute("SELECT chave, payload FROM outbox WHERE cnpj = ? AND status = ? AND (proxima_tentativa IS NULL "
+                                  "OR proxima_tentativa <= ?) ORDER BY criado_em, envio, linha LIMIT ?",
+                                  (normalizar_cnpj(cnpj), PENDENTE, _agora(), limite)).fetchall()
+            conn.executemany("UPDATE outbox SET status = ?, atualizado_em = ? WHERE chave = ?",
+                             [(ENVIANDO, _agora(), k) for k, _ in linhas])
+        return [(k, json.loads(p)) for k, p in linhas]
+
+    def concluir(self, resultados: Sequence[tuple]) -> None:
+        """
+        Grava o desfecho de vendas reservadas
+
+        Args:
+            resultados: (chave, sucesso, ID da venda ou mensagem de erro); falhas
+                voltam a pendente até OUTBOX_MAX_TENTATIVAS rodadas, esperando
+                OUTBOX_ESPERA segundos antes da 2ª, o dobro antes da 3ª...
+        """
+        agora = _agora()
+        falhas = [(k, v) for k, ok, v in resultados if not ok]
+        with self._connect() as conn, conn:
+            conn.executemany("UPDATE outbox SET status = ?, id_mobne = ?, mensagem = NULL, tentativas = tentativas + 1, "
+                             "atualizado_em = ? WHERE chave = ?",
+                             [(ENVIADA, None if v is None else str(v), agora, k) for k, ok, v in resultados if ok])
+            tentativas = dict(conn.execute(f"SELECT chave, tentativas FROM outbox WHERE chave IN ({','.join('?' * len(falhas))})",
+                                           [k for k, _ in falhas]).fetchall()) if falhas else {}
+            conn.executemany("UPDATE outbox SET status = CASE WHEN tentativas + 1 >= ? THEN ? ELSE ? END, mensagem = ?, "
+                             "tentativas = tentativas + 1, proxima_tentativa = ?, atualizado_em = ? WHERE chave = ?",
+                             [(OUTBOX_MAX_TENTATIVAS, ERRO, PENDENTE, str(v), _agora(OUTBOX_ESPERA * 2 ** tentativas.get(k, 0)), agora, k)
+                              for k, v in falhas])
+
+    def retomar(self, cnpj: str) -> int:
+        """Devolve à fila as vendas do CNPJ que esgotaram as tentativas"""
+        cnpj = normalizar_cnpj(cnpj)
+        with self._connect() as conn, conn:
+            n = conn.execute("UPDATE outbox SET status = ?, tentativas = 0, proxima_tentativa = NULL, atualizado_em = ? "
+                             "WHERE cnpj = ? AND status = ?",
+                             (PENDENTE, _agora(), cnpj, ERRO)).rowcount
+        flusher = self._flushers.get(cnpj)
+        if flusher is not None:
+            flusher.acordar()
+        return n
+
+    def resumo(self, cnpj: str, envio: Optional[str] = None) -> Dict[str, int]:
+        """Quantidade de vendas por status (do CNPJ ou de um envio)"""
+        sql, params = "SELECT status, COUNT(*) FROM outbox WHERE cnpj = ?", [normalizar_cnpj(cnpj)]
+        if envio:
+            sql += " AND envio = ?"; params.append(envio)
+        with self._connect() as conn:
+            contagem = dict(conn.execute(sql + " GROUP BY status", params).fetchall())
+        return {s: contagem.get(s, 0) for s in (PENDENTE, ENVIANDO, ENVIADA, ERRO)}
+
+    def resultado(self, envio: str) -> pd.DataFrame:
+        """Desfecho por linha de um envio: [Linha, Chave, Status, ID_Mobne, Mensagem]"""
+        with self._connect() as conn:
+            return pd.read_sql_query("SELECT linha AS Linha, chave AS Chave, status AS Status, id_mobne AS ID_Mobne, "
+                                     "mensagem AS Mensagem FROM outbox WHERE envio = ? ORDER BY linha", conn, params=[envio])
+
+    def envios(self, cnpj: str, limit: int = 5) -> pd.DataFrame:
+        """Envios mais recentes do CNPJ com a contagem por status"""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT envio AS Envio, MIN(criado_em) AS Criado_Em, MAX(atualizado_em) AS Atualizado_Em, COUNT(*) AS Vendas, "
+                "SUM(status = 'pendente' OR status = 'enviando') AS Pendentes, SUM(status = 'enviada') AS Enviadas, "
+                "SUM(status = 'erro') AS Erros FROM outbox WHERE cnpj = ? GROUP BY envio ORDER BY MAX(atualizado_em) DESC LIMIT ?",
+                conn, params=[normalizar_cnpj(cnpj), limit])
+
+    def flusher(self, client) -> "OutboxFlusher":
+        """
+        Thread de envio do CNPJ do cliente, iniciada na primeira chamada
+
+        Args:
+            client: MobneAPIClient autenticado (usado para enviar_payloads)
+        """
+        cnpj = normalizar_cnpj(client.cnpj)
+        with self._lock:
+            flusher = self._flushers.get(cnpj)
+            if flusher is None or not flusher.is_alive():
+                flusher = self._flushers[cnpj] = OutboxFlusher(self, client)
+                flusher.start()
+            else:
+                flusher.client = client
+            return flusher
+
+
+class OutboxFlusher(threading.Thread):
+    """Drena a fila de um CNPJ em lotes, fora da thread do script do Streamlit"""
+
+    def __init__(self, outbox: Outbox, client, lote: int = OUTBOX_LOTE):
+        super().__init__(name=f"mobne-outbox-{normalizar_cnpj(client.cnpj)}", daemon=True)
+        self.outbox = outbox
+        self.client = client
+        self.lote = lote
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+
+    def acordar(self) -> None:
+        """Chamado ao enfileirar: não espera o intervalo ocioso"""
+        self._acordar.set()
+
+    def parar(self) -> None:
+        self._parar.set(); self._acordar.set()
+
+    def run(self) -> None:
+        while not self._parar.is_set():
+            reservadas = self.outbox.reservar(self.client.cnpj, self.lote)
+            if not reservadas:
+                self._acordar.wait(OUTBOX_INTERVALO)
+                self._acordar.clear()
+                continue
+            chaves, payloads = [k for k, _ in reservadas], [p for _, p in reservadas]
+            try:
+                enviados = self.client.enviar_payloads(payloads, chaves)
+            except Exception as e:
+                enviados = [(False, f"Erro no envio: {e}")] * len(chaves)
+            self.outbox.concluir([(k, ok, v) for k, (ok, v) in zip(chaves, enviados)])
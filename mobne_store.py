@@ -0,0 +1,217 @@
+"""
+Módulo de Armazém Local do Mobne
+Registros sincronizados do ERP e marcas d'água por CNPJ/entidade em SQLite;
+cada sincronização busca só o que é mais novo que a marca e mescla por id.
+As leituras ficam em memória até a próxima mescla que mude algum registro
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import pandas as pd
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from data_store import copy_on_write
+
+DB_FILE = Path(os.getenv("MOBNE_DB", "dados/mobne.db"))
+CARREGAR_CACHE = 8  # consultas de carregar() mantidas em memória por armazém
+
+# entidade -> campo do registro que avança a marca d'água
+CAMPO_MARCA = {'vendas': 'data', 'produtos': 'updated_at', 'clientes': 'updated_at'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registros (
+    cnpj TEXT NOT NULL, entidade TEXT NOT NULL, id TEXT NOT NULL,
+    marca TEXT, dados TEXT NOT NULL, sincronizado_em TEXT,
+    PRIMARY KEY (cnpj, entidade, id)
+);
+CREATE INDEX IF NOT EXISTS ix_registros_marca ON registros (cnpj, entidade, marca);
+
+CREATE TABLE IF NOT EXISTS marcas (
+    cnpj TEXT NOT NULL, entidade TEXT NOT NULL, marca TEXT, sincronizado_em TEXT, recebidos INTEGER,
+    PRIMARY KEY (cnpj, entidade)
+);
+"""
+
+
+def normalizar_cnpj(cnpj: str) -> str:
+    """Só os dígitos ('00.000.000/0000-00' e '00000000000000' são o mesmo CNPJ)"""
+    return re.sub(r"\D", "", str(cnpj or ""))
+
+
+# (banco, cnpj, entidade) -> versão; compartilhada por todas as instâncias do processo,
+# então uma mescla feita por outro MobneStore (ex: sync_incremental sem store) invalida o cache
+_versoes: Dict[tuple, int] = {}
+_versoes_lock = threading.Lock()
+
+
+def _chave(registro: Dict) -> str:
+    """Id do registro no ERP; sem id, um hash estável do conteúdo"""
+    if registro.get('id') is not None:
+        return str(registro['id'])
+    return hashlib.sha1(json.dumps(registro, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class MobneStore:
+    """Cópia local dos dados do Mobne, mesclada de forma idempotente"""
+
+    def __init__(self, path: Path = DB_FILE):
+        """
+        Abre (ou cria) o banco local do Mobne
+
+        Args:
+            path: Caminho do arquivo SQLite
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._frames: "OrderedDict[tuple, tuple]" = OrderedDict()  # consulta -> (versão, DataFrame)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Conexão curta por operação (seguro entre threads do Streamlit)"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _versao(self, cnpj: str, entidade: str) -> int:
+        return _versoes.get((str(self.path.resolve()), cnpj, entidade), 0)
+
+    def watermark(self, cnpj: str, entidade: str) -> Optional[str]:
+        """
+        Maior data/updated_at já sincronizado
+
+        Returns:
+            Marca ('AAAA-MM-DD' para vendas, updated_at para cadastros) ou None
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT marca FROM marcas WHERE cnpj = ? AND entidade = ?",
+                               (normalizar_cnpj(cnpj), entidade)).fetchone()
+        return row[0] if row else None
+
+    def merge(self, cnpj: str, entidade: str, registros: Iterable[Dict]) -> int:
+        """
+        Insere ou substitui registros pelo id em uma única transação
+
+        Registros idênticos aos já gravados não são reescritos; se nada mudou,
+        as leituras em memória de carregar() continuam válidas.
+
+        Args:
+            cnpj: CNPJ da empresa
+            entidade: 'vendas', 'produtos' ou 'clientes'
+            registros: Dicionários como vêm da API
+
+        Returns:
+            Número de registros recebidos
+        """
+        campo, agora = CAMPO_MARCA.get(entidade), datetime.now().isoformat(timespec='seconds')
+        cnpj = normalizar_cnpj(cnpj)
+        linhas = [(cnpj, entidade, _chave(r), str(r[campo])[:10] if campo == 'data' and r.get(campo) else r.get(campo),
+                   json.dumps(r, ensure_ascii=False, default=str), agora) for r in registros]
+        with self._connect() as conn, conn:
+            alterados = conn.executemany(
+                "INSERT INTO registros (cnpj, entidade, id, marca, dados, sincronizado_em) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (cnpj, entidade, id) DO UPDATE SET marca = excluded.marca, dados = excluded.dados, "
+                "sincronizado_em = excluded.sincronizado_em "
+                "WHERE marca IS NOT excluded.marca OR dados IS NOT excluded.dados", linhas).rowcount
+        if alterados > 0:
+            with _versoes_lock:
+                chave = (str(self.path.resolve()), cnpj, entidade)
+                _versoes[chave] = _versoes.get(chave, 0) + 1
+        return len(linhas)
+
+    def marcar(self, cnpj: str, entidade: str, registros: pd.DataFrame, limite: Optional[str] = None) -> Optional[str]:
+        """
+        Avança a marca d'água para o maior valor recebido nesta sincronização (só após ela terminar)
+
+        Só os registros desta sincronização contam: o que veio de outras cargas
+        (ex.: um período específico mesclado no armazém) não move a marca, e ela
+        nunca recua.
+
+        Args:
+            cnpj: CNPJ da empresa
+            entidade: Entidade sincronizada
+            registros: Registros recebidos nesta sincronização, no formato da API
+            limite: Teto da nova marca (ex.: data final pedida para vendas)
+
+        Returns:
+            Nova marca
+        """
+        campo = CAMPO_MARCA.get(entidade)
+        valores = registros[campo].dropna().astype(str) if campo in registros else pd.Series(dtype=str)
+        if campo == 'data':
+            valores = valores.str[:10]
+        recebida = valores.max() if len(valores) else None
+        if recebida is not None and limite is not None:
+            recebida = min(recebida, limite)
+        cnpj = normalizar_cnpj(cnpj)
+        with self._connect() as conn, conn:
+            row = conn.execute("SELECT marca FROM marcas WHERE cnpj = ? AND entidade = ?", (cnpj, entidade)).fetchone()
+            marca = max((m for m in (row[0] if row else None, recebida) if m is not None), default=None)
+            conn.execute(
+                "INSERT INTO marcas (cnpj, entidade, marca, sincronizado_em, recebidos) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (cnpj, entidade) DO UPDATE SET marca = excluded.marca, "
+                "sincronizado_em = excluded.sincronizado_em, recebidos = excluded.recebidos",
+                (cnpj, entidade, marca, datetime.now().isoformat(timespec='seconds'), len(registros)))
+        return marca
+
+    def carregar(self, cnpj: str, entidade: str, inicio: Optional[str] = None, fim: Optional[str] = None) -> pd.DataFrame:
+        """
+        Registros locais de uma entidade, no formato da API
+
+        O resultado fica em memória (até CARREGAR_CACHE consultas) e é
+        reaproveitado enquanto nenhuma mescla alterar a entidade do CNPJ.
+
+        Args:
+            cnpj: CNPJ da empresa
+            entidade: 'vendas', 'produtos' ou 'clientes'
+            inicio: Marca mínima (ex: data 'AAAA-MM-DD'), inclusiva
+            fim: Marca máxima, inclusiva
+
+        Returns:
+            DataFrame com uma linha por registro (cópia própria; pode receber colunas novas)
+        """
+        cnpj = normalizar_cnpj(cnpj)
+        consulta, versao = (cnpj, entidade, inicio, fim), self._versao(cnpj, entidade)
+        with self._lock:
+            guardado = self._frames.get(consulta)
+            if guardado is not None and guardado[0] == versao:
+                self._frames.move_to_end(consulta)
+                return guardado[1].copy(deep=not copy_on_write())
+        where, params = ["cnpj = ? AND entidade = ?"], [cnpj, entidade]
+        if inicio:
+            where.append("marca >= ?"); params.append(inicio)
+        if fim:
+            where.append("marca <= ?"); params.append(fim)
+        with self._connect() as conn:
+            dados = [json.loads(d) for (d,) in conn.execute(
+                f"SELECT dados FROM registros WHERE {' AND '.join(where)} ORDER BY marca, id", params)]
+        df = pd.DataFrame.from_records(dados)
+        with self._lock:
+            self._frames[consulta] = (versao, df)
+            self._frames.move_to_end(consulta)
+            while len(self._frames) > CARREGAR_CACHE:
+                self._frames.popitem(last=False)
+        return df.copy(deep=not copy_on_write())
+
+    def status(self, cnpj: str) -> pd.DataFrame:
+        """Marca, última sincronização e total local de cada entidade do CNPJ"""
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT m.entidade AS Entidade, m.marca AS Marca, m.sincronizado_em AS Sincronizado_Em, "
+                "m.recebidos AS Recebidos, (SELECT COUNT(*) FROM registros r WHERE r.cnpj = m.cnpj "
+                "AND r.entidade = m.entidade) AS Total_Local FROM marcas m WHERE m.cnpj = ? ORDER BY m.entidade",
+                conn, params=[normalizar_cnpj(cnpj)])
@@ -8,6 +8,8 @@ import pandas as pd
 from datetime import datetime, timedelta
 from auth import require_auth, init_auth_session, is_authenticated
 from mobne_api import MobneIntegration, MobneAPIClient, setup_mobne_connection_ui, display_mobne_status
+from mobne_store import normalizar_cnpj
+from mobne_agendador import DIAS_SEMANA, FREQUENCIAS, agendador_padrao, sincronizacao_exclusiva
 
 # Configuração da página
 st.set_page_config(
@@ -39,6 +41,26 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+def get_agendador():
+    # O mesmo agendador que o app.py inicia na subida do processo
+    return agendador_padrao()
+
+
+def get_mobne_store():
+    return get_agendador().store
+
+
+def get_outbox():
+    return get_agendador().outbox
+
+
+def marca_caption(client: MobneAPIClient, entidade: str):
+    """Mostra até onde a entidade já foi sincronizada para o CNPJ"""
+    marca = get_mobne_store().watermark(client.cnpj, entidade)
+    st.caption(f"🔖 Sincronizado até {marca} — a próxima sincronização busca só o que mudou depois disso"
+               if marca else "🔖 Primeira sincronização: busca completa")
+
+
 @require_auth
 def main():
     """Página principal de integração Mobne"""
@@ -71,6 +93,10 @@ def main():
         st.warning("⚠️ Configure a conexão com Mobne para começar!")
         return
 
+    # Execuções agendadas usam as credenciais desta conexão (após um reinício, inclusive)
+    if integration.get_client():
+        get_agendador().registrar_cliente(integration.get_client())
+
     if sync_option == "Sincronizar Produtos":
         sync_produtos_section()
     elif sync_option == "Sincronizar Clientes":
@@ -94,13 +120,18 @@ def sync_produtos_section():
 
     col1, col2 = st.columns([3, 1])
 
+    with col1:
+        marca_caption(client, "produtos")
+
     with col2:
         if st.button("🔄 Sincronizar Agora", key="sync_produtos"):
-            with st.spinner("Sincronizando produtos..."):
-                success, df = client.sync_produtos_para_dataframe()
+            with st.spinner("Sincronizando produtos..."), sincronizacao_exclusiva():
+                store = get_mobne_store()
+                success, delta = client.sync_incremental("produtos", store)
 
                 if success:
-                    st.success(f"✅ {len(df)} produtos sincronizados!")
+                    df = store.carregar(client.cnpj, "produtos")
+                    st.success(f"✅ {len(delta)} produtos novos ou alterados — {len(df)} no total")
 
                     # Mostrar resumo
                     col1, col2, col3 = st.columns(3)
@@ -142,13 +173,18 @@ def sync_clientes_section():
 
     col1, col2 = st.columns([3, 1])
 
+    with col1:
+        marca_caption(client, "clientes")
+
     with col2:
         if st.button("🔄 Sincronizar Agora", key="sync_clientes"):
-            with st.spinner("Sincronizando clientes..."):
-                success, df = client.sync_clientes_para_dataframe()
+            with st.spinner("Sincronizando clientes..."), sincronizacao_exclusiva():
+                store = get_mobne_store()
+                success, delta = client.sync_incremental("clientes", store)
 
                 if success:
-                    st.success(f"✅ {len(df)} clientes sincronizados!")
+                    df = store.carregar(client.cnpj, "clientes")
+                    st.success(f"✅ {len(delta)} clientes novos ou alterados — {len(df)} no total")
 
                     # Mostrar resumo
                     col1, col2, col3 = st.columns(3)
@@ -186,11 +222,16 @@ def sync_vendas_section():
         st.error("Erro ao obter cliente da API")
         return
 
+    modo = st.radio("Modo", ["Incremental (desde a última sincronização)", "Período específico"], horizontal=True)
+    incremental = modo.startswith("Incremental")
+    if incremental:
+        marca_caption(client, "vendas")
+
     # Filtros
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        data_inicio = st.date_input("Data Início", datetime.now() - timedelta(days=30))
+        data_inicio = st.date_input("Data Início", datetime.now() - timedelta(days=30), disabled=incremental)
 
     with col2:
         data_fim = st.date_input("Data Fim", datetime.now())
@@ -198,14 +239,21 @@ def sync_vendas_section():
     with col3:
         st.write("")  # Espaçamento
         if st.button("🔄 Sincronizar Vendas", key="sync_vendas"):
-            with st.spinner("Sincronizando vendas..."):
-                success, df = client.sync_vendas_para_dataframe(
-                    data_inicio=datetime.combine(data_inicio, datetime.min.time()),
-                    data_fim=datetime.combine(data_fim, datetime.max.time())
-                )
+            with st.spinner("Sincronizando vendas..."), sincronizacao_exclusiva():
+                store = get_mobne_store()
+                if incremental:
+                    success, delta = client.sync_incremental("vendas", store, data_fim=datetime.combine(data_fim, datetime.max.time()))
+                else:
+                    success, delta = client.sync_vendas_para_dataframe(
+                        data_inicio=datetime.combine(data_inicio, datetime.min.time()),
+                        data_fim=datetime.combine(data_fim, datetime.max.time())
+                    )
+                    if success and not delta.empty:
+                        store.merge(client.cnpj, "vendas", delta.drop(columns="DATA_SYNC").to_dict("records"))
 
                 if success:
-                    st.success(f"✅ {len(df)} vendas sincronizadas!")
+                    st.success(f"✅ {len(delta)} vendas recebidas e mescladas no armazém local")
+                    df = store.carregar(client.cnpj, "vendas", None if incremental else data_inicio.isoformat(), data_fim.isoformat())
 
                     # Mostrar resumo
                     col1, col2, col3 = st.columns(3)
@@ -247,6 +295,11 @@ def enviar_vendas_section():
         st.error("Erro ao obter cliente da API")
         return
 
+    # Retoma envios interrompidos (reinício do servidor, aba fechada)
+    outbox = get_outbox()
+    if outbox.resumo(client.cnpj)['pendente']:
+        outbox.flusher(client)
+
     # Opções de envio
     envio_method = st.radio(
         "Escolha o método de envio:",
@@ -319,42 +372,76 @@ def envio_csv(client: MobneAPIClient):
             df = pd.read_csv(uploaded_file)
             st.dataframe(df, use_container_width=True)
 
+            payloads, validacao = client.preparar_vendas(df)
+            invalidas = validacao[validacao['Status'] == 'inválida']
+            if not invalidas.empty:
+                st.warning(f"⚠️ {len(invalidas)} linha(s) inválida(s) não serão enviadas")
+                st.dataframe(invalidas[['Linha', 'Mensagem']], use_container_width=True, hide_index=True)
+
             if st.button("📤 Enviar Vendas do CSV"):
-                with st.spinner("Processando vendas..."):
-                    sucessos = 0
-                    erros = 0
-
-                    progress_bar = st.progress(0)
-
-                    for idx, row in df.iterrows():
-                        venda_data = {
-                            "data": str(row['Data']),
-                            "cliente_id": int(row['Cliente_ID']),
-                            "produtos": [
-                                {
-                                    "produto_id": int(row['Produto_ID']),
-                                    "quantidade": int(row['Quantidade']),
-                                    "valor_unitario": float(row['Valor_Unitario'])
-                                }
-                            ],
-                            "valor_total": float(row['Valor_Total'])
-                        }
-
-                        success, _ = client.send_venda(venda_data)
-                        if success:
-                            sucessos += 1
-                        else:
-                            erros += 1
-
-                        progress_bar.progress((idx + 1) / len(df))
-
-                    st.success(f"✅ {sucessos} vendas enviadas com sucesso")
-                    if erros > 0:
-                        st.warning(f"⚠️ {erros} vendas tiveram erro")
+                validas = validacao[validacao['Status'] == 'pendente']
+                outbox = get_outbox()
+                st.session_state.mobne_envio = outbox.enfileirar(
+                    client.cnpj, [payloads[i] for i in validas.index], validas['Chave'].tolist(), validas['Linha'].tolist())
+                outbox.flusher(client)
+                st.success(f"✅ {len(validas)} vendas na fila de envio — o envio continua mesmo se esta aba for fechada")
 
         except Exception as e:
             st.error(f"❌ Erro ao processar arquivo: {str(e)}")
 
+    render_outbox(client)
+
+
+def render_outbox(client: MobneAPIClient):
+    """Andamento da fila de envio do CNPJ; reexecuta sozinho a cada 2s (polling) só enquanto há vendas na fila"""
+    resumo = get_outbox().resumo(client.cnpj)
+    na_fila = resumo['pendente'] + resumo['enviando'] > 0
+    st.fragment(painel_outbox, run_every=2 if na_fila else None)(client, na_fila)
+
+
+def painel_outbox(client: MobneAPIClient, na_fila: bool):
+    """Corpo do fragmento de render_outbox; na_fila diz se ele foi criado com polling"""
+    outbox = get_outbox()
+    resumo_cnpj = outbox.resumo(client.cnpj)
+    if (resumo_cnpj['pendente'] + resumo_cnpj['enviando'] > 0) != na_fila:
+        st.rerun()  # a fila esvaziou (ou voltou a encher): run_every só muda em um rerun completo
+    envios = outbox.envios(client.cnpj)
+    if envios.empty:
+        return
+    st.markdown("---")
+    st.subheader("📬 Fila de Envio")
+
+    envio = st.session_state.get('mobne_envio') or envios['Envio'].iloc[0]
+    resumo = outbox.resumo(client.cnpj, envio)
+    total = sum(resumo.values())
+    feitas = resumo['enviada'] + resumo['erro']
+    st.progress(feitas / total if total else 1.0, text=f"Envio {envio}: {feitas} de {total} resolvidas")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Enviadas", resumo['enviada'])
+    with col2:
+        st.metric("Na Fila", resumo['pendente'] + resumo['enviando'])
+    with col3:
+        st.metric("Com Erro", resumo['erro'])
+
+    if feitas == total:
+        resultado = outbox.resultado(envio)
+        st.dataframe(resultado, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="📥 Baixar resultado",
+            data=resultado.to_csv(index=False),
+            file_name=f"envio_mobne_{envio}.csv",
+            mime="text/csv",
+            key=f"resultado_{envio}"
+        )
+    if resumo_cnpj['erro'] and st.button("🔁 Reenviar vendas com erro", key="outbox_retomar"):
+        st.toast(f"{outbox.retomar(client.cnpj)} vendas de volta à fila")
+        st.rerun()  # liga o polling enquanto elas são reenviadas
+
+    with st.expander("Envios recentes"):
+        st.dataframe(envios, use_container_width=True, hide_index=True)
+
 
 def envio_automatico(client: MobneAPIClient):
     """Configuração de sincronização automática"""
@@ -362,20 +449,60 @@ def envio_automatico(client: MobneAPIClient):
 
     st.info("🔄 Configure a sincronização automática de vendas para o Mobne")
 
-    col1, col2 = st.columns(2)
+    agendador = get_agendador()
+    config = agendador.configuracao(client.cnpj) or {}
+
+    col1, col2, col3 = st.columns(3)
 
     with col1:
         frequencia = st.selectbox(
             "Frequência de Sincronização",
-            ["A cada 1 hora", "A cada 4 horas", "Diária", "Semanal"]
+            FREQUENCIAS,
+            index=FREQUENCIAS.index(config['frequencia']) if config.get('frequencia') in FREQUENCIAS else 2
         )
 
     with col2:
-        horario = st.time_input("Horário para sincronizar", datetime.now().time())
+        horario = st.time_input("Horário para sincronizar",
+                                datetime.strptime(config['horario'], "%H:%M").time() if config else datetime.now().time())
+
+    with col3:
+        dias = list(DIAS_SEMANA)
+        dia_semana = st.selectbox("Dia da semana", dias, format_func=DIAS_SEMANA.get,
+                                  index=dias.index(config['dia_semana']) if config.get('dia_semana') in dias else 0,
+                                  disabled=frequencia != "Semanal")
+
+    ativo = st.checkbox("Sincronização automática ativa", value=bool(config.get('ativo', True)))
+    st.caption("A cada execução: produtos e vendas incrementais, envio das vendas pendentes na fila "
+               "e pré-carregamento das tabelas desta página. Execuções perdidas com o servidor parado "
+               "rodam uma vez ao reiniciar.")
 
-    if st.button("💾 Salvar Configuração"):
-        st.success("✅ Configuração de sincronização automática salva!")
-        st.info(f"Próxima sincronização: {frequencia} às {horario}")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("💾 Salvar Configuração"):
+            proxima = agendador.salvar(client, frequencia, horario.strftime("%H:%M"),
+                                       dia_semana if frequencia == "Semanal" else None, ativo)
+            if proxima:
+                st.success("✅ Configuração de sincronização automática salva!")
+            else:
+                st.success("✅ Sincronização automática desativada")
+    with col2:
+        if st.button("▶️ Executar Agora"):
+            with st.spinner("Sincronizando (aguarda outra sincronização em andamento)..."):
+                agendador.registrar_cliente(client)
+                resultado = agendador.executar(normalizar_cnpj(client.cnpj))
+            if resultado['status'] == 'ok':
+                st.success(f"✅ {resultado['produtos']} produtos e {resultado['vendas']} vendas novos ou alterados")
+            else:
+                st.error(f"❌ {resultado['status']}: {resultado['mensagem']}")
+
+    proxima = agendador.proxima(client.cnpj)
+    if proxima:
+        st.info(f"Próxima sincronização: {proxima.strftime('%d/%m/%Y %H:%M')}")
+
+    historico = agendador.historico(client.cnpj)
+    if not historico.empty:
+        st.markdown("#### Execuções recentes")
+        st.dataframe(historico, use_container_width=True, hide_index=True)
 
 
 if __name__ == "__main__":
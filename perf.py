@@ -0,0 +1,189 @@
+"""
+Módulo de Instrumentação de Desempenho
+Mede, por execução (rerun) do dashboard, tempo de carga de dados, cálculo,
+montagem de figuras, acertos de cache e tamanho do payload enviado ao navegador
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional
+
+import streamlit as st
+
+PERF_ENABLED = os.getenv("DUBAIRRO_PERF", "1") != "0"
+PERF_LOG_FILE = os.getenv("DUBAIRRO_PERF_LOG", "logs/perf.jsonl")
+PERF_LOG_MAX_BYTES = 1_000_000
+PERF_LOG_BACKUPS = 3
+# Fração dos reruns de não administradores que mede o payload (serializar cada figura custa caro)
+PERF_PAYLOAD_AMOSTRA = float(os.getenv("DUBAIRRO_PERF_PAYLOAD", "0.05"))
+
+_local = threading.local()
+_logger: Optional[logging.Logger] = None
+_logger_lock = threading.Lock()
+
+
+def _get_logger() -> logging.Logger:
+    """Logger JSON Lines com rotação por tamanho (log local para tendências)"""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            os.makedirs(os.path.dirname(PERF_LOG_FILE) or ".", exist_ok=True)
+            handler = RotatingFileHandler(PERF_LOG_FILE, maxBytes=PERF_LOG_MAX_BYTES, backupCount=PERF_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger = logging.getLogger("dubairro.perf")
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+            _logger.addHandler(handler)
+        return _logger
+
+
+def current() -> Optional[Dict]:
+    """Registro do rerun em andamento nesta thread (None fora de um rerun)"""
+    return getattr(_local, "record", None)
+
+
+def start_rerun(medir_payload: bool = False) -> Dict:
+    """
+    Abre o registro de métricas do rerun atual
+
+    Args:
+        medir_payload: Mede o tamanho das figuras e tabelas (ex: administradores);
+            senão só uma fração PERF_PAYLOAD_AMOSTRA dos reruns mede (payload_bytes = None nos demais)
+    """
+    medir = medir_payload or random.random() < PERF_PAYLOAD_AMOSTRA
+    _local.record = {
+        'inicio': time.perf_counter(), 'pagina': None,
+        'dados_ms': 0.0, 'calculo_ms': 0.0, 'figuras_ms': 0.0, 'tabelas_ms': 0.0, 'total_ms': 0.0,
+        'cache_hits': 0, 'cache_misses': 0, 'payload_bytes': 0 if medir else None, 'n_figuras': 0, 'n_tabelas': 0,
+    }
+    return _local.record
+
+
+def count_cache(hit: bool) -> None:
+    """Conta um acerto/erro de cache no rerun atual (no-op fora de um rerun)"""
+    rec = current()
+    if rec is not None:
+        rec['cache_hits' if hit else 'cache_misses'] += 1
+
+
+def add_payload(nbytes: int) -> None:
+    """Soma bytes enviados ao navegador no rerun atual (no-op se este rerun não mede payload)"""
+    rec = current()
+    if rec is not None and rec['payload_bytes'] is not None:
+        rec['payload_bytes'] += int(nbytes)
+
+
+@contextmanager
+def stage(name: str):
+    """Acumula o tempo do bloco em '<name>_ms' do rerun atual"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        rec = current()
+        if rec is not None:
+            rec[f"{name}_ms"] = rec.get(f"{name}_ms", 0.0) + (time.perf_counter() - t0) * 1000
+
+
+def instrument_page(page_func):
+    """
+    Decorator para páginas do dashboard
+
+    O tempo de cálculo é o tempo total da página menos o gasto emitindo
+    figuras e tabelas (medido por plotly_chart/dataframe abaixo).
+    """
+    @wraps(page_func)
+    def wrapper(*args, **kwargs):
+        rec = current()
+        if rec is None or not PERF_ENABLED:
+            return page_func(*args, **kwargs)
+        rec['pagina'] = page_func.__name__
+        t0 = time.perf_counter()
+        try:
+            return page_func(*args, **kwargs)
+        finally:
+            total = (time.perf_counter() - t0) * 1000
+            rec['calculo_ms'] += max(0.0, total - rec['figuras_ms'] - rec['tabelas_ms'])
+    return wrapper
+
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart medindo o tempo de emissão e, nos reruns amostrados, o tamanho do JSON"""
+    rec = current()
+    if rec is None or not PERF_ENABLED:
+        return st.plotly_chart(fig, **kwargs)
+    with stage('figuras'):
+        if rec['payload_bytes'] is not None:
+            add_payload(len(fig.to_json(validate=False)))
+        rec['n_figuras'] += 1
+        return st.plotly_chart(fig, **kwargs)
+
+
+def dataframe(df, **kwargs):
+    """st.dataframe medindo o tempo de emissão e, nos reruns amostrados, o tamanho aproximado dos dados"""
+    rec = current()
+    if rec is None or not PERF_ENABLED:
+        return st.dataframe(df, **kwargs)
+    with stage('tabelas'):
+        if rec['payload_bytes'] is not None:
+            add_payload(df.memory_usage(deep=True).sum())
+        rec['n_tabelas'] += 1
+        return st.dataframe(df, **kwargs)
+
+
+def finish_rerun() -> Optional[Dict]:
+    """Fecha o registro do rerun e acrescenta ao log rotativo"""
+    rec = current()
+    if rec is None:
+        return None
+    rec['total_ms'] = (time.perf_counter() - rec.pop('inicio')) * 1000
+    rec['timestamp'] = datetime.now().isoformat(timespec='seconds')
+    _local.record = None
+    if PERF_ENABLED and rec['pagina']:
+        try:
+            _get_logger().info(json.dumps({k: round(v, 1) if isinstance(v, float) else v for k, v in rec.items()}, ensure_ascii=False))
+        except OSError:
+            pass
+    return rec
+
+
+def read_log(limit: int = 500) -> List[Dict]:
+    """Últimos registros do log (arquivo atual)"""
+    if not os.path.exists(PERF_LOG_FILE):
+        return []
+    with open(PERF_LOG_FILE, encoding="utf-8") as f:
+        lines = f.readlines()[-limit:]
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def render_panel(rec: Optional[Dict]) -> None:
+    """Painel de desempenho na sidebar (a página chamadora controla o acesso)"""
+    import pandas as pd
+
+    with st.sidebar.expander("⏱️ Desempenho"):
+        if rec and rec.get('pagina'):
+            st.markdown(f"**Último rerun:** `{rec['pagina']}`")
+            payload = "não medido" if rec['payload_bytes'] is None else f"{rec['payload_bytes'] / 1024:,.0f} KB"
+            st.markdown(
+                f"- Dados: {rec['dados_ms']:.0f} ms\n"
+                f"- Cálculo: {rec['calculo_ms']:.0f} ms\n"
+                f"- Figuras: {rec['figuras_ms']:.0f} ms ({rec['n_figuras']})\n"
+                f"- Tabelas: {rec['tabelas_ms']:.0f} ms ({rec['n_tabelas']})\n"
+                f"- Cache: {rec['cache_hits']} hits / {rec['cache_misses']} misses\n"
+                f"- Payload: {payload}\n"
+                f"- Total: {rec['total_ms']:.0f} ms")
+        hist = read_log()
+        if hist:
+            df = pd.DataFrame(hist)
+            resumo = df.groupby('pagina').agg(reruns=('total_ms', 'size'), total_p50=('total_ms', 'median'),
+                total_p95=('total_ms', lambda s: s.quantile(0.95)), payload_kb=('payload_bytes', lambda s: s.mean() / 1024))
+            st.markdown(f"**Histórico** ({len(df)} reruns)")
+            st.dataframe(resumo.round(0), use_container_width=True)
@@ -0,0 +1,107 @@
+"""
+Módulo de Janelas Móveis
+Totais e médias móveis e variação ano contra ano para qualquer janela,
+calculados com somas acumuladas (O(n) por série) sobre o cubo de histórico
+"""
+
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Sequence, Tuple
+
+MESES_ABREV = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+JANELAS = (3, 6, 12)
+
+
+def rotulos(datas: pd.DatetimeIndex) -> List[str]:
+    """Rótulos 'Mmm/AA' a partir das datas reais (ex: 'Jan/26')"""
+    return [f"{MESES_ABREV[d.month - 1]}/{d.year % 100:02d}" for d in datas]
+
+
+def soma_movel(Y: np.ndarray, janela: int) -> np.ndarray:
+    """
+    Soma móvel de cada linha via diferença de somas acumuladas
+
+    Args:
+        Y: Matriz séries × meses (NaN = sem dado)
+        janela: Tamanho da janela em meses
+
+    Returns:
+        Matriz do mesmo formato; NaN onde a janela não está completa
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    valido = ~np.isnan(Y)
+    cs = np.concatenate([np.zeros((Y.shape[0], 1)), np.cumsum(np.where(valido, Y, 0.0), axis=1)], axis=1)
+    cn = np.concatenate([np.zeros((Y.shape[0], 1), dtype=int), np.cumsum(valido, axis=1)], axis=1)
+    out = np.full(Y.shape, np.nan)
+    if janela <= Y.shape[1]:
+        soma = cs[:, janela:] - cs[:, :-janela]
+        cheia = (cn[:, janela:] - cn[:, :-janela]) == janela
+        out[:, janela - 1:] = np.where(cheia, soma, np.nan)
+    return out
+
+
+def media_movel(Y: np.ndarray, janela: int) -> np.ndarray:
+    """Média móvel (soma móvel ÷ janela)"""
+    return soma_movel(Y, janela) / janela
+
+
+def variacao(Y: np.ndarray, defasagem: int = 12) -> np.ndarray:
+    """
+    Variação percentual contra o valor de `defasagem` meses antes
+
+    Returns:
+        Matriz do mesmo formato (fração); NaN sem base de comparação
+    """
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    out = np.full(Y.shape, np.nan)
+    if defasagem < Y.shape[1]:
+        base = Y[:, :-defasagem]
+        out[:, defasagem:] = np.divide(Y[:, defasagem:], base, out=np.full(base.shape, np.nan), where=base > 0) - 1
+    return out
+
+
+def calcular(
+    meta: pd.DataFrame,
+    meses: pd.DatetimeIndex,
+    Y: np.ndarray,
+    janela: int = 12,
+    niveis: Optional[Sequence[str]] = None,
+    anos: Optional[Tuple[int, int]] = None,
+) -> pd.DataFrame:
+    """
+    Métricas móveis de todas as séries em formato longo
+
+    A janela usa todo o histórico; o filtro de anos só recorta o resultado.
+
+    Args:
+        meta: Séries [Serie, Nivel] (linhas de Y)
+        meses: Meses (colunas de Y)
+        Y: Matriz séries × meses
+        janela: Tamanho da janela em meses
+        niveis: Níveis a manter ('total', 'categoria', 'produto'); None = todos
+        anos: Intervalo (ano inicial, ano final) inclusivo; None = tudo
+
+    Returns:
+        DataFrame [Serie, Nivel, Data, Rotulo, Valor, Soma_Movel, Media_Movel, Var_YoY, Var_YoY_Movel]
+    """
+    colunas = ['Serie', 'Nivel', 'Data', 'Rotulo', 'Valor', 'Soma_Movel', 'Media_Movel', 'Var_YoY', 'Var_YoY_Movel']
+    if len(meses) == 0 or len(meta) == 0:
+        return pd.DataFrame(columns=colunas)
+    sm = soma_movel(Y, janela)
+    n_s, n_m = Y.shape
+    df = pd.DataFrame({
+        'Serie': np.repeat(meta['Serie'].to_numpy(), n_m),
+        'Nivel': np.repeat(meta['Nivel'].to_numpy(), n_m),
+        'Data': np.tile(meses.to_numpy(), n_s),
+        'Rotulo': np.tile(rotulos(meses), n_s),
+        'Valor': Y.ravel(),
+        'Soma_Movel': sm.ravel(),
+        'Media_Movel': (sm / janela).ravel(),
+        'Var_YoY': variacao(Y).ravel(),
+        'Var_YoY_Movel': variacao(sm).ravel(),
+    })
+    if niveis is not None:
+        df = df[df['Nivel'].isin(niveis)]
+    if anos is not None:
+        df = df[df['Data'].dt.year.between(*anos)]
+    return df.reset_index(drop=True)
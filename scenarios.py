@@ -0,0 +1,83 @@
+"""
+Módulo de Cenários "E se?"
+Avalia grades inteiras de variação de receita × margem × custo fixo com
+broadcasting do NumPy, sem laços em Python
+"""
+
+import numpy as np
+from typing import Dict
+
+# Faixas de variação em torno do cenário base
+VAR_RECEITA = (-0.30, 0.30)   # fração da receita base
+VAR_MARGEM = (-0.05, 0.05)    # pontos percentuais de margem bruta (absoluto)
+VAR_CUSTO = (-0.30, 0.30)     # fração do custo fixo base
+PASSOS = (21, 41, 81)         # resoluções oferecidas por eixo (81³ ≈ 531 mil cenários)
+
+
+def eixos(receita: float, margem: float, custo_fixo: float, passos: int = 41) -> Dict[str, np.ndarray]:
+    """
+    Monta os três eixos da grade a partir do cenário base
+
+    Args:
+        receita: Receita base (R$)
+        margem: Margem bruta base (fração, ex: 0.25)
+        custo_fixo: Custo fixo base (R$)
+        passos: Pontos por eixo
+
+    Returns:
+        Dicionário com as variações (var_*) e os valores absolutos de cada eixo
+    """
+    var_r = np.linspace(*VAR_RECEITA, passos)
+    var_m = np.linspace(*VAR_MARGEM, passos)
+    var_c = np.linspace(*VAR_CUSTO, passos)
+    return {
+        'var_receita': var_r, 'var_margem': var_m, 'var_custo': var_c,
+        'receita': receita * (1 + var_r),
+        'margem': np.clip(margem + var_m, 0, 1),
+        'custo': np.maximum(custo_fixo * (1 + var_c), 0),
+    }
+
+
+def avaliar(receita: np.ndarray, margem: np.ndarray, custo: np.ndarray, meta: float) -> Dict[str, np.ndarray]:
+    """
+    Avalia todas as combinações receita × margem × custo fixo de uma vez
+
+    Args:
+        receita: Vetor de receitas (R)
+        margem: Vetor de margens brutas em fração (M)
+        custo: Vetor de custos fixos (C)
+        meta: Margem líquida mínima desejada (fração)
+
+    Returns:
+        Matrizes (R, M, C): lucro líquido, margem real e máscaras no_lucro/na_meta
+    """
+    r = np.asarray(receita, dtype=float)[:, None, None]
+    m = np.asarray(margem, dtype=float)[None, :, None]
+    c = np.asarray(custo, dtype=float)[None, None, :]
+    lucro = r * m - c
+    margem_real = np.divide(lucro, r, out=np.full(lucro.shape, -np.inf), where=r > 0)
+    return {'lucro': lucro, 'margem_real': margem_real, 'no_lucro': lucro >= 0, 'na_meta': margem_real >= meta}
+
+
+def custo_fixo_maximo(receita: np.ndarray, margem: np.ndarray, meta: float) -> np.ndarray:
+    """
+    Maior custo fixo que mantém a margem real acima da meta
+
+    (R·M − C) / R ≥ meta  ⇔  C ≤ R · (M − meta); forma fechada, sem busca.
+
+    Returns:
+        Matriz (R, M) em R$ (0 quando a margem bruta não cobre a meta)
+    """
+    return np.maximum(np.multiply.outer(np.asarray(receita, dtype=float), np.asarray(margem, dtype=float) - meta), 0)
+
+
+def ponto_equilibrio(margem: np.ndarray, custo: np.ndarray) -> np.ndarray:
+    """
+    Receita mínima para lucro zero em cada combinação margem × custo fixo
+
+    Returns:
+        Matriz (M, C) em R$ (inf onde a margem é zero)
+    """
+    m = np.asarray(margem, dtype=float)[:, None]
+    c = np.asarray(custo, dtype=float)[None, :]
+    return np.divide(c, m, out=np.full(np.broadcast_shapes(m.shape, c.shape), np.inf), where=m > 0)
@@ -0,0 +1,125 @@
+"""
+Módulo de Tabelas Paginadas
+Ordenação e filtros no servidor; só a página visível vai para o navegador
+"""
+
+import math
+import numpy as np
+import pandas as pd
+import streamlit as st
+from typing import Dict, Optional, Sequence, Tuple
+
+import perf
+
+PAGE_SIZE_DEFAULT = 20
+FILTER_COLUMNS = ('Classificacao', 'Curva', 'Categoria')
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _sort_indexes(df: pd.DataFrame, sort_cols: Tuple[str, ...]) -> Dict[Tuple[str, bool], np.ndarray]:
+    """
+    Pré-calcula a ordem das linhas para cada coluna ordenável
+
+    Args:
+        df: DataFrame completo (índice ignorado)
+        sort_cols: Colunas ordenáveis
+
+    Returns:
+        Dicionário {(coluna, ascendente): posições ordenadas}
+    """
+    base = df.reset_index(drop=True)
+    indexes = {}
+    for col in sort_cols:
+        for asc in (True, False):
+            indexes[(col, asc)] = base[col].sort_values(ascending=asc, kind='stable', na_position='last').index.to_numpy()
+    return indexes
+
+
+def paginate(
+    df: pd.DataFrame,
+    sort_col: str,
+    ascending: bool = False,
+    filters: Optional[Dict[str, Sequence]] = None,
+    page: int = 1,
+    page_size: int = PAGE_SIZE_DEFAULT,
+    sort_cols: Sequence[str] = None,
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Recorta uma página ordenada e filtrada sem reordenar o DataFrame inteiro
+
+    Args:
+        df: DataFrame completo
+        sort_col: Coluna de ordenação
+        ascending: Ordem ascendente
+        filters: {coluna: valores aceitos}; listas vazias não filtram
+        page: Página (começa em 1)
+        page_size: Linhas por página
+        sort_cols: Colunas com índice pré-calculado (padrão: só sort_col)
+
+    Returns:
+        Tupla (página, total de linhas após o filtro)
+    """
+    indexes = _sort_indexes(df, tuple(sort_cols or (sort_col,)))
+    order = indexes[(sort_col, ascending)]
+
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in (filters or {}).items():
+        if values:
+            mask &= df[col].isin(values).to_numpy()
+    if not mask.all():
+        order = order[mask[order]]
+
+    start = (max(page, 1) - 1) * page_size
+    return df.iloc[order[start:start + page_size]], len(order)
+
+
+def render_paginated_table(
+    df: pd.DataFrame,
+    key: str,
+    columns: Dict[str, str],
+    sort_col: str,
+    ascending: bool = False,
+    page_size: int = PAGE_SIZE_DEFAULT,
+    filter_cols: Sequence[str] = FILTER_COLUMNS,
+) -> None:
+    """
+    Renderiza tabela paginada com ordenação e filtros no servidor
+
+    Args:
+        df: DataFrame completo
+        key: Prefixo único dos widgets
+        columns: {coluna original: rótulo exibido}, na ordem de exibição
+        sort_col: Coluna de ordenação padrão (nome original)
+        ascending: Ordem padrão
+        page_size: Linhas por página
+        filter_cols: Colunas candidatas a filtro (só aparecem se existirem com 2+ valores)
+    """
+    sortable = [c for c in columns if pd.api.types.is_numeric_dtype(df[c]) or c == sort_col]
+    filtros = [c for c in filter_cols if c in df.columns and df[c].nunique() > 1]
+
+    ctrl = st.columns([2] * len(filtros) + [2, 1])
+    filters = {}
+    for i, col in enumerate(filtros):
+        with ctrl[i]:
+            filters[col] = st.multiselect(col, sorted(df[col].dropna().unique()), key=f"{key}_f_{col}")
+    with ctrl[-2]:
+        sc = st.selectbox("Ordenar por", sortable, index=sortable.index(sort_col), format_func=lambda c: columns[c], key=f"{key}_sort")
+    with ctrl[-1]:
+        asc = st.toggle("Crescente", value=ascending, key=f"{key}_asc")
+
+    pag_key = f"{key}_pag"
+    page, total = paginate(df, sc, asc, filters, st.session_state.get(pag_key, 1), page_size, sortable)
+    n_pages = max(1, math.ceil(total / page_size))
+    if st.session_state.get(pag_key, 1) > n_pages:
+        st.session_state[pag_key] = n_pages
+        page, total = paginate(df, sc, asc, filters, n_pages, page_size, sortable)
+
+    view = page[list(columns)].rename(columns=columns)
+    perf.dataframe(view.reset_index(drop=True), use_container_width=True, hide_index=True)
+    if n_pages > 1:
+        cp, cc = st.columns([1, 3])
+        with cp: st.number_input("Página", min_value=1, max_value=n_pages, step=1, key=pag_key, label_visibility="collapsed")
+        ini = (st.session_state.get(pag_key, 1) - 1) * page_size
+        with cc: st.caption(f"Página {st.session_state.get(pag_key, 1)} de {n_pages} — linhas {ini + 1}–{min(ini + page_size, total)} de {total:,}")
+    else:
+        st.caption(f"{total:,} linhas")
@@ -0,0 +1,21 @@
+"""CSV exportado em pt-BR: separador ';' e números com vírgula decimal"""
+import pandas as pd
+
+from data_processor import DataProcessor
+
+CSV_PTBR = (
+    "Data;Categoria;Produto;Quantidade;Valor_Unitario;Vlr_Venda;Custo;Vlr_Lucro;Qtde_Documentos\n"
+    "01/02/2026;Alimentos;Arroz 5kg;3;25,50;76,50;45,90;30,60;1\n"
+    "01/02/2026;Bebidas;Água 1.5L;10;3,50;35,00;14,00;21,00;1\n"
+    "02/02/2026;Alimentos;Cesta;1;1.234,56;1.234,56;1.000,00;234,56;1\n"
+)
+
+
+def test_csv_ponto_e_virgula_com_virgula_decimal(tmp_path):
+    arquivo = tmp_path / "vendas_ptbr.csv"
+    arquivo.write_text(CSV_PTBR, encoding='utf-8')
+    dados, erros, stats = DataProcessor.process_stream(str(arquivo), arquivo.name, 'vendas')
+    assert stats['erros'] == 0 and erros.empty
+    diarias = dados['fato_vendas_diarias']
+    assert round(diarias['Vlr_Venda'].sum(), 2) == 76.50 + 35.00 + 1234.56
+    assert sorted(pd.to_datetime(diarias['Data']).unique()) == [pd.Timestamp(2026, 2, 1), pd.Timestamp(2026, 2, 2)]
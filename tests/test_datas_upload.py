@@ -0,0 +1,29 @@
+"""Datas de upload: ISO (formato documentado) não pode virar %Y-%d-%m"""
+from pathlib import Path
+
+import pandas as pd
+
+from data_processor import DataProcessor, parse_datas
+
+EXEMPLO = Path(__file__).resolve().parent.parent / "exemplo_vendas.csv"
+FEVEREIRO = [pd.Timestamp(2026, 2, d) for d in range(1, 6)]
+
+
+def test_parse_datas_iso_e_brasileiro():
+    datas = parse_datas(pd.Series(['2026-02-13', '2026-02-01', '13/02/2026', '01/02/2026 10:00', 'x']))
+    assert datas[:3].tolist() == [pd.Timestamp(2026, 2, 13), pd.Timestamp(2026, 2, 1), pd.Timestamp(2026, 2, 13)]
+    assert datas[3] == pd.Timestamp(2026, 2, 1, 10)
+    assert pd.isna(datas[4])
+
+
+def test_exemplo_vendas_chunk():
+    validas, erros = DataProcessor.coerce_vendas_chunk(pd.read_csv(EXEMPLO, dtype=str))
+    assert erros.empty
+    assert sorted(validas['DATA'].unique()) == FEVEREIRO
+
+
+def test_exemplo_vendas_stream():
+    dados, erros, stats = DataProcessor.process_stream(str(EXEMPLO), EXEMPLO.name, 'vendas')
+    assert stats['erros'] == 0 and erros.empty
+    assert sorted(pd.to_datetime(dados['fato_vendas_diarias']['Data']).unique()) == FEVEREIRO
+    assert dados['fato_vendas_mensais']['Periodo'].unique().tolist() == ['02/2026']